@@ -0,0 +1,235 @@
+"""
+answer_cache.py - Cache semântico de respostas do RAG
+
+Guarda respostas já geradas em SQLite, com tamanho máximo (LRU), TTL e
+invalidação automática quando a base vetorial é reindexada.
+
+A chave é a pergunta normalizada + parâmetros (modelo LLM, K_JURIS, K_LEI,
+modelo de embeddings). Perguntas quase idênticas também são reaproveitadas
+quando a similaridade de cosseno entre os embeddings passa do limiar.
+"""
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+def normalize_question(question: str) -> str:
+    """Minúsculas, sem acentos, espaços colapsados e sem pontuação final"""
+    q = unicodedata.normalize("NFKD", question.strip().lower())
+    q = "".join(c for c in q if not unicodedata.combining(c))
+    q = re.sub(r"\s+", " ", q)
+    return q.rstrip(" ?!.;:")
+
+
+class AnswerCache:
+    """Cache persistente de respostas com LRU, TTL e busca por similaridade"""
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = 256,
+        ttl_seconds: float = 7 * 24 * 3600,
+        similarity_threshold: float = 0.95,
+        index_version_fn: Optional[Callable[[], str]] = None,
+    ):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.index_version_fn = index_version_fn or (lambda: "")
+
+        self.stats_counters = {
+            "hits": 0,
+            "semantic_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0,
+        }
+
+        self._lock = threading.RLock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                params TEXT NOT NULL,
+                question TEXT NOT NULL,
+                embedding BLOB,
+                response TEXT NOT NULL,
+                fontes TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_entries_last_access ON entries(last_access);
+            CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT);
+        """)
+        self._conn.commit()
+
+        # Espelho em memória dos embeddings: params -> {key: vetor normalizado}
+        self._vectors: Dict[str, Dict[str, np.ndarray]] = {}
+        for key, params, blob in self._conn.execute("SELECT key, params, embedding FROM entries"):
+            if blob is not None:
+                self._vectors.setdefault(params, {})[key] = np.frombuffer(blob, dtype=np.float32)
+
+    # ------------------------------------------------------------------
+    # Chaves e versão do índice
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def make_params(**params) -> str:
+        return json.dumps(params, sort_keys=True, ensure_ascii=False)
+
+    @staticmethod
+    def make_key(question: str, params: str) -> str:
+        return hashlib.sha256(f"{normalize_question(question)}|{params}".encode("utf-8")).hexdigest()
+
+    def _check_index_version(self):
+        """Limpa o cache se a base vetorial foi reindexada desde a última escrita"""
+        version = str(self.index_version_fn())
+        row = self._conn.execute("SELECT value FROM meta WHERE name = 'index_version'").fetchone()
+        if row is not None and row[0] == version:
+            return
+        if row is not None:
+            self._conn.execute("DELETE FROM entries")
+            self._vectors.clear()
+            self.stats_counters["invalidations"] += 1
+        self._conn.execute(
+            "INSERT OR REPLACE INTO meta(name, value) VALUES ('index_version', ?)", (version,)
+        )
+        self._conn.commit()
+
+    # ------------------------------------------------------------------
+    # API
+    # ------------------------------------------------------------------
+
+    def get(self, question: str, params: str, embedding: Optional[List[float]] = None) -> Optional[Tuple[str, List[Dict]]]:
+        """Retorna (resposta, fontes) em cache ou None"""
+        return self.lookup(question, params, embedding)[0]
+
+    def lookup(self, question: str, params: str,
+               embedding: Optional[List[float]] = None) -> Tuple[Optional[Tuple[str, List[Dict]]], str]:
+        """
+        Como get, mas informa também o tipo de resultado:
+        "hit", "semantic_hit", "expired" ou "miss".
+        """
+        with self._lock:
+            self._check_index_version()
+            now = time.time()
+
+            key = self.make_key(question, params)
+            row = self._conn.execute(
+                "SELECT key, response, fontes, created_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            counter = "hits"
+
+            if row is None and embedding is not None:
+                similar_key = self._most_similar(params, embedding)
+                if similar_key is not None:
+                    row = self._conn.execute(
+                        "SELECT key, response, fontes, created_at FROM entries WHERE key = ?", (similar_key,)
+                    ).fetchone()
+                    counter = "semantic_hits"
+
+            if row is not None and now - row[3] > self.ttl_seconds:
+                self._delete(row[0], params)
+                self.stats_counters["expirations"] += 1
+                self.stats_counters["misses"] += 1
+                return None, "expired"
+
+            if row is None:
+                self.stats_counters["misses"] += 1
+                return None, "miss"
+
+            self._conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (now, row[0]))
+            self._conn.commit()
+            self.stats_counters[counter] += 1
+            return (row[1], json.loads(row[2])), ("hit" if counter == "hits" else "semantic_hit")
+
+    def put(self, question: str, params: str, response: str, fontes: List[Dict],
+            embedding: Optional[List[float]] = None):
+        with self._lock:
+            self._check_index_version()
+            now = time.time()
+            key = self.make_key(question, params)
+
+            vector = None
+            if embedding is not None:
+                vector = np.asarray(embedding, dtype=np.float32)
+                norm = np.linalg.norm(vector)
+                vector = vector / norm if norm > 0 else vector
+
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key, params, normalize_question(question),
+                    vector.tobytes() if vector is not None else None,
+                    response, json.dumps(fontes, ensure_ascii=False), now, now
+                )
+            )
+            if vector is not None:
+                self._vectors.setdefault(params, {})[key] = vector
+            self._evict()
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.commit()
+            self._vectors.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            counters = dict(self.stats_counters)
+        hits = counters["hits"] + counters["semantic_hits"]
+        total = hits + counters["misses"]
+        counters.update({
+            "size": size,
+            "max_entries": self.max_entries,
+            "hit_rate": hits / total if total else 0.0,
+        })
+        return counters
+
+    # ------------------------------------------------------------------
+    # Internos
+    # ------------------------------------------------------------------
+
+    def _most_similar(self, params: str, embedding: List[float]) -> Optional[str]:
+        candidates = self._vectors.get(params)
+        if not candidates:
+            return None
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return None
+        keys = list(candidates)
+        sims = np.stack([candidates[k] for k in keys]) @ (query / norm)
+        best = int(np.argmax(sims))
+        return keys[best] if sims[best] >= self.similarity_threshold else None
+
+    def _delete(self, key: str, params: str):
+        self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+        self._conn.commit()
+        self._vectors.get(params, {}).pop(key, None)
+
+    def _evict(self):
+        """Remove as entradas menos usadas recentemente acima de max_entries"""
+        excess = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0] - self.max_entries
+        if excess <= 0:
+            return
+        victims = self._conn.execute(
+            "SELECT key, params FROM entries ORDER BY last_access ASC LIMIT ?", (excess,)
+        ).fetchall()
+        for key, params in victims:
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._vectors.get(params, {}).pop(key, None)
+        self.stats_counters["evictions"] += len(victims)
@@ -0,0 +1,200 @@
+"""
+article_index.py - Índice direto de artigos citados nas perguntas
+
+Perguntas que citam o dispositivo ("artigo 121", "art. 155, § 2º", "art. 306
+do CTB", "arts. 33 e 35 da Lei 11.343") não precisam de busca semântica na
+legislação: o create_db_cp grava, a partir do codigo_penal_estruturado.json,
+um índice (lei, artigo) -> documento, com o mesmo texto, metadados e id da
+coleção legislacao_codigo_penal. O rag_core extrai as citações da pergunta
+com uma regex pré-compilada e coloca esses artigos no topo do contexto com
+uma consulta a um dicionário, sem ir ao Chroma.
+
+Leis: "cp" (Código Penal, padrão de citações sem lei) e o número da lei sem
+pontos ("11343", "9503" = CTB). Citação sem lei que não exista no CP usa o
+artigo de outra lei com o mesmo número, se houver um só.
+
+Uso:
+    salvar_indice_artigos(ids, documentos, metadados, artigos)   # create_db_cp
+    ARTIGOS = ArticleIndex(ARTICLE_INDEX_PATH)
+    ARTIGOS.citados("Qual a pena do art. 155, § 2º?")            # [{"id", "content", "metadata", ...}]
+"""
+import os
+import re
+import json
+import threading
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+ARTICLE_INDEX_PATH = os.getenv("ARTICLE_INDEX_PATH", "./vectordb/artigos_codigo_penal.json")
+ARTICLE_INDEX_VERSION = 1
+
+# Número com letra opcional ("121-A"); "1o" é ordinal, não letra
+_NUMERO = r"\d+(?:-?[a-np-z]\b)?"
+CITACAO_RE = re.compile(
+    r"\bart(?:igo)?s?\.?\s*"
+    rf"(?P<numeros>{_NUMERO}(?:\s*(?:,|e)\s*{_NUMERO})*)"
+    r"(?:\s*,?\s*(?:§|par[aá]grafo)\s*(?P<paragrafo>\d+|[uú]nico)\s*[ºo°]?(?:\s*-\s*(?P<letra>[a-z])\b)?)?"
+    r"(?:\s*,?\s*(?:do|da)\s+(?P<lei>c[oó]digo\s+penal|cp\b|ctb\b|c[oó]digo\s+de\s+tr[aâ]nsito"
+    r"|lei\s+de\s+drogas|lei\s*(?:n[º°o.]*\s*)?\d[\d.]*(?:/\d+)?))?",
+    re.IGNORECASE,
+)
+_NUMEROS_RE = re.compile(_NUMERO, re.IGNORECASE)
+_LEI_NUMERO_RE = re.compile(r"lei\s*(?:n[º°o.]*\s*)?(\d[\d.]*)", re.IGNORECASE)
+_ARTIGO_CAMPO_RE = re.compile(rf"art\.?\s*({_NUMERO})", re.IGNORECASE)
+
+
+class Citacao(NamedTuple):
+    lei: Optional[str]  # None = sem lei explícita
+    artigo: str
+    paragrafo: Optional[str]
+
+
+def chave_lei(texto: Optional[str]) -> Optional[str]:
+    """Lei normalizada: "cp", número da lei sem pontos, ou None"""
+    if not texto:
+        return None
+    t = texto.lower()
+    if "ctb" in t or "trânsito" in t or "transito" in t:
+        return "9503"
+    if "drogas" in t:
+        return "11343"
+    m = _LEI_NUMERO_RE.search(t)
+    if m:
+        return m.group(1).replace(".", "")
+    return "cp"
+
+
+def normalizar_artigo(numero: str) -> str:
+    """"155" -> "155", "121a" / "121-A" -> "121-A\""""
+    m = re.fullmatch(r"(\d+)-?([a-z])?", numero.strip().lower())
+    if not m:
+        return numero.strip().upper()
+    return m.group(1) + (f"-{m.group(2).upper()}" if m.group(2) else "")
+
+
+def extrair_citacoes(texto: str) -> List[Citacao]:
+    """Citações de artigos no texto, na ordem em que aparecem (sem repetição)"""
+    citacoes: List[Citacao] = []
+    for m in CITACAO_RE.finditer(texto):
+        numeros = _NUMEROS_RE.findall(m.group("numeros"))
+        paragrafo = None
+        if m.group("paragrafo") and len(numeros) == 1:
+            p = m.group("paragrafo").lower()
+            paragrafo = "unico" if p in ("único", "unico") else p
+            if m.group("letra"):
+                paragrafo += "-" + m.group("letra").upper()
+        lei = chave_lei(m.group("lei"))
+        for numero in numeros:
+            c = Citacao(lei, normalizar_artigo(numero), paragrafo)
+            if c not in citacoes:
+                citacoes.append(c)
+    return citacoes
+
+
+def chave_artigo(campo: str) -> str:
+    """Chave "lei:artigo" do campo "artigo" do JSON ("171", "Lei 11.343/2006 - Art. 33", ...)"""
+    m = _ARTIGO_CAMPO_RE.search(campo)
+    numero = normalizar_artigo(m.group(1) if m else campo)
+    lei = chave_lei(campo) if not campo.strip().isdigit() else "cp"
+    return f"{lei}:{numero}"
+
+
+def salvar_indice_artigos(ids: List[str], documentos: List[str], metadados: List[Dict],
+                          artigos_json: List[Dict], caminho: str = ARTICLE_INDEX_PATH):
+    """
+    Grava o índice a partir dos mesmos documentos inseridos na coleção de
+    legislação; artigos_json são os artigos do JSON de origem (para os parágrafos).
+    """
+    artigos = {}
+    for doc_id, texto, meta, artigo in zip(ids, documentos, metadados, artigos_json):
+        artigos[chave_artigo(str(artigo["artigo"]))] = {
+            "id": doc_id,
+            "content": texto,
+            "metadata": meta,
+            "paragrafos": [k.replace("paragrafo_", "").replace("_", "-")
+                           for k, v in artigo.items() if k.startswith("paragrafo_") and v],
+        }
+    caminho = Path(caminho)
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    tmp = caminho.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"versao": ARTICLE_INDEX_VERSION, "artigos": artigos}, f, ensure_ascii=False)
+    os.replace(tmp, caminho)
+    print(f"📑 Índice de artigos: {len(artigos)} artigos em {caminho}")
+
+
+class ArticleIndex:
+    """Índice (lei, artigo) -> documento; recarregado quando o arquivo muda"""
+
+    def __init__(self, caminho: str = ARTICLE_INDEX_PATH):
+        self.caminho = Path(caminho)
+        self._lock = threading.Lock()
+        self._mtime: Optional[int] = None
+        self._artigos: Dict[str, Dict] = {}
+        self._por_numero: Dict[str, List[str]] = {}
+
+    def _atualizar(self):
+        try:
+            mtime = os.stat(self.caminho).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime == self._mtime:
+            return
+        with self._lock:
+            if mtime == self._mtime:
+                return
+            artigos: Dict[str, Dict] = {}
+            if mtime is not None:
+                with open(self.caminho, "r", encoding="utf-8") as f:
+                    dados = json.load(f)
+                if dados.get("versao") == ARTICLE_INDEX_VERSION:
+                    artigos = dados["artigos"]
+            por_numero: Dict[str, List[str]] = {}
+            for chave in artigos:
+                por_numero.setdefault(chave.split(":", 1)[1], []).append(chave)
+            self._artigos, self._por_numero, self._mtime = artigos, por_numero, mtime
+
+    def __len__(self) -> int:
+        self._atualizar()
+        return len(self._artigos)
+
+    def resolver(self, citacao: Citacao) -> Optional[Dict]:
+        lei = citacao.lei or "cp"
+        entrada = self._artigos.get(f"{lei}:{citacao.artigo}")
+        if entrada is None and citacao.lei is None:
+            # "art. 33" sem lei: só vale se houver um único artigo com esse número
+            candidatos = self._por_numero.get(citacao.artigo, [])
+            if len(candidatos) == 1:
+                entrada = self._artigos[candidatos[0]]
+        return entrada
+
+    def citados(self, pergunta: str) -> List[Dict]:
+        """
+        Documentos dos artigos citados na pergunta, no formato dos resultados do
+        retrieval (origem "legislacao"), com "paragrafo_citado" quando houver.
+        """
+        self._atualizar()
+        if not self._artigos:
+            return []
+        documentos, vistos = [], set()
+        for citacao in extrair_citacoes(pergunta):
+            entrada = self.resolver(citacao)
+            if entrada is None or entrada["id"] in vistos:
+                continue
+            vistos.add(entrada["id"])
+            metadata = dict(entrada["metadata"])
+            if citacao.paragrafo and citacao.paragrafo in entrada["paragrafos"]:
+                metadata["paragrafo_citado"] = citacao.paragrafo
+            documentos.append({
+                "id": entrada["id"],
+                "content": entrada["content"],
+                "metadata": metadata,
+                "score": 0.0,
+                "origem": "legislacao",
+                "citado": True,
+            })
+        return documentos
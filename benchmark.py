@@ -0,0 +1,295 @@
+"""
+benchmark.py - Benchmark de latência por etapa do pipeline RAG
+
+Roda cada pergunta de perguntas_gabarito.csv pelo mesmo caminho das
+respostas em streaming (rag_core.StreamingAnswer: prepare_answer ->
+embed_questions -> dual_retrieve_by_vectors -> format_contexts ->
+call_ollama_stream) e lê o tempo de cada etapa dos spans do trace da
+requisição (tracing.py):
+    - embedding da pergunta
+    - filtros de metadados e artigos citados na pergunta
+    - busca em cada coleção (busca_juris / busca_lei, já incluindo a busca
+      léxica BM25 e a fusão; busca_lexica mostra só a parte léxica, somada
+      nas duas coleções)
+    - rerank com cross-encoder (se RERANKER estiver ativo)
+    - format_contexts e montagem do prompt
+    - Ollama: geração completa, e ttft (pergunta -> primeiro token)
+
+e reporta p50/p95/p99 de cada etapa. Etapas desligadas na configuração não
+geram amostras. O cache de respostas fica desligado (senão as repetições
+nem passariam pelo retrieval). O Ollama pode ser trocado por um stub HTTP
+local com latência configurável, para medir só o nosso lado.
+
+Uso:
+    python benchmark.py [--repeticoes 3] [--k-juris 3] [--k-lei 3]
+                        [--ollama-stub --stub-ttft 0.5 --stub-tokens 60 --stub-token-delay 0.02]
+
+Saída:
+    - JSON: resultados_benchmark/benchmark_YYYYMMDD_HHMMSS.json
+    - CSV:  resultados_benchmark/benchmark_YYYYMMDD_HHMMSS.csv (uma linha por etapa)
+"""
+
+import os
+import csv
+import json
+import time
+import argparse
+import threading
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, List
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PERGUNTAS_CSV = "perguntas_gabarito.csv"
+OUTPUT_DIR = Path("resultados_benchmark")
+
+# Nomes dos spans do rag_core, mais ttft e total da requisição
+STAGES = [
+    "embedding", "filtros", "artigos_citados", "busca_juris", "busca_lei", "busca_lexica",
+    "rerank", "format_contexts", "prompt", "ollama", "ttft", "total",
+]
+
+
+# ============================================================================
+# STUB DO OLLAMA
+# ============================================================================
+
+class OllamaStub:
+    """
+    Servidor HTTP local que imita o /api/generate do Ollama.
+
+    Espera `ttft` segundos antes do primeiro token e `token_delay` entre os
+    tokens seguintes; responde em streaming (NDJSON chunked) ou não.
+    """
+
+    def __init__(self, ttft: float = 0.5, tokens: int = 60, token_delay: float = 0.02):
+        self.ttft = ttft
+        self.tokens = tokens
+        self.token_delay = token_delay
+        self._server = None
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _chunk(self, data: bytes):
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                tokens = [f"token{i} " for i in range(stub.tokens)]
+
+                if not body.get("stream"):
+                    time.sleep(stub.ttft + stub.token_delay * max(0, stub.tokens - 1))
+                    data = json.dumps({"response": "".join(tokens), "done": True}).encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                time.sleep(stub.ttft)
+                for i, token in enumerate(tokens):
+                    if i:
+                        time.sleep(stub.token_delay)
+                    self._chunk((json.dumps({"response": token, "done": False}) + "\n").encode())
+                self._chunk((json.dumps({"response": "", "done": True}) + "\n").encode())
+                self.wfile.write(b"0\r\n\r\n")
+                self.wfile.flush()
+
+        return Handler
+
+    def start(self) -> str:
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+
+
+# ============================================================================
+# ESTATÍSTICAS
+# ============================================================================
+
+def percentile(values: List[float], p: float) -> float:
+    """Percentil com interpolação linear (p em 0..100)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    pos = (len(ordered) - 1) * p / 100
+    lower = int(pos)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (pos - lower)
+
+
+def summarize(samples: Dict[str, List[float]]) -> Dict[str, Dict[str, float]]:
+    summary = {}
+    for stage in STAGES:
+        values = samples.get(stage, [])
+        summary[stage] = {
+            "n": len(values),
+            "mean": sum(values) / len(values) if values else 0.0,
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+            "p99": percentile(values, 99),
+            "max": max(values) if values else 0.0,
+        }
+    return summary
+
+
+# ============================================================================
+# BENCHMARK
+# ============================================================================
+
+def load_questions(csv_path: str) -> List[str]:
+    with open(csv_path, "r", encoding="utf-8") as f:
+        return [row["pergunta"] for row in csv.DictReader(f)]
+
+
+def run_benchmark(questions: List[str], repeticoes: int, k_juris: int, k_lei: int) -> Dict[str, List[float]]:
+    """Executa o pipeline de resposta e devolve as amostras (segundos) por etapa, lidas do trace."""
+    import rag_core
+    from tracing import Tracer
+
+    rag_core.K_JURIS, rag_core.K_LEI = k_juris, k_lei
+    rag_core.ANSWER_CACHE = None
+    tracer = Tracer()
+
+    # Aquecimento: modelo de embeddings, índices HNSW e BM25, cross-encoder e conexão com o Ollama
+    if rag_core.RERANKER is not None:
+        rag_core.RERANKER.warm_up()
+    for _ in rag_core.StreamingAnswer(questions[0]):
+        pass
+
+    samples = {stage: [] for stage in STAGES}
+    total_runs = repeticoes * len(questions)
+    run = 0
+
+    for _ in range(repeticoes):
+        for question in questions:
+            run += 1
+            resposta = rag_core.StreamingAnswer(question)
+            with tracer.trace("benchmark") as trace:
+                for _token in resposta:
+                    pass
+            if resposta.error is not None:
+                print(f"   [{run}/{total_runs}] ERRO: {resposta.error} | {question[:60]}...")
+                continue
+
+            # Etapas que aparecem mais de uma vez (busca_lexica, uma por coleção) são somadas
+            por_etapa: Dict[str, float] = {}
+            for record in trace.spans:
+                if record["name"] in samples:
+                    por_etapa[record["name"]] = por_etapa.get(record["name"], 0.0) + record["duration"]
+            for stage, duration in por_etapa.items():
+                samples[stage].append(duration)
+            if resposta.time_to_first_token is not None:
+                samples["ttft"].append(resposta.time_to_first_token)
+            samples["total"].append(resposta.total_time)
+
+            print(f"   [{run}/{total_runs}] total={resposta.total_time:.3f}s "
+                  f"ttft={resposta.time_to_first_token or 0.0:.3f}s | {question[:60]}...")
+
+    return samples
+
+
+def save_results(summary: Dict, samples: Dict, config: Dict) -> Path:
+    OUTPUT_DIR.mkdir(exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    base = OUTPUT_DIR / f"benchmark_{timestamp}"
+
+    with open(base.with_suffix(".json"), "w", encoding="utf-8") as f:
+        json.dump({"config": config, "summary": summary, "samples": samples}, f, ensure_ascii=False, indent=2)
+
+    with open(base.with_suffix(".csv"), "w", newline="", encoding="utf-8") as f:
+        fieldnames = ["embedding_model", "k_juris", "k_lei", "ollama", "etapa",
+                      "n", "mean", "p50", "p95", "p99", "max"]
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        for stage, stats in summary.items():
+            writer.writerow({
+                "embedding_model": config["embedding_model"],
+                "k_juris": config["k_juris"],
+                "k_lei": config["k_lei"],
+                "ollama": config["ollama"],
+                "etapa": stage,
+                **stats,
+            })
+
+    return base
+
+
+def print_summary(summary: Dict):
+    print("\n" + "=" * 80)
+    print("LATÊNCIA POR ETAPA (ms)")
+    print("=" * 80)
+    print(f"{'Etapa':<18} {'N':<6} {'Média':<10} {'p50':<10} {'p95':<10} {'p99':<10} {'Máx':<10}")
+    print("-" * 80)
+    for stage, stats in summary.items():
+        print(f"{stage:<18} {stats['n']:<6} {stats['mean'] * 1000:<10.2f} {stats['p50'] * 1000:<10.2f} "
+              f"{stats['p95'] * 1000:<10.2f} {stats['p99'] * 1000:<10.2f} {stats['max'] * 1000:<10.2f}")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de latência por etapa do RAG")
+    parser.add_argument("--repeticoes", type=int, default=3, help="passadas sobre o conjunto de perguntas")
+    parser.add_argument("--k-juris", type=int, default=None, help="padrão: K_JURIS do .env")
+    parser.add_argument("--k-lei", type=int, default=None, help="padrão: K_LEI do .env")
+    parser.add_argument("--perguntas", default=PERGUNTAS_CSV)
+    parser.add_argument("--ollama-stub", action="store_true", help="usar stub local em vez do Ollama")
+    parser.add_argument("--stub-ttft", type=float, default=0.5, help="segundos até o primeiro token")
+    parser.add_argument("--stub-tokens", type=int, default=60, help="tokens por resposta")
+    parser.add_argument("--stub-token-delay", type=float, default=0.02, help="segundos entre tokens")
+    args = parser.parse_args()
+
+    stub = None
+    if args.ollama_stub:
+        stub = OllamaStub(ttft=args.stub_ttft, tokens=args.stub_tokens, token_delay=args.stub_token_delay)
+        # rag_core lê OLLAMA_URL na importação; o load_dotenv não sobrescreve a variável
+        os.environ["OLLAMA_URL"] = stub.start()
+        print(f"🧪 Stub do Ollama em {os.environ['OLLAMA_URL']} "
+              f"(ttft={args.stub_ttft}s, {args.stub_tokens} tokens, {args.stub_token_delay}s/token)")
+
+    import rag_core
+
+    k_juris = args.k_juris if args.k_juris is not None else rag_core.K_JURIS
+    k_lei = args.k_lei if args.k_lei is not None else rag_core.K_LEI
+    questions = load_questions(args.perguntas)
+
+    print(f"📊 Benchmark: {len(questions)} perguntas × {args.repeticoes} repetições")
+    print(f"   Embedding: {rag_core.EMBED_MODEL_NAME} | K_JURIS={k_juris} K_LEI={k_lei}")
+
+    try:
+        samples = run_benchmark(questions, args.repeticoes, k_juris, k_lei)
+    finally:
+        if stub is not None:
+            stub.stop()
+
+    summary = summarize(samples)
+    config = {
+        "embedding_model": rag_core.EMBED_MODEL_NAME,
+        "k_juris": k_juris,
+        "k_lei": k_lei,
+        "ollama": "stub" if stub is not None else rag_core.OLLAMA_MODEL,
+        "stub": {"ttft": args.stub_ttft, "tokens": args.stub_tokens, "token_delay": args.stub_token_delay}
+        if stub is not None else None,
+        "repeticoes": args.repeticoes,
+        "n_perguntas": len(questions),
+    }
+    print_summary(summary)
+    base = save_results(summary, samples, config)
+    print(f"\n✅ Resultados salvos em: {base.with_suffix('.json')} e {base.with_suffix('.csv')}\n")
@@ -0,0 +1,169 @@
+"""
+benchmark_embedding_backends.py - Paridade e latência dos backends de embedding de consulta
+
+Compara cada backend de embedding_backends.py (onnx, onnx-int8) com o
+backend de referência (torch) sobre as perguntas de perguntas_gabarito.csv:
+    - paridade dos vetores: similaridade de cosseno com o vetor de referência
+    - paridade da busca: sobreposição dos top-k ids nas coleções de
+      jurisprudência e de legislação, e fração de perguntas com o top-k
+      idêntico (mesma ordem)
+    - latência: carga do backend (imports + modelo) e p50/p95 do embedding
+      de uma pergunta por vez e do lote inteiro
+
+Uso:
+    python benchmark_embedding_backends.py [--backends onnx onnx-int8] [--k 5]
+                                           [--repeticoes 3] [--min-cosseno 0.99] [--min-sobreposicao 0.9]
+
+Saída:
+    - JSON: resultados_benchmark/embedding_backends_YYYYMMDD_HHMMSS.json
+
+Sai com código 1 se algum backend ficar abaixo dos limites de paridade.
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, List
+
+import numpy as np
+import chromadb
+from dotenv import load_dotenv
+
+from embedding_backends import BACKENDS, criar_embeddings
+
+load_dotenv()
+
+PERGUNTAS_CSV = "perguntas_gabarito.csv"
+OUTPUT_DIR = Path("resultados_benchmark")
+CHROMA_PATH = os.getenv("CHROMA_PATH", "./vectordb/chroma")
+COLECOES = ["jurisprudencia_br_v1", "legislacao_codigo_penal"]
+
+
+def load_questions(csv_path: str) -> List[str]:
+    with open(csv_path, "r", encoding="utf-8") as f:
+        return [row["pergunta"] for row in csv.DictReader(f)]
+
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = (len(ordered) - 1) * p / 100
+    lo, hi = int(idx), min(int(idx) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (idx - lo)
+
+
+def medir_backend(backend: str, perguntas: List[str], repeticoes: int) -> Dict:
+    inicio = time.perf_counter()
+    embeddings = criar_embeddings(backend)
+    carga = time.perf_counter() - inicio
+
+    embeddings.embed_documents(perguntas[:1])  # aquecimento
+    por_pergunta, lote = [], []
+    vetores = None
+    for _ in range(repeticoes):
+        for p in perguntas:
+            t0 = time.perf_counter()
+            embeddings.embed_documents([p])
+            por_pergunta.append(time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        vetores = np.asarray(embeddings.embed_documents(perguntas), dtype=np.float32)
+        lote.append(time.perf_counter() - t0)
+
+    return {
+        "backend": backend,
+        "segundos_carga": carga,
+        "pergunta_p50_ms": percentile(por_pergunta, 50) * 1000,
+        "pergunta_p95_ms": percentile(por_pergunta, 95) * 1000,
+        "lote_ms": min(lote) * 1000,
+        "vetores": vetores,
+    }
+
+
+def buscar_ids(colecoes, vetores: np.ndarray, k: int) -> Dict[str, List[List[str]]]:
+    return {
+        nome: col.query(query_embeddings=vetores.tolist(), n_results=k, include=[])["ids"]
+        for nome, col in colecoes.items()
+    }
+
+
+def comparar(referencia: Dict, candidato: Dict, ids_ref: Dict, ids_cand: Dict) -> Dict:
+    a, b = referencia["vetores"], candidato["vetores"]
+    cos = (a * b).sum(axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+    paridade = {"cosseno_medio": float(cos.mean()), "cosseno_min": float(cos.min())}
+    for nome in ids_ref:
+        sobreposicao = [
+            len(set(r) & set(c)) / max(len(r), 1) for r, c in zip(ids_ref[nome], ids_cand[nome])
+        ]
+        identicos = sum(r == c for r, c in zip(ids_ref[nome], ids_cand[nome]))
+        paridade[nome] = {
+            "sobreposicao_media": float(np.mean(sobreposicao)) if sobreposicao else 1.0,
+            "topk_identico": identicos / max(len(ids_ref[nome]), 1),
+        }
+    return paridade
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Paridade e latência dos backends de embedding")
+    parser.add_argument("--backends", nargs="+", default=["onnx", "onnx-int8"], choices=BACKENDS)
+    parser.add_argument("--referencia", default="torch", choices=BACKENDS)
+    parser.add_argument("--perguntas", default=PERGUNTAS_CSV)
+    parser.add_argument("--k", type=int, default=5, help="top-k comparado em cada coleção")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--min-cosseno", type=float, default=0.99)
+    parser.add_argument("--min-sobreposicao", type=float, default=0.9)
+    args = parser.parse_args()
+
+    perguntas = load_questions(args.perguntas)
+    client = chromadb.PersistentClient(path=CHROMA_PATH)
+    colecoes = {nome: client.get_collection(nome) for nome in COLECOES}
+    print(f"📊 {len(perguntas)} perguntas | modelo {os.getenv('EMBED_MODEL_NAME')} | "
+          f"referência {args.referencia} | top-{args.k}")
+
+    referencia = medir_backend(args.referencia, perguntas, args.repeticoes)
+    ids_ref = buscar_ids(colecoes, referencia["vetores"], args.k)
+
+    resultados, falhas = [referencia], []
+    for backend in args.backends:
+        r = medir_backend(backend, perguntas, args.repeticoes)
+        r["paridade"] = comparar(referencia, r, ids_ref, buscar_ids(colecoes, r["vetores"], args.k))
+        resultados.append(r)
+        sobreposicao = min(r["paridade"][nome]["sobreposicao_media"] for nome in COLECOES)
+        if r["paridade"]["cosseno_min"] < args.min_cosseno or sobreposicao < args.min_sobreposicao:
+            falhas.append(backend)
+
+    print("\n" + "=" * 96)
+    print(f"{'Backend':<12} {'Carga (s)':<11} {'p50 (ms)':<10} {'p95 (ms)':<10} {'Lote (ms)':<11} "
+          f"{'Cos. mín':<10} {'Sobrep. juris':<15} {'Sobrep. lei':<12}")
+    print("-" * 96)
+    for r in resultados:
+        par = r.get("paridade")
+        colunas = (f"{par['cosseno_min']:<10.4f} {par[COLECOES[0]]['sobreposicao_media']:<15.3f} "
+                   f"{par[COLECOES[1]]['sobreposicao_media']:<12.3f}") if par else "(referência)"
+        print(f"{r['backend']:<12} {r['segundos_carga']:<11.2f} {r['pergunta_p50_ms']:<10.2f} "
+              f"{r['pergunta_p95_ms']:<10.2f} {r['lote_ms']:<11.1f} {colunas}")
+    print("=" * 96)
+
+    for r in resultados:
+        r.pop("vetores")
+    OUTPUT_DIR.mkdir(exist_ok=True)
+    caminho = OUTPUT_DIR / f"embedding_backends_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    config = {"modelo": os.getenv("EMBED_MODEL_NAME"), "perguntas": len(perguntas), "k": args.k,
+              "repeticoes": args.repeticoes, "min_cosseno": args.min_cosseno,
+              "min_sobreposicao": args.min_sobreposicao}
+    with open(caminho, "w", encoding="utf-8") as f:
+        json.dump({"config": config, "resultados": resultados, "falhas": falhas}, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ Resultados salvos em: {caminho}")
+
+    if falhas:
+        print(f"❌ Abaixo dos limites de paridade: {', '.join(falhas)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
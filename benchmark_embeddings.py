@@ -0,0 +1,126 @@
+"""
+benchmark_embeddings.py - Vazão do embedding em 1 vs N processos
+
+Embeda o mesmo conjunto de chunks com EncoderMultiprocesso para cada número
+de workers pedido e reporta docs/s, aceleração em relação ao primeiro e a
+maior diferença entre os vetores (devem ser iguais, a menos de ruído de
+ponto flutuante). O tempo de carga dos modelos é medido à parte.
+
+Textos: chunks de --chunks (padrão dados_sanitizados/chunks), com o prefixo
+"passage: " usado pelo create_db_jurisprudencia, ou um corpus sintético.
+
+Uso:
+    python benchmark_embeddings.py [--workers 1 4 8] [--max-docs 2000] [--repeticoes 2]
+
+Saída:
+    - JSON: resultados_benchmark/embeddings_YYYYMMDD_HHMMSS.json
+"""
+
+import os
+import json
+import time
+import random
+import argparse
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, List
+
+import numpy as np
+from dotenv import load_dotenv
+
+from corpus_store import ler_chunks, listar_arquivos_chunks
+from embedding_workers import EncoderMultiprocesso, EMBED_BATCH_SIZE
+
+load_dotenv()
+
+OUTPUT_DIR = Path("resultados_benchmark")
+
+
+def corpus_sintetico(n: int, seed: int = 17) -> List[str]:
+    rnd = random.Random(seed)
+    palavras = ("réu", "pena", "furto", "roubo", "tráfico", "apelação", "regime", "dosimetria",
+                "insignificância", "reincidência", "acórdão", "tribunal", "recurso", "provido")
+    return [
+        "passage: " + " ".join(rnd.choice(palavras) for _ in range(rnd.randint(60, 300)))
+        for _ in range(n)
+    ]
+
+
+def carregar_textos(dir_chunks: str, max_docs: int) -> List[str]:
+    textos: List[str] = []
+    for arquivo in listar_arquivos_chunks(Path(dir_chunks)) if Path(dir_chunks).exists() else []:
+        for item in ler_chunks(arquivo):
+            if (item.get("texto") or "").strip():
+                textos.append("passage: " + item["texto"])
+            if len(textos) >= max_docs:
+                return textos
+    return textos
+
+
+def medir(model_name: str, textos: List[str], workers: int, repeticoes: int, batch_size: int) -> Dict:
+    with EncoderMultiprocesso(model_name, workers=workers, batch_size=batch_size) as encoder:
+        tempos = []
+        vetores = None
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            vetores = encoder.encode(textos)
+            tempos.append(time.perf_counter() - inicio)
+        melhor = min(tempos)
+        return {
+            "workers": encoder.workers,
+            "threads_por_worker": encoder.threads_por_worker,
+            "segundos_carga": encoder.segundos_carga,
+            "segundos": melhor,
+            "docs_por_segundo": len(textos) / melhor if melhor else 0.0,
+            "vetores": vetores,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vazão do embedding em 1 vs N processos")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1],
+                        help="números de workers a comparar (0 = todos os núcleos)")
+    parser.add_argument("--chunks", default="dados_sanitizados/chunks")
+    parser.add_argument("--max-docs", type=int, default=2000)
+    parser.add_argument("--repeticoes", type=int, default=2, help="vale o melhor tempo")
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE)
+    args = parser.parse_args()
+
+    model_name = os.getenv("EMBED_MODEL_NAME")
+    textos = carregar_textos(args.chunks, args.max_docs) or corpus_sintetico(args.max_docs)
+    print(f"📊 Embeddings: {len(textos)} textos | modelo {model_name} | "
+          f"{os.cpu_count()} núcleos | batch {args.batch_size}")
+
+    resultados = []
+    referencia = None
+    for workers in args.workers:
+        r = medir(model_name, textos, workers, args.repeticoes, args.batch_size)
+        vetores = r.pop("vetores")
+        if referencia is None:
+            referencia = vetores
+        r["max_diferenca"] = float(np.abs(vetores - referencia).max()) if len(textos) else 0.0
+        resultados.append(r)
+        print(f"   {r['workers']:>3} workers × {r['threads_por_worker']:>2} threads: "
+              f"{r['docs_por_segundo']:8.1f} docs/s (carga {r['segundos_carga']:.1f}s)")
+
+    base = resultados[0]["docs_por_segundo"]
+    print("\n" + "=" * 72)
+    print(f"{'Workers':<10} {'Threads':<10} {'docs/s':<12} {'Aceleração':<12} {'Máx. dif.':<12}")
+    print("-" * 72)
+    for r in resultados:
+        r["aceleracao"] = r["docs_por_segundo"] / base if base else 0.0
+        print(f"{r['workers']:<10} {r['threads_por_worker']:<10} {r['docs_por_segundo']:<12.1f} "
+              f"{r['aceleracao']:<12.2f} {r['max_diferenca']:<12.2e}")
+    print("=" * 72)
+
+    OUTPUT_DIR.mkdir(exist_ok=True)
+    caminho = OUTPUT_DIR / f"embeddings_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    config = {"modelo": model_name, "docs": len(textos), "cpus": os.cpu_count(),
+              "repeticoes": args.repeticoes, "batch_size": args.batch_size}
+    with open(caminho, "w", encoding="utf-8") as f:
+        json.dump({"config": config, "resultados": resultados}, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ Resultados salvos em: {caminho}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+benchmark_rerank.py - Qualidade e latência do rerank com cross-encoder
+
+Para cada pergunta de perguntas_gabarito.csv, roda o retrieval do rag_core
+sem rerank e com rerank (um ou mais orçamentos de latência) e compara:
+    - qualidade: precision/recall/F1 de legislação e jurisprudência (como no
+      test.py) sobre os trechos que cabem no contexto (format_contexts)
+    - latência: p50/p95 do retrieval completo e da etapa de rerank, fração
+      de requisições truncadas pelo orçamento e acertos do cache de scores
+
+A primeira passada de cada configuração é fria (cache de scores vazio); as
+seguintes medem o efeito do cache.
+
+Uso:
+    python benchmark_rerank.py [--orcamentos 150 300 1000] [--candidatos 12] [--repeticoes 2]
+
+Saída:
+    - JSON: resultados_benchmark/rerank_YYYYMMDD_HHMMSS.json
+"""
+
+import json
+import time
+import argparse
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import rag_core
+from tracing import Tracer
+from reranker import CrossEncoderReranker, RERANK_MODEL, RERANK_CANDIDATES
+from test import load_questions, extract_retrieved_ids, calculate_metrics
+from benchmark import percentile
+
+PERGUNTAS_CSV = "perguntas_gabarito.csv"
+OUTPUT_DIR = Path("resultados_benchmark")
+
+
+def media(valores: List[Optional[float]]) -> Optional[float]:
+    valores = [v for v in valores if v is not None]
+    return sum(valores) / len(valores) if valores else None
+
+
+def rodar_configuracao(nome: str, reranker: Optional[CrossEncoderReranker], perguntas: List[Dict],
+                       repeticoes: int) -> Dict:
+    rag_core.RERANKER = reranker
+    tracer = Tracer()
+    amostras = {"retrieval": [], "rerank": [], "truncado": [], "cache_hits": [], "candidatos": []}
+    qualidade = {"f1_lei": [], "f1_juris": [], "recall_lei": [], "recall_juris": [], "docs_usados": []}
+
+    for rep in range(repeticoes):
+        for q in perguntas:
+            with tracer.trace("benchmark_rerank") as trace:
+                t0 = time.perf_counter()
+                retrieved = rag_core.dual_retrieve(q["pergunta"], k_juris=rag_core.K_JURIS, k_lei=rag_core.K_LEI)
+                amostras["retrieval"].append(time.perf_counter() - t0)
+            for span in trace.spans:
+                if span["name"] == "rerank":
+                    amostras["rerank"].append(span["duration"])
+                    amostras["truncado"].append(1.0 if span.get("truncado") else 0.0)
+                    amostras["cache_hits"].append(span.get("cache_hits", 0))
+                    amostras["candidatos"].append(span.get("candidatos", 0))
+
+            if rep == 0:
+                # Qualidade do que entra no prompt (não muda entre repetições)
+                _, usados = rag_core.format_contexts(retrieved, question=q["pergunta"])
+                artigos, juris = extract_retrieved_ids(usados)
+                lei = calculate_metrics(artigos, q["artigos_relevantes"])
+                jur = calculate_metrics(juris, q["juris_relevantes"])
+                qualidade["f1_lei"].append(lei["f1"])
+                qualidade["recall_lei"].append(lei["recall"])
+                qualidade["f1_juris"].append(jur["f1"])
+                qualidade["recall_juris"].append(jur["recall"])
+                qualidade["docs_usados"].append(len(usados))
+
+    resumo = {
+        "configuracao": nome,
+        "retrieval_p50_ms": percentile(amostras["retrieval"], 50) * 1000,
+        "retrieval_p95_ms": percentile(amostras["retrieval"], 95) * 1000,
+        "rerank_p50_ms": percentile(amostras["rerank"], 50) * 1000 if amostras["rerank"] else None,
+        "rerank_p95_ms": percentile(amostras["rerank"], 95) * 1000 if amostras["rerank"] else None,
+        "truncadas": media(amostras["truncado"]),
+        "cache_hits_medio": media(amostras["cache_hits"]),
+    }
+    resumo.update({k: media(v) for k, v in qualidade.items()})
+    return resumo
+
+
+def fmt(v: Optional[float], casas: int = 2) -> str:
+    return "-" if v is None else f"{v:.{casas}f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Qualidade e latência do rerank com cross-encoder")
+    parser.add_argument("--perguntas", default=PERGUNTAS_CSV)
+    parser.add_argument("--modelo", default=RERANK_MODEL)
+    parser.add_argument("--orcamentos", type=float, nargs="+", default=[150, 300, 1000], help="ms por requisição")
+    parser.add_argument("--candidatos", type=int, default=RERANK_CANDIDATES, help="por coleção")
+    parser.add_argument("--repeticoes", type=int, default=2, help="a partir da 2ª, com cache de scores")
+    args = parser.parse_args()
+
+    perguntas = load_questions(args.perguntas)
+    rag_core.RERANK_CANDIDATES = args.candidatos
+    print(f"📊 Rerank: {len(perguntas)} perguntas × {args.repeticoes} repetições | modelo {args.modelo} | "
+          f"{args.candidatos} candidatos por coleção | K_JURIS={rag_core.K_JURIS} K_LEI={rag_core.K_LEI}")
+
+    # Aquecimento: embeddings, Chroma e o próprio cross-encoder
+    rag_core.dual_retrieve(perguntas[0]["pergunta"])
+    modelo = CrossEncoderReranker(args.modelo)
+    modelo.warm_up()
+
+    resultados = [rodar_configuracao("sem rerank", None, perguntas, args.repeticoes)]
+    for orcamento in args.orcamentos:
+        reranker = CrossEncoderReranker(args.modelo, budget_ms=orcamento)
+        reranker._model = modelo._model  # mesmo modelo, cache de scores vazio
+        resultados.append(rodar_configuracao(f"rerank {orcamento:g}ms", reranker, perguntas, args.repeticoes))
+
+    print("\n" + "=" * 110)
+    print(f"{'Configuração':<16} {'F1 lei':<8} {'F1 juris':<9} {'R lei':<7} {'R juris':<8} {'Docs':<6} "
+          f"{'Retr. p50':<10} {'Retr. p95':<10} {'Rerank p95':<11} {'Truncadas':<10} {'Cache':<6}")
+    print("-" * 110)
+    for r in resultados:
+        print(f"{r['configuracao']:<16} {fmt(r['f1_lei']):<8} {fmt(r['f1_juris']):<9} {fmt(r['recall_lei']):<7} "
+              f"{fmt(r['recall_juris']):<8} {fmt(r['docs_usados'], 1):<6} {fmt(r['retrieval_p50_ms'], 1):<10} "
+              f"{fmt(r['retrieval_p95_ms'], 1):<10} {fmt(r['rerank_p95_ms'], 1):<11} "
+              f"{fmt(r['truncadas']):<10} {fmt(r['cache_hits_medio'], 1):<6}")
+    print("=" * 110)
+
+    OUTPUT_DIR.mkdir(exist_ok=True)
+    caminho = OUTPUT_DIR / f"rerank_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    config = {"modelo": args.modelo, "perguntas": len(perguntas), "candidatos": args.candidatos,
+              "orcamentos_ms": args.orcamentos, "repeticoes": args.repeticoes,
+              "k_juris": rag_core.K_JURIS, "k_lei": rag_core.K_LEI}
+    with open(caminho, "w", encoding="utf-8") as f:
+        json.dump({"config": config, "resultados": resultados}, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ Resultados salvos em: {caminho}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""
+benchmark_sanitizacao.py - Micro-benchmark e verificação de paridade da sanitização
+
+Compara com as implementações originais, mantidas aqui como referência:
+    - sanitizar_texto (regex única pré-compilada + normalização numa só passada)
+    - classificar_crime / detectar_crime (varredura única com lookahead)
+
+Para cada um:
+    - paridade: a saída precisa ser idêntica para todo o corpus e para textos
+      aleatórios (espaços, tabs, quebras, NBSP e linhas de ruído; palavras-chave
+      repetidas, prefixas e sobrepostas)
+    - tempo: melhor de N repetições sobre o corpus inteiro
+
+Corpus: texto extraído dos PDFs de --pdfs, ou texto_integral dos JSONs em
+--acordaos (padrão dados_sanitizados/acordaos), ou um corpus sintético.
+
+Uso:
+    python benchmark_sanitizacao.py [--pdfs DIR] [--acordaos DIR] [--repeticoes 5] [--aleatorios 2000]
+
+Sai com código 1 se alguma saída divergir.
+"""
+
+import re
+import sys
+import json
+import time
+import random
+import argparse
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sanitaze import SanitizadorJurisprudencia, compilar_keywords_crimes
+
+
+# ============================================================================
+# IMPLEMENTAÇÃO ORIGINAL (referência)
+# ============================================================================
+
+def sanitizar_texto_legado(texto: str) -> str:
+    """sanitizar_texto antes da regex combinada: 11 re.search por linha + 4 re.sub"""
+    linhas = texto.splitlines()
+    linhas_limpas = []
+
+    for l in linhas:
+        descartar = False
+        for pattern in SanitizadorJurisprudencia.NOISE_PATTERNS:
+            if re.search(pattern, l, flags=re.IGNORECASE):
+                descartar = True
+                break
+
+        if descartar:
+            continue
+
+        if l.strip() and len(l.strip()) <= 2:
+            continue
+
+        linhas_limpas.append(l)
+
+    texto = "\n".join(linhas_limpas)
+
+    texto = re.sub(r'\u00a0', ' ', texto)
+    texto = re.sub(r'[ \t]+', ' ', texto)
+    texto = re.sub(r'\n[ \t]+', '\n', texto)
+    texto = re.sub(r'\n{3,}', '\n\n', texto)
+
+    return texto.strip()
+
+
+def classificar_crime_legado(texto: str, crimes_keywords: Dict[str, List[str]] = None) -> Tuple[Optional[str], Dict[str, int]]:
+    """detectar_crime antes da varredura única: um re.findall por palavra-chave"""
+    crimes_keywords = crimes_keywords or SanitizadorJurisprudencia.CRIMES_KEYWORDS
+    t = texto.lower()
+    scores = {}
+
+    for crime, kws in crimes_keywords.items():
+        score = 0
+        for kw in kws:
+            score += len(re.findall(r'\b' + re.escape(kw) + r'\b', t))
+        if score > 0:
+            scores[crime] = score
+
+    return (max(scores, key=scores.get) if scores else None), scores
+
+
+class SanitizadorPrefixos(SanitizadorJurisprudencia):
+    """Palavras-chave artificiais: prefixos, sobreposição e palavra repetida entre crimes"""
+    CRIMES_KEYWORDS = {
+        'A': ['lei', 'lei de drogas', 'a a', 'art. 1'],
+        'B': ['lei de', 'art.', 'droga', 'a a a'],
+        'C': ['drogas', 'lei'],
+    }
+    CRIMES_RE, CRIMES_CONTAGEM = compilar_keywords_crimes(CRIMES_KEYWORDS)
+
+
+# ============================================================================
+# CORPUS
+# ============================================================================
+
+LINHAS_RUIDO = [
+    "Baixado do vLex em 12/03/2024", "  © Copyright 2024 vLex", "Cópia exclusiva para uso pessoal",
+    "vLex Document Id: VLEX-123456", "Link: https://vlex.com.br/vid/123", "05 de dezembro de 2017 14:32",
+    " 3 / 12 ", "vLex", "RESUMO", "-----", "Página 2 de 10", "ab", " x ",
+]
+LINHAS_TEXTO = [
+    "Ementa: PENAL. FURTO. PRINCÍPIO DA INSIGNIFICÂNCIA.",
+    "Superior Tribunal de Justiça - Quinta Turma",
+    "\tRelator: Ministro Fulano de Tal",
+    "A conduta  do réu\u00a0não se amolda ao tipo penal do art. 155.",
+    "- O tráfico de drogas (Lei 11.343) exige prova da destinação comercial.",
+    "Acordam os Ministros   da Quinta Turma, por unanimidade,\t negar provimento.",
+    "Link para o processo no tribunal de origem",
+    "12 / 2019 foi o ano do fato",
+]
+
+
+def corpus_sintetico(n: int = 300, seed: int = 13) -> List[str]:
+    rng = random.Random(seed)
+    docs = []
+    for _ in range(n):
+        linhas = []
+        for _ in range(rng.randint(40, 200)):
+            r = rng.random()
+            if r < 0.15:
+                linhas.append(rng.choice(LINHAS_RUIDO))
+            elif r < 0.25:
+                linhas.append(rng.choice(["", " ", "\t", "  \u00a0 "]))
+            else:
+                linhas.append(rng.choice(LINHAS_TEXTO))
+        docs.append("\n".join(linhas))
+    return docs
+
+
+def textos_aleatorios(n: int, seed: int = 7) -> List[str]:
+    """Textos curtos só com os caracteres que as normalizações tocam"""
+    rng = random.Random(seed)
+    alfabeto = [" ", "\t", "\n", "\u00a0", "\r", "a", "b", "vLex", "Resumo", "1 / 2", "---", "©"]
+    return ["".join(rng.choice(alfabeto) for _ in range(rng.randint(0, 40))) for _ in range(n)]
+
+
+def textos_crimes_aleatorios(n: int, crimes_keywords: Dict[str, List[str]], seed: int = 11) -> List[str]:
+    """Sequências de palavras-chave (com variações de caixa) e separadores"""
+    rng = random.Random(seed)
+    pecas = [kw for kws in crimes_keywords.values() for kw in kws]
+    pecas += [kw.upper() for kw in pecas] + [" ", " ", ".", "s", "x", "-", "\n", "a", " de "]
+    return ["".join(rng.choice(pecas) for _ in range(rng.randint(0, 30))) for _ in range(n)]
+
+
+def carregar_corpus(pdfs: str, acordaos: str) -> List[str]:
+    if pdfs:
+        sanitizador = SanitizadorJurisprudencia()
+        textos = [sanitizador.extrair_texto_pdf(str(p)) for p in sorted(Path(pdfs).rglob("*.pdf"))]
+        print(f"📄 Corpus: {len(textos)} PDFs de {pdfs}")
+        return [t for t in textos if t]
+
+    dir_acordaos = Path(acordaos)
+    arquivos = sorted(dir_acordaos.glob("*.json")) if dir_acordaos.exists() else []
+    if arquivos:
+        textos = []
+        for arquivo in arquivos:
+            with open(arquivo, "r", encoding="utf-8") as f:
+                textos.append(json.load(f).get("texto_integral") or "")
+        print(f"📄 Corpus: {len(textos)} acórdãos de {dir_acordaos}")
+        return textos
+
+    print("📄 Corpus: sintético (sem PDFs nem acórdãos disponíveis)")
+    return corpus_sintetico()
+
+
+# ============================================================================
+# BENCHMARK
+# ============================================================================
+
+def verificar_paridade(textos: List[str], atual: Callable, legado: Callable = sanitizar_texto_legado) -> int:
+    divergencias = 0
+    for i, texto in enumerate(textos):
+        esperado, obtido = legado(texto), atual(texto)
+        if esperado != obtido:
+            divergencias += 1
+            if divergencias <= 5:
+                print(f"   ❌ Divergência no texto #{i}: {texto[:80]!r}")
+                print(f"      legado: {str(esperado)[:120]!r}")
+                print(f"      atual:  {str(obtido)[:120]!r}")
+    return divergencias
+
+
+def medir(funcao: Callable, textos: List[str], repeticoes: int) -> float:
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        for texto in textos:
+            funcao(texto)
+        melhor = min(melhor, time.perf_counter() - t0)
+    return melhor
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark e paridade da sanitização de texto")
+    parser.add_argument("--pdfs", default=None, help="diretório com PDFs (texto bruto extraído)")
+    parser.add_argument("--acordaos", default="dados_sanitizados/acordaos")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--aleatorios", type=int, default=2000, help="textos aleatórios extras na paridade")
+    args = parser.parse_args()
+
+    textos = carregar_corpus(args.pdfs, args.acordaos)
+    sanitizador = SanitizadorJurisprudencia()
+    prefixos = SanitizadorPrefixos()
+    divergencias = 0
+
+    print("🔎 Verificando paridade com as implementações originais...")
+    d = verificar_paridade(textos + textos_aleatorios(args.aleatorios), sanitizador.sanitizar_texto)
+    print(f"   sanitizar_texto:   {'✅ idêntico' if not d else f'❌ {d} divergências'} "
+          f"({len(textos)} documentos + {args.aleatorios} aleatórios)")
+    divergencias += d
+
+    d = verificar_paridade(
+        textos + textos_crimes_aleatorios(args.aleatorios, sanitizador.CRIMES_KEYWORDS),
+        sanitizador.classificar_crime, classificar_crime_legado
+    )
+    d += verificar_paridade(
+        textos_crimes_aleatorios(args.aleatorios, prefixos.CRIMES_KEYWORDS),
+        prefixos.classificar_crime, lambda t: classificar_crime_legado(t, prefixos.CRIMES_KEYWORDS)
+    )
+    print(f"   classificar_crime: {'✅ idêntico' if not d else f'❌ {d} divergências'} "
+          f"({len(textos)} documentos + {2 * args.aleatorios} aleatórios, incl. palavras-chave prefixas)")
+    divergencias += d
+
+    megabytes = sum(len(t.encode("utf-8")) for t in textos) / 1e6
+    limpos = [sanitizador.sanitizar_texto(t) for t in textos]
+    medicoes = [
+        ("sanitizar_texto", sanitizar_texto_legado, sanitizador.sanitizar_texto, textos),
+        ("classificar_crime", classificar_crime_legado, sanitizador.classificar_crime, limpos),
+    ]
+
+    print("\n" + "=" * 60)
+    print(f"TEMPOS ({len(textos)} documentos, {megabytes:.1f} MB, melhor de {args.repeticoes})")
+    print("=" * 60)
+    for nome, legado, atual, entrada in medicoes:
+        t_legado = medir(legado, entrada, args.repeticoes)
+        t_atual = medir(atual, entrada, args.repeticoes)
+        print(f"{nome}")
+        print(f"   Legado: {t_legado * 1000:10.1f} ms  ({megabytes / t_legado:6.1f} MB/s)")
+        print(f"   Atual:  {t_atual * 1000:10.1f} ms  ({megabytes / t_atual:6.1f} MB/s)")
+        print(f"   Speedup: {t_legado / t_atual:.2f}x")
+    print("=" * 60)
+
+    sys.exit(1 if divergencias else 0)
@@ -0,0 +1,173 @@
+"""
+chunker.py - Divisão de texto em chunks por tokens reais do modelo de embeddings
+
+Os chunks respeitam parágrafos e frases, cabem no limite de tokens do modelo
+(512 no e5, contando o prefixo "passage: " e os tokens especiais) e podem ter
+sobreposição. Cada chunk é um trecho exato do texto original, identificado
+pelos offsets [inicio, fim).
+
+A contagem usa o tokenizer do EMBED_MODEL_NAME (transformers.AutoTokenizer,
+carregado sob demanda). Sem transformers ou sem o modelo, cai numa estimativa
+conservadora por palavras.
+"""
+import os
+import re
+from bisect import bisect_left
+from typing import List, Optional, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+EMBED_MODEL_NAME = os.getenv("EMBED_MODEL_NAME")
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "512"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "64"))
+# Prefixo que create_db_jurisprudencia acrescenta antes de embedar (modelos e5)
+PASSAGE_PREFIX = "passage: "
+
+# Parágrafos: separados por linha em branco. Frases: pontuação final seguida de
+# espaço e início de frase (maiúscula, aspas, parêntese). "art. 155" não quebra.
+_PARAGRAFO_RE = re.compile(r'\S(?:[^\n]|\n(?![ \t]*\n))*')
+_FIM_FRASE_RE = re.compile(r'(?<=[.!?;])["”\')]*\s+(?=["“(A-ZÁÉÍÓÚÂÊÔÃÕÇ])')
+_PALAVRA_RE = re.compile(r'\w+|[^\w\s]')
+
+
+class ContadorTokens:
+    """
+    Posições (offset do primeiro caractere) de cada token de um texto.
+
+    Com as posições, o número de tokens de qualquer trecho [a, b) sai por
+    busca binária, sem retokenizar: os cortes dos chunks caem sempre em
+    espaço, onde os tokens do texto inteiro e do trecho isolado coincidem.
+    """
+
+    def __init__(self, model_name: Optional[str] = EMBED_MODEL_NAME):
+        self.model_name = model_name
+        self._tokenizer = None
+        self._carregado = False
+        self.especiais = 2  # <s> </s> / [CLS] [SEP]
+
+    @property
+    def tokenizer(self):
+        if not self._carregado:
+            self._carregado = True
+            try:
+                from transformers import AutoTokenizer
+                tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+                if tokenizer.is_fast:
+                    self._tokenizer = tokenizer
+                    self.especiais = tokenizer.num_special_tokens_to_add()
+                else:
+                    print(f"[AVISO] Tokenizer de {self.model_name} sem offsets; usando estimativa por palavras")
+            except Exception as e:
+                print(f"[AVISO] Tokenizer indisponível ({e}); usando estimativa por palavras")
+        return self._tokenizer
+
+    @property
+    def exato(self) -> bool:
+        return self.tokenizer is not None
+
+    def posicoes(self, texto: str) -> List[int]:
+        tokenizer = self.tokenizer
+        if tokenizer is not None:
+            offsets = tokenizer(
+                texto, add_special_tokens=False, return_offsets_mapping=True, verbose=False
+            )["offset_mapping"]
+            return [inicio for inicio, _ in offsets]
+
+        # Estimativa: palavras longas valem mais de um token (subpalavras)
+        posicoes = []
+        for m in _PALAVRA_RE.finditer(texto):
+            posicoes.extend([m.start()] * (1 + len(m.group(0)) // 6))
+        return posicoes
+
+    def contar(self, texto: str) -> int:
+        return len(self.posicoes(texto))
+
+
+def _unidades(texto: str) -> List[Tuple[int, int, bool]]:
+    """Frases do texto como (inicio, fim, termina_paragrafo)"""
+    unidades = []
+    for paragrafo in _PARAGRAFO_RE.finditer(texto):
+        inicio = paragrafo.start()
+        for corte in _FIM_FRASE_RE.finditer(texto, paragrafo.start(), paragrafo.end()):
+            unidades.append((inicio, corte.start(), False))
+            inicio = corte.end()
+        fim = paragrafo.end()
+        while fim > inicio and texto[fim - 1].isspace():
+            fim -= 1
+        if fim > inicio:
+            unidades.append((inicio, fim, True))
+    return unidades
+
+
+def dividir_em_chunks(texto: str, contador: ContadorTokens, max_tokens: int = CHUNK_MAX_TOKENS,
+                      overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+                      prefixo: str = PASSAGE_PREFIX) -> List[Tuple[int, int]]:
+    """
+    Divide o texto em trechos [inicio, fim) de até max_tokens tokens, já
+    descontados o prefixo e os tokens especiais.
+
+    Os chunks terminam em fim de frase (de preferência em fim de parágrafo,
+    se houver um no último quarto do chunk); frases maiores que o limite são
+    quebradas em espaço. Cada chunk repete as últimas frases do anterior,
+    até overlap_tokens tokens.
+    """
+    posicoes = contador.posicoes(texto)
+    limite = max(1, max_tokens - contador.contar(prefixo) - contador.especiais)
+    overlap_tokens = min(max(0, overlap_tokens), limite // 2)
+
+    def tokens(a: int, b: int) -> int:
+        return bisect_left(posicoes, b) - bisect_left(posicoes, a)
+
+    # Frases que não cabem sozinhas são quebradas em espaço antes de empacotar
+    unidades = []
+    for inicio, fim, fim_paragrafo in _unidades(texto):
+        while tokens(inicio, fim) > limite:
+            # Início do primeiro token que não cabe; recua até o espaço anterior
+            idx = bisect_left(posicoes, inicio) + limite
+            corte = posicoes[idx]
+            espaco = max(texto.rfind(" ", inicio, corte), texto.rfind("\n", inicio, corte))
+            if espaco > inicio:
+                corte = espaco
+            elif corte <= inicio:
+                # "Palavra" sem espaço maior que o limite (só na estimativa): fica inteira
+                break
+            unidades.append((inicio, corte, False))
+            inicio = corte
+            while inicio < fim and texto[inicio].isspace():
+                inicio += 1
+        if fim > inicio:
+            unidades.append((inicio, fim, fim_paragrafo))
+
+    chunks = []
+    i = 0
+    while i < len(unidades):
+        inicio = unidades[i][0]
+        j = i
+        while j + 1 < len(unidades) and tokens(inicio, unidades[j + 1][1]) <= limite:
+            j += 1
+
+        # Prefere terminar num fim de parágrafo, se não encurtar demais o chunk
+        if j + 1 < len(unidades) and not unidades[j][2]:
+            for k in range(j - 1, i - 1, -1):
+                if tokens(inicio, unidades[k][1]) < 0.75 * limite:
+                    break
+                if unidades[k][2]:
+                    j = k
+                    break
+
+        fim = unidades[j][1]
+        chunks.append((inicio, fim))
+        if j + 1 >= len(unidades):
+            break
+
+        # Sobreposição: volta as últimas frases do chunk que cabem em overlap_tokens,
+        # desde que a próxima frase nova ainda caiba junto
+        proximo = j + 1
+        while (proximo - 1 > i
+               and tokens(unidades[proximo - 1][0], fim) <= overlap_tokens
+               and tokens(unidades[proximo - 1][0], unidades[j + 1][1]) <= limite):
+            proximo -= 1
+        i = proximo
+
+    return chunks
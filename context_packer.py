@@ -0,0 +1,175 @@
+"""
+context_packer.py - Contextos do prompt empacotados por orçamento de tokens
+
+O prompt vai ao Ollama com num_ctx = NUM_CTX tokens; descontados as
+instruções, a pergunta e a reserva para a resposta (CONTEXT_ANSWER_TOKENS),
+o resto é o orçamento dos contextos, limitado a CONTEXT_MAX_TOKENS (prompts
+menores têm prefill mais rápido em CPU). Os trechos entram na ordem de
+relevância em que o retrieval os devolve:
+
+    - chunks do mesmo acórdão (arquivo_origem) viram uma única fonte: trechos
+      sobrepostos (overlap do chunker, offsets inicio/fim) são unidos sem
+      repetir texto, e trechos já contidos em outro são descartados
+    - cada fonte entra inteira enquanto couber; a que não cabe é cortada em
+      fim de frase (ou espaço) no que resta do orçamento, em vez de descartada
+
+A contagem usa chunker.ContadorTokens com o tokenizer do Hugging Face
+equivalente ao modelo do Ollama (OLLAMA_TOKENIZER, ex.: o do Llama 3); sem
+ele, a estimativa conservadora por palavras.
+
+Uso:
+    packer = ContextPacker(OLLAMA_TOKENIZER)
+    orcamento = packer.budget(build_prompt(pergunta, ""), NUM_CTX)
+    contextos, usados = packer.format(chunks, orcamento)
+"""
+import os
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from chunker import ContadorTokens, PASSAGE_PREFIX
+
+load_dotenv()
+
+# Tokenizer (Hugging Face) do modelo servido pelo Ollama
+OLLAMA_TOKENIZER = os.getenv("OLLAMA_TOKENIZER")
+# Teto do orçamento de contextos, mesmo com NUM_CTX maior
+CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", "1500"))
+# Tokens reservados para a resposta dentro de NUM_CTX
+CONTEXT_ANSWER_TOKENS = int(os.getenv("CONTEXT_ANSWER_TOKENS", "512"))
+# Corte menor que isso não vale uma fonte (só o cabeçalho e meia frase)
+CONTEXT_MIN_TRIM_TOKENS = int(os.getenv("CONTEXT_MIN_TRIM_TOKENS", "48"))
+
+MARCA_CORTE = " [...]"
+SEPARADOR_TRECHOS = "\n[...]\n"
+_FIM_FRASE_RE = re.compile(r'[.!?;]["”\')]*\s')
+
+
+def _texto_bruto(chunk: Dict) -> str:
+    """Texto do chunk sem o prefixo do e5 (os offsets inicio/fim valem para ele)"""
+    content = chunk["content"] or ""
+    return content[len(PASSAGE_PREFIX):] if content.startswith(PASSAGE_PREFIX) else content
+
+
+def _chave_fonte(chunk: Dict) -> Tuple[str, str]:
+    arquivo = chunk["metadata"].get("arquivo_origem")
+    if arquivo:
+        return chunk["origem"], arquivo
+    return chunk["origem"], chunk.get("id") or str(hash(chunk["content"]))
+
+
+def unir_trechos(chunks: List[Dict]) -> str:
+    """
+    Texto de uma fonte a partir dos seus chunks: em ordem de offset, com as
+    sobreposições unidas; sem offsets, só descarta trechos repetidos.
+    """
+    if len(chunks) == 1:
+        return _texto_bruto(chunks[0]).strip()
+
+    if all(isinstance(c["metadata"].get("inicio"), int) and isinstance(c["metadata"].get("fim"), int)
+           for c in chunks):
+        partes: List[str] = []
+        fim_atual = -1
+        for c in sorted(chunks, key=lambda c: c["metadata"]["inicio"]):
+            inicio, fim = c["metadata"]["inicio"], c["metadata"]["fim"]
+            texto = _texto_bruto(c)
+            if partes and inicio < fim_atual:
+                if fim > fim_atual:
+                    partes[-1] += texto[fim_atual - inicio:]
+                    fim_atual = fim
+                continue
+            partes.append(texto)
+            fim_atual = fim
+        return SEPARADOR_TRECHOS.join(p.strip() for p in partes)
+
+    partes = []
+    for c in chunks:
+        texto = _texto_bruto(c).strip()
+        if texto and not any(texto in p for p in partes):
+            partes.append(texto)
+    return SEPARADOR_TRECHOS.join(partes)
+
+
+def cabecalho(i: int, chunk: Dict) -> str:
+    meta = chunk["metadata"]
+    doc_id = meta.get("id") or meta.get("source") or meta.get("file") or "doc"
+    titulo = meta.get("titulo") or meta.get("title") or doc_id
+    return f"[Fonte {i}] id={doc_id}, origem={chunk['origem']}, score={chunk['score']:.4f}, titulo={titulo}\n"
+
+
+class ContextPacker:
+    """Monta o bloco de contextos do prompt dentro de um orçamento de tokens"""
+
+    def __init__(self, tokenizer_name: Optional[str] = OLLAMA_TOKENIZER, max_tokens: int = CONTEXT_MAX_TOKENS,
+                 answer_tokens: int = CONTEXT_ANSWER_TOKENS, min_trim_tokens: int = CONTEXT_MIN_TRIM_TOKENS):
+        self.contador = ContadorTokens(tokenizer_name)
+        self.max_tokens = max_tokens
+        self.answer_tokens = answer_tokens
+        self.min_trim_tokens = min_trim_tokens
+        # Tokenizers rápidos não aceitam chamadas concorrentes na mesma instância
+        self._lock = threading.Lock()
+
+    def _posicoes(self, texto: str) -> List[int]:
+        with self._lock:
+            return self.contador.posicoes(texto)
+
+    def contar(self, texto: str) -> int:
+        return len(self._posicoes(texto))
+
+    def budget(self, prompt_sem_contexto: str, num_ctx: int) -> int:
+        """Tokens disponíveis para os contextos num prompt de num_ctx tokens"""
+        livre = num_ctx - self.contar(prompt_sem_contexto) - self.answer_tokens
+        return max(0, min(self.max_tokens, livre))
+
+    def cortar(self, texto: str, max_tokens: int) -> Optional[Tuple[str, int, bool]]:
+        """
+        (texto, tokens, cortado) com no máximo max_tokens tokens, cortado em fim
+        de frase (ou espaço); None se não sobrar ao menos min_trim_tokens.
+        """
+        posicoes = self._posicoes(texto)
+        if len(posicoes) <= max_tokens:
+            return texto, len(posicoes), False
+        limite = max_tokens - self.contar(MARCA_CORTE)
+        if limite < self.min_trim_tokens:
+            return None
+        corte = posicoes[limite]
+        # Último fim de frase antes do corte, se não perder mais de um terço do trecho
+        frases = [m.end() for m in _FIM_FRASE_RE.finditer(texto, 0, corte)]
+        if frases and frases[-1] >= corte * 2 // 3:
+            corte = frases[-1]
+        else:
+            espaco = max(texto.rfind(" ", 0, corte), texto.rfind("\n", 0, corte))
+            if espaco > 0:
+                corte = espaco
+        cortado = texto[:corte].rstrip() + MARCA_CORTE
+        return cortado, self.contar(cortado), True
+
+    def format(self, chunks: List[Dict], max_tokens: int) -> Tuple[str, List[Dict]]:
+        """
+        Contextos formatados e as fontes usadas, uma por bloco [Fonte N]: o
+        chunk mais relevante da fonte, com "content" = texto que foi ao prompt,
+        "trechos" = chunks unidos e "truncado".
+        """
+        fontes: Dict[Tuple[str, str], List[Dict]] = {}
+        for ch in chunks:
+            fontes.setdefault(_chave_fonte(ch), []).append(ch)
+
+        blocos, usados = [], []
+        restante = max_tokens
+        for grupo in fontes.values():
+            if restante <= 0:
+                break
+            header = cabecalho(len(blocos) + 1, grupo[0])
+            # Cabeçalho e a linha em branco entre blocos
+            custo_header = self.contar(header) + 1
+            cortado = self.cortar(unir_trechos(grupo), restante - custo_header)
+            if cortado is None:
+                # Não cabe nem cortada; uma fonte menor adiante ainda pode caber
+                continue
+            texto, tokens, truncado = cortado
+            blocos.append(header + texto + "\n")
+            usados.append({**grupo[0], "content": texto, "trechos": len(grupo), "truncado": truncado})
+            restante -= custo_header + tokens
+        return "\n".join(blocos), usados
@@ -0,0 +1,103 @@
+"""
+corpus_store.py - Formato compacto (colunar) dos chunks em disco
+
+Um arquivo por documento (<nome>_chunks.col):
+    linha 1: cabeçalho JSON
+             {"documento": {crime, tribunal, orgao_julgador, data, ementa, fonte, arquivo_origem},
+              "colunas": {"chunk_id": [...], "inicio": [...], "fim": [...]}}
+    resto:   o texto do documento, em UTF-8 puro (sem escapes JSON)
+
+Os metadados do documento (a ementa, principalmente) e o texto ficam gravados
+uma vez só: o texto de cada chunk é o trecho texto[inicio:fim], então a
+sobreposição entre chunks vizinhos também não se repete. Se os offsets não
+baterem com o texto, os textos dos chunks são concatenados e o cabeçalho
+traz "trechos" ([a, b) de cada chunk no texto gravado).
+
+A leitura é feita sobre mmap, um documento por vez: só o cabeçalho passa
+pelo parser JSON, o texto é só decodificado. Cada chunk sai já com os
+metadados do documento, no mesmo formato dos antigos *_chunks.json (lista
+de dicts indentada), que continuam legíveis.
+"""
+import os
+import json
+import mmap
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+SUFIXO_CHUNKS = "_chunks.col"
+SUFIXO_CHUNKS_LEGADO = "_chunks.json"
+
+# Campos iguais em todos os chunks de um documento
+CAMPOS_DOCUMENTO = ("crime", "tribunal", "orgao_julgador", "data", "ementa", "fonte", "arquivo_origem")
+
+
+def escrever_chunks(caminho: Path, chunks: List[Dict[str, Any]], texto: Optional[str] = None):
+    """
+    Grava os chunks de um documento (todos com os mesmos CAMPOS_DOCUMENTO).
+
+    texto: texto integral de onde saíram os chunks (chunk["texto"] ==
+    texto[inicio:fim]); sem ele, ou se algum chunk não for um trecho exato,
+    grava os textos dos chunks concatenados.
+    """
+    documento = {c: chunks[0].get(c) for c in CAMPOS_DOCUMENTO} if chunks else {}
+    campos = [k for k in (chunks[0] if chunks else {}) if k not in CAMPOS_DOCUMENTO and k != "texto"]
+    cabecalho = {"documento": documento, "colunas": {k: [c.get(k) for c in chunks] for k in campos}}
+
+    fatiavel = texto is not None and all(
+        isinstance(c.get("inicio"), int) and isinstance(c.get("fim"), int)
+        and texto[c["inicio"]:c["fim"]] == c.get("texto")
+        for c in chunks
+    )
+    if not fatiavel:
+        partes, trechos, pos = [], [], 0
+        for c in chunks:
+            parte = c.get("texto") or ""
+            partes.append(parte)
+            trechos.append([pos, pos + len(parte)])
+            pos += len(parte)
+        texto = "".join(partes)
+        cabecalho["trechos"] = trechos
+
+    # Temporário + os.replace: leitores nunca veem um arquivo pela metade
+    tmp = caminho.with_name(caminho.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8", newline="") as f:
+        f.write(json.dumps(cabecalho, ensure_ascii=False, separators=(",", ":")) + "\n")
+        f.write(texto or "")
+    os.replace(tmp, caminho)
+
+
+def ler_chunks(caminho: Path) -> Iterator[Dict[str, Any]]:
+    """Chunks do arquivo (colunar ou *_chunks.json legado), com os metadados do documento"""
+    caminho = Path(caminho)
+    if caminho.name.endswith(SUFIXO_CHUNKS_LEGADO):
+        with open(caminho, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        yield from (data if isinstance(data, list) else [])
+        return
+
+    with open(caminho, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            cabecalho = json.loads(mm.readline())
+            texto = mm[mm.tell():].decode("utf-8")
+
+    documento = cabecalho.get("documento", {})
+    colunas = cabecalho.get("colunas", {})
+    trechos = cabecalho.get("trechos") or zip(colunas.get("inicio", ()), colunas.get("fim", ()))
+    campos = list(colunas) + ["texto"]
+    valores = list(colunas.values()) + [[texto[a:b] for a, b in trechos]]
+
+    for linha in zip(*valores):
+        chunk = dict(documento)
+        chunk.update(zip(campos, linha))
+        yield chunk
+
+
+def listar_arquivos_chunks(dir_chunks: Path) -> List[Path]:
+    """Arquivos de chunks em ordem de nome; o legado só entra se não houver o colunar"""
+    dir_chunks = Path(dir_chunks)
+    compactos = {p.name[:-len(SUFIXO_CHUNKS)]: p for p in dir_chunks.glob(f"*{SUFIXO_CHUNKS}")}
+    legados = {p.name[:-len(SUFIXO_CHUNKS_LEGADO)]: p for p in dir_chunks.glob(f"*{SUFIXO_CHUNKS_LEGADO}")}
+    arquivos = {**legados, **compactos}
+    return [arquivos[nome] for nome in sorted(arquivos)]
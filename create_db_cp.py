@@ -1,9 +1,15 @@
 import json
 import os
+import argparse
+import time
 import chromadb
 from pathlib import Path
 from sentence_transformers import SentenceTransformer
 from dotenv import load_dotenv
+from embedding_cache import EmbeddingCache, EMBED_CACHE_ENABLED, EMBED_CACHE_DIR
+from article_index import salvar_indice_artigos
+from lexical_index import construir_indice, LEXICAL_INDEX_DIR
+from embedding_workers import EncoderMultiprocesso, EMBED_WORKERS, resolver_workers
 load_dotenv()
 
 # Configurações
@@ -43,7 +49,7 @@ def criar_documento_artigo(tema, artigo, metadata_geral):
     }
     return texto_completo, metadata
 
-def indexar_codigo_penal():
+def indexar_codigo_penal(workers: int = EMBED_WORKERS):
     print("🔄 Iniciando indexação do Código Penal...")
     print(f"📖 Carregando {CODIGO_PENAL_JSON}...")
     codigo_penal = carregar_codigo_penal(CODIGO_PENAL_JSON)
@@ -53,13 +59,10 @@ def indexar_codigo_penal():
 
     collection = client.get_or_create_collection(name="legislacao_codigo_penal")
 
-    # PADRONIZAÇÃO: mesmo modelo da jurisprudência, em CPU
-    print("🤖 Carregando modelo de embeddings (CPU)...")
-    model = SentenceTransformer(os.getenv("EMBED_MODEL_NAME"), device="cpu")
-
     documentos = []
     metadados = []
     ids = []
+    artigos = []
 
     contador = 0
     for tema_obj in codigo_penal['temas']:
@@ -70,17 +73,49 @@ def indexar_codigo_penal():
             documentos.append(texto)
             metadados.append(metadata)
             ids.append(f"legislacao_{tema.lower().replace(' ', '_')}_{artigo['artigo']}")
+            artigos.append(artigo)
             contador += 1
 
     print(f"🧮 Gerando embeddings para {contador} artigos...")
     # E5 recomenda prefixo "passage: " nos documentos
     docs_e5 = [f"passage: {d}" for d in documentos]
-    embeddings = model.encode(
-        docs_e5,
-        show_progress_bar=True,
-        batch_size=32,
-        convert_to_numpy=True
-    )
+
+    # PADRONIZAÇÃO: mesmo modelo da jurisprudência, em CPU
+    workers = resolver_workers(workers)
+    encoder = None
+    if workers > 1:
+        # Um modelo por processo, threads do torch divididas entre eles
+        encoder = EncoderMultiprocesso(os.getenv("EMBED_MODEL_NAME"), workers=workers)
+        print(f"🧵 {encoder.workers} workers de embedding × {encoder.threads_por_worker} threads "
+              f"(modelos carregados em {encoder.segundos_carga:.1f}s)")
+        encode = encoder.encode
+    else:
+        print("🤖 Carregando modelo de embeddings (CPU)...")
+        model = SentenceTransformer(os.getenv("EMBED_MODEL_NAME"), device="cpu")
+
+        def encode(textos):
+            return model.encode(
+                textos,
+                show_progress_bar=True,
+                batch_size=32,
+                convert_to_numpy=True
+            )
+
+    inicio = time.perf_counter()
+    try:
+        if EMBED_CACHE_ENABLED:
+            # Só artigos nunca embedados por este modelo passam pelo encode
+            cache = EmbeddingCache(EMBED_CACHE_DIR, os.getenv("EMBED_MODEL_NAME"))
+            embeddings = cache.encode(docs_e5, encode)
+            print(f"💾 Cache de embeddings: {cache.stats_counters['hits']} reaproveitados | "
+                  f"{cache.stats_counters['misses']} embedados")
+        else:
+            embeddings = encode(docs_e5)
+    finally:
+        if encoder:
+            encoder.close()
+    segundos = time.perf_counter() - inicio
+    print(f"⚡ Embeddings: {len(docs_e5) / segundos if segundos else 0.0:.1f} docs/s")
 
     print("💾 Adicionando artigos ao ChromaDB...")
     collection.add(
@@ -89,6 +124,10 @@ def indexar_codigo_penal():
         metadatas=metadados,
         ids=ids
     )
+    # Índice léxico (BM25) da busca híbrida, com os mesmos ids da coleção
+    construir_indice(collection, LEXICAL_INDEX_DIR)
+    # Índice (lei, artigo) -> documento para perguntas que citam o dispositivo
+    salvar_indice_artigos(ids, documentos, metadados, artigos)
 
     print(f"\n✅ Indexação concluída!")
     print(f"📊 Total de artigos indexados: {contador}")
@@ -120,6 +159,11 @@ def testar_busca():
         print(f"     Trecho: {doc[:200]}...")
 
 if __name__ == "__main__":
-    total_indexado = indexar_codigo_penal()
+    parser = argparse.ArgumentParser(description="Indexação do Código Penal no Chroma")
+    parser.add_argument("--workers", type=int, default=EMBED_WORKERS,
+                        help="processos de embedding (padrão: EMBED_WORKERS; 0 = todos os núcleos)")
+    args = parser.parse_args()
+
+    total_indexado = indexar_codigo_penal(workers=args.workers)
     testar_busca()
     print("\n🎉 Processo concluído!")
\ No newline at end of file
@@ -1,34 +1,71 @@
 import json
 import os
+import argparse
+import time
+import hashlib
 from pathlib import Path
-from typing import List, Dict, Any, Iterable
+from typing import List, Dict, Any, Iterable, Optional, Set, Tuple
 from dotenv import load_dotenv
 
 # Use o pacote novo do Chroma para LangChain
 from langchain_chroma import Chroma
 from langchain.docstore.document import Document
+from langchain_core.embeddings import Embeddings
 from langchain_huggingface import HuggingFaceEmbeddings
+from corpus_store import ler_chunks, listar_arquivos_chunks
+from embedding_cache import EmbeddingCache, CachedEmbeddings, EMBED_CACHE_ENABLED, EMBED_CACHE_DIR
+from lexical_index import construir_indice, LEXICAL_INDEX_DIR
+from embedding_workers import EncoderMultiprocesso, EmbeddingsMultiprocesso, EMBED_WORKERS, resolver_workers
 load_dotenv()
 EMBEDDING_MODEL_NAME = (os.getenv("EMBED_MODEL_NAME"))
 print(EMBEDDING_MODEL_NAME)
-# Instância global, forçando CPU
-embeddings = HuggingFaceEmbeddings(
-    model_name=EMBEDDING_MODEL_NAME,
-    model_kwargs={"device": "cpu"}
-)
+
+_embeddings: Optional[Embeddings] = None
+_cache: Optional[EmbeddingCache] = None
+
+def get_cache() -> Optional[EmbeddingCache]:
+    """
+    Cache persistente (modelo, texto): recriar a coleção ou voltar a um modelo
+    já usado só embeda textos inéditos. Compartilhado pelos modos de 1 e N processos.
+    """
+    global _cache
+    if EMBED_CACHE_ENABLED and _cache is None:
+        _cache = EmbeddingCache(EMBED_CACHE_DIR, EMBEDDING_MODEL_NAME)
+    return _cache
+
+def get_embeddings() -> Embeddings:
+    """
+    Instância única, forçando CPU. Carregada sob demanda: os workers do modo
+    multiprocesso (spawn) reimportam este módulo e não devem carregar o modelo.
+    """
+    global _embeddings
+    if _embeddings is None:
+        _embeddings = HuggingFaceEmbeddings(
+            model_name=EMBEDDING_MODEL_NAME,
+            model_kwargs={"device": "cpu"}
+        )
+        if get_cache():
+            _embeddings = CachedEmbeddings(_embeddings, get_cache())
+    return _embeddings
 
 DIR_CHUNKS = Path("dados_sanitizados/chunks")
 CHROMA_DB_DIR = Path("./vectordb/chroma")
 CHROMA_COLLECTION = "jurisprudencia_br_v1"
 
+# Manifesto da indexação incremental: arquivo de chunks -> (tamanho, mtime, ids indexados)
+MANIFEST_PATH = CHROMA_DB_DIR / f"{CHROMA_COLLECTION}_manifest.json"
+MANIFEST_VERSION = 1
+BATCH_SIZE = 512
+# Modo multiprocesso: lotes maiores para todos os workers receberem shards cheios,
+# abaixo do limite de itens por chamada do Chroma (5461 no SQLite)
+BULK_MAX = 5000
+# Resumo gravado pelo sanitaze.py (adicionados/alterados/removidos na última execução)
+RESUMO_SANITIZACAO = DIR_CHUNKS.parent / "resumo_sanitizacao.json"
+
 def carregar_chunks(dir_chunks: Path) -> Iterable[Dict[str, Any]]:
-    for json_file in dir_chunks.glob("*.json"):
+    for json_file in listar_arquivos_chunks(dir_chunks):
         try:
-            with open(json_file, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                if isinstance(data, list):
-                    for item in data:
-                        yield item
+            yield from ler_chunks(json_file)
         except Exception as e:
             print(f"[ERRO] {json_file.name}: {e}")
 
@@ -43,48 +80,227 @@ def chunk_to_document(item):
         "ementa": item.get("ementa"),
         "fonte": item.get("fonte"),
         "arquivo_origem": item.get("arquivo_origem"),
+        "inicio": item.get("inicio"),
+        "fim": item.get("fim"),
     }.items() if v is not None}
     return Document(page_content=page_content, metadata=metadata)
 
-def indexar_chunks_em_chroma():
+def document_id(doc: Document, arquivo: str) -> str:
+    """
+    Id estável do chunk: hash do arquivo de origem + texto + metadados.
+    O mesmo conteúdo gera sempre o mesmo id; qualquer alteração gera outro.
+    """
+    payload = json.dumps(
+        {"arquivo": arquivo, "texto": doc.page_content, "metadata": doc.metadata},
+        sort_keys=True, ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def documentos_do_arquivo(json_file: Path) -> Tuple[List[str], List[Document]]:
+    """Documentos não vazios do arquivo, com ids estáveis (sem repetição)"""
+    ids, docs, vistos = [], [], set()
+    for item in ler_chunks(json_file):
+        doc = chunk_to_document(item)
+        if not (doc.page_content and doc.page_content.strip()):
+            continue
+        doc_id = document_id(doc, json_file.name)
+        if doc_id in vistos:
+            continue
+        vistos.add(doc_id)
+        ids.append(doc_id)
+        docs.append(doc)
+    return ids, docs
+
+def carregar_manifesto() -> Dict[str, Any]:
+    vazio = {"version": MANIFEST_VERSION, "embedding_model": EMBEDDING_MODEL_NAME, "arquivos": {}}
+    if not MANIFEST_PATH.exists():
+        return vazio
+    try:
+        with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+            manifesto = json.load(f)
+    except Exception as e:
+        print(f"[AVISO] Manifesto ilegível ({e}); reindexando tudo")
+        return vazio
+    if manifesto.get("version") != MANIFEST_VERSION or manifesto.get("embedding_model") != EMBEDDING_MODEL_NAME:
+        print("[AVISO] Manifesto de outra versão/modelo de embeddings; reindexando tudo")
+        return vazio
+    return manifesto
+
+def arquivos_do_resumo(caminho: Path = RESUMO_SANITIZACAO) -> Optional[Set[str]]:
+    """Arquivos de chunks adicionados/alterados pela última sanitização (None sem resumo)"""
+    if not caminho.exists():
+        return None
+    with open(caminho, "r", encoding="utf-8") as f:
+        resumo = json.load(f)
+    return {
+        Path(s).name
+        for item in resumo.get("adicionados", []) + resumo.get("alterados", [])
+        for s in item.get("saidas", [])
+        if s.startswith(f"{DIR_CHUNKS.name}/")
+    }
+
+def salvar_manifesto(manifesto: Dict[str, Any]):
+    tmp = MANIFEST_PATH.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifesto, f, ensure_ascii=False)
+    os.replace(tmp, MANIFEST_PATH)
+
+def indexar_chunks_em_chroma(forcar: bool = False, apenas: Optional[Set[str]] = None,
+                             workers: int = EMBED_WORKERS):
+    """
+    Indexação incremental.
+
+    Arquivos com mesmo tamanho e mtime do manifesto nem são lidos. Nos demais,
+    só os chunks com id (hash de conteúdo) ainda não indexado passam pelo
+    modelo de embeddings; ids que sumiram do arquivo, e todos os ids de
+    arquivos removidos, são apagados da coleção.
+
+    apenas: limita a verificação a esses arquivos (ex.: arquivos_do_resumo());
+    os demais já indexados são considerados inalterados.
+
+    workers: processos de embedding (0 = todos os núcleos). Com mais de um,
+    cada processo carrega seu modelo (ver embedding_workers.py) e os chunks
+    vão ao Chroma em lotes de até BULK_MAX.
+    """
+    inicio = time.perf_counter()
     CHROMA_DB_DIR.mkdir(parents=True, exist_ok=True)
 
-    # REUTILIZA a instância global embeddings (CPU). Não recrie sem device="cpu"
+    workers = resolver_workers(workers)
+    encoder: Optional[EncoderMultiprocesso] = None
+    lote = BATCH_SIZE
+    if workers > 1:
+        encoder = EncoderMultiprocesso(EMBEDDING_MODEL_NAME, workers=workers)
+        print(f"🧵 {encoder.workers} workers de embedding × {encoder.threads_por_worker} threads "
+              f"(modelos carregados em {encoder.segundos_carga:.1f}s)")
+        embedding_function: Embeddings = EmbeddingsMultiprocesso(encoder)
+        if get_cache():
+            embedding_function = CachedEmbeddings(embedding_function, get_cache())
+        lote = min(BATCH_SIZE * encoder.workers, BULK_MAX)
+    else:
+        # REUTILIZA a instância global (CPU). Não recrie sem device="cpu"
+        embedding_function = get_embeddings()
+
     vectordb = Chroma(
         collection_name=CHROMA_COLLECTION,
-        embedding_function=embeddings,
+        embedding_function=embedding_function,
         persist_directory=str(CHROMA_DB_DIR),
     )
+    try:
+        return _indexar(vectordb, forcar, apenas, lote, encoder, inicio)
+    finally:
+        if encoder:
+            encoder.close()
 
-    documentos: List[Document] = []
-    total_items = 0
+def _indexar(vectordb: Chroma, forcar: bool, apenas: Optional[Set[str]], lote: int,
+             encoder: Optional[EncoderMultiprocesso], inicio: float) -> Dict[str, Any]:
+    manifesto = carregar_manifesto()
+    if forcar or (not manifesto["arquivos"] and vectordb._collection.count() > 0):
+        # Coleção sem manifesto (indexação antiga, ids aleatórios): recomeçar do zero
+        print("♻️  Recriando a coleção do zero")
+        vectordb.reset_collection()
+        manifesto["arquivos"] = {}
 
-    for item in carregar_chunks(DIR_CHUNKS):
-        total_items += 1
-        doc = chunk_to_document(item)
-        if doc.page_content and doc.page_content.strip():
-            documentos.append(doc)
+    antigos: Dict[str, Dict[str, Any]] = manifesto["arquivos"]
+    atuais = {p.name: p for p in listar_arquivos_chunks(DIR_CHUNKS)}
+    stats = {"arquivos": len(atuais), "inalterados": 0, "alterados": 0, "novos": 0,
+             "removidos": 0, "chunks_inseridos": 0, "chunks_apagados": 0,
+             "segundos_insercao": 0.0}
+
+    # Arquivos que sumiram: apagar seus chunks
+    for nome in [n for n in antigos if n not in atuais]:
+        ids = antigos.pop(nome)["ids"]
+        if ids:
+            vectordb.delete(ids=ids)
+        stats["removidos"] += 1
+        stats["chunks_apagados"] += len(ids)
+        print(f"🗑️  {nome}: {len(ids)} chunks removidos")
+
+    pendentes_ids: List[str] = []
+    pendentes_docs: List[Document] = []
+    pendentes_manifesto: Dict[str, Dict[str, Any]] = {}
 
-        if len(documentos) >= 512:
-            vectordb.add_documents(documentos)
-            print(f"✓ Inseridos {len(documentos)} documentos (parcial).")
-            documentos = []
+    def flush():
+        if pendentes_docs:
+            t0 = time.perf_counter()
+            vectordb.add_documents(pendentes_docs, ids=pendentes_ids)
+            dt = time.perf_counter() - t0
+            stats["chunks_inseridos"] += len(pendentes_docs)
+            stats["segundos_insercao"] += dt
+            print(f"✓ Inseridos {len(pendentes_docs)} documentos (parcial, {len(pendentes_docs) / dt:.1f} docs/s).")
+        # Só entra no manifesto o que já está gravado na coleção
+        antigos.update(pendentes_manifesto)
+        salvar_manifesto(manifesto)
+        pendentes_ids.clear()
+        pendentes_docs.clear()
+        pendentes_manifesto.clear()
 
-    if documentos:
-        vectordb.add_documents(documentos)
+    for nome, json_file in atuais.items():
+        anterior = antigos.get(nome)
+        if anterior and apenas is not None and nome not in apenas:
+            stats["inalterados"] += 1
+            continue
+        st = json_file.stat()
+        if anterior and anterior["size"] == st.st_size and anterior["mtime_ns"] == st.st_mtime_ns:
+            stats["inalterados"] += 1
+            continue
+
+        try:
+            ids, docs = documentos_do_arquivo(json_file)
+        except Exception as e:
+            print(f"[ERRO] {nome}: {e}")
+            continue
+
+        ids_anteriores = set(anterior["ids"]) if anterior else set()
+        ids_atuais = set(ids)
+        obsoletos = [i for i in ids_anteriores if i not in ids_atuais]
+        if obsoletos:
+            vectordb.delete(ids=obsoletos)
+            stats["chunks_apagados"] += len(obsoletos)
+
+        novos = [(i, d) for i, d in zip(ids, docs) if i not in ids_anteriores]
+        if novos:
+            # Podem já estar na coleção (execução interrompida antes do manifesto)
+            existentes = set(vectordb.get(ids=[i for i, _ in novos], include=[])["ids"])
+            for doc_id, doc in novos:
+                if doc_id not in existentes:
+                    pendentes_ids.append(doc_id)
+                    pendentes_docs.append(doc)
+
+        stats["alterados" if anterior else "novos"] += 1
+        pendentes_manifesto[nome] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "ids": ids}
+
+        if len(pendentes_docs) >= lote:
+            flush()
+
+    flush()
+    # Índice léxico (BM25) da busca híbrida: reconstruído a partir da coleção
+    indice_lexico = Path(LEXICAL_INDEX_DIR) / CHROMA_COLLECTION
+    if stats["chunks_inseridos"] or stats["chunks_apagados"] or not indice_lexico.exists():
+        construir_indice(vectordb._collection, LEXICAL_INDEX_DIR)
+    stats["docs_por_segundo"] = (stats["chunks_inseridos"] / stats["segundos_insercao"]
+                                 if stats["segundos_insercao"] else 0.0)
 
     print("=" * 60)
-    print(f"✅ Indexação concluída!")
-    print(f"📊 Total de items: {total_items}")
+    print(f"✅ Indexação concluída em {time.perf_counter() - inicio:.1f}s!")
+    print(f"📄 Arquivos: {stats['arquivos']} (novos: {stats['novos']}, alterados: {stats['alterados']}, "
+          f"inalterados: {stats['inalterados']}, removidos: {stats['removidos']})")
+    print(f"📊 Chunks inseridos: {stats['chunks_inseridos']} | apagados: {stats['chunks_apagados']}")
+    print(f"⚡ Vazão (embedding + gravação): {stats['docs_por_segundo']:.1f} docs/s")
+    if encoder and encoder.docs:
+        print(f"🧵 Embedding em {encoder.workers} workers: {encoder.docs_por_segundo:.1f} docs/s")
+    if get_cache():
+        cache = get_cache().stats_counters
+        print(f"💾 Cache de embeddings: {cache['hits']} reaproveitados | {cache['misses']} embedados")
     print(f"📁 Base vetorial: {CHROMA_DB_DIR}")
     print(f"🗂️  Coleção: {CHROMA_COLLECTION}")
     print("=" * 60)
+    return stats
 
 def teste_busca(query: str, k: int = 3):
-    # REUTILIZA a instância global embeddings (CPU)
+    # REUTILIZA a instância global (CPU)
     vectordb = Chroma(
         collection_name=CHROMA_COLLECTION,
-        embedding_function=embeddings,
+        embedding_function=get_embeddings(),
         persist_directory=str(CHROMA_DB_DIR),
     )
     # Para e5, prefira prefixar a query:
@@ -101,8 +317,17 @@ def teste_busca(query: str, k: int = 3):
         print(f"    Trecho: {d.page_content[:200].replace(chr(10), ' ')}...\n")
 
 if __name__ == "__main__":
-    # Descomente para reindexar (só precisa rodar 1x)
-    indexar_chunks_em_chroma()
+    # Incremental: só embeda chunks novos/alterados
+    parser = argparse.ArgumentParser(description="Indexação da jurisprudência no Chroma")
+    parser.add_argument("--workers", type=int, default=EMBED_WORKERS,
+                        help="processos de embedding (padrão: EMBED_WORKERS; 0 = todos os núcleos)")
+    parser.add_argument("--forcar", action="store_true", help="recriar a coleção, reembedando todos os chunks")
+    parser.add_argument("--desde-sanitizacao", action="store_true",
+                        help="verificar só os arquivos do resumo da última execução do sanitaze.py")
+    args = parser.parse_args()
+
+    apenas = arquivos_do_resumo() if args.desde_sanitizacao else None
+    indexar_chunks_em_chroma(forcar=args.forcar, apenas=apenas, workers=args.workers)
 
     # Testes de busca
     teste_busca("princípio da insignificância furto", k=3)
@@ -0,0 +1,109 @@
+"""
+detectores_juridicos.py - Detectores de crime, tribunal e órgão julgador
+
+Usados pela sanitização (sanitaze.py, metadados de cada acórdão) e pelo
+retrieval (query_filters.py, filtros de cada pergunta), para que os rótulos
+detectados numa pergunta sejam os mesmos gravados nos chunks. Só depende de
+re: o processo que serve as respostas não carrega o PyPDF2 nem o chunker.
+"""
+import re
+from typing import Dict, List, Optional, Tuple
+
+# Mapeamento de crimes para detecção automática
+CRIMES_KEYWORDS = {
+    'Estelionato': ['estelionato', 'fraude', 'engano'],
+    'Tráfico': ['tráfico', 'narcotráfico', 'entorpecente', 'droga', 'lei 11.343', 'lei de drogas'],
+    'Furto': ['furto', 'subtração'],
+    'Lesão Corporal': ['lesão corporal', 'lesões corporais', 'agressão física'],
+    'Porte/Consumo': ['porte', 'consumo', 'uso de droga', 'usuário'],
+    'Embriaguez': ['embriaguez', 'embriagado', 'alcoolizado', 'direção sob efeito', 'art. 306 do ctb'],
+    'Homicídio': ['homicídio', 'homicidio', 'morte', 'latrocínio'],
+    'Roubo': ['roubo', 'assalto'],
+    'Receptação': ['receptação', 'receptacao', 'produto de crime']
+}
+
+
+def compilar_keywords_crimes(crimes_keywords: Dict[str, List[str]]) -> Tuple["re.Pattern", Dict[str, List[str]]]:
+    """
+    Compila todas as palavras-chave numa única regex de varredura:
+    \\b(?=(kw1|kw2|...)\\b), com as mais longas primeiro, de modo que cada
+    posição do texto devolve a palavra-chave mais longa que começa ali.
+
+    Uma palavra-chave que é prefixo de outra ("lei" / "lei de drogas") casa
+    na mesma posição sempre que a mais longa casa (o \\b depois do prefixo
+    depende só dos caracteres da própria palavra-chave); o dict retornado
+    diz, para cada palavra-chave encontrada, quais palavras-chave contar.
+    """
+    keywords = sorted({kw for kws in crimes_keywords.values() for kw in kws}, key=lambda k: (-len(k), k))
+    palavra = re.compile(r'\w')
+
+    def fronteira(a: str, b: str) -> bool:
+        return bool(palavra.match(a)) != bool(palavra.match(b))
+
+    contar = {
+        kw: [kw] + [p for p in keywords if p != kw and kw.startswith(p) and fronteira(p[-1], kw[len(p)])]
+        for kw in keywords
+    }
+    padrao = r'\b(?=(' + '|'.join(re.escape(kw) for kw in keywords) + r')\b)'
+    return re.compile(padrao), contar
+
+
+CRIMES_RE, CRIMES_CONTAGEM = compilar_keywords_crimes(CRIMES_KEYWORDS)
+
+_STJ_RE = re.compile(r'\bSuperior Tribunal de Justi[cç]a\b', re.IGNORECASE)
+_STJ_SIGLA_RE = re.compile(r'\bSTJ\b')
+_STF_RE = re.compile(r'\bSupremo Tribunal Federal\b', re.IGNORECASE)
+_STF_SIGLA_RE = re.compile(r'\bSTF\b')
+_TRIBUNAL_RE = re.compile(r'\b(TJ[A-Z]{2}|TRF\d)\b')
+_TURMA_RE = re.compile(r'\b(Primeira|Segunda|Terceira|Quarta|Quinta|Sexta)\s+Turma\b', re.IGNORECASE)
+_SECAO_RE = re.compile(r'\b(Terceira Se[cç][aã]o|Plen[aá]rio)\b', re.IGNORECASE)
+
+
+def classificar_crime(texto: str, crimes_keywords: Dict[str, List[str]] = CRIMES_KEYWORDS,
+                      crimes_re: "re.Pattern" = CRIMES_RE,
+                      crimes_contagem: Dict[str, List[str]] = CRIMES_CONTAGEM) -> Tuple[Optional[str], Dict[str, int]]:
+    """
+    Conta as palavras-chave de cada crime numa única varredura do texto.
+
+    Returns:
+        (crime com mais ocorrências ou None, {crime: ocorrências > 0}).
+        Empates ficam com o crime que aparece primeiro em crimes_keywords.
+    """
+    t = texto.lower()
+    contagem_kw: Dict[str, int] = {}
+    # Como re.findall por palavra-chave: ocorrências da mesma palavra não se sobrepõem
+    fim_anterior: Dict[str, int] = {}
+
+    for m in crimes_re.finditer(t):
+        inicio = m.start()
+        for kw in crimes_contagem[m.group(1)]:
+            if inicio >= fim_anterior.get(kw, 0):
+                contagem_kw[kw] = contagem_kw.get(kw, 0) + 1
+                fim_anterior[kw] = inicio + len(kw)
+
+    scores = {}
+    for crime, kws in crimes_keywords.items():
+        score = sum(contagem_kw.get(kw, 0) for kw in kws)
+        if score > 0:
+            scores[crime] = score
+
+    return (max(scores, key=scores.get) if scores else None), scores
+
+
+def detectar_tribunal(texto: str) -> Optional[str]:
+    """STJ, STF, TJxx ou TRFn mencionado no texto"""
+    if _STJ_RE.search(texto) or _STJ_SIGLA_RE.search(texto):
+        return 'STJ'
+    if _STF_RE.search(texto) or _STF_SIGLA_RE.search(texto):
+        return 'STF'
+    t = _TRIBUNAL_RE.search(texto)
+    return t.group(1) if t else None
+
+
+def detectar_orgao_julgador(texto: str) -> Optional[str]:
+    """Turma, seção ou plenário mencionado no texto"""
+    orgao = _TURMA_RE.search(texto)
+    if orgao:
+        return orgao.group(0).title()
+    sec = _SECAO_RE.search(texto)
+    return sec.group(1).title() if sec else None
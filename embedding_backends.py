@@ -0,0 +1,172 @@
+"""
+embedding_backends.py - Backends de CPU para embedar as perguntas em tempo de consulta
+
+EMBED_BACKEND escolhe a implementação para o mesmo EMBED_MODEL_NAME:
+    - torch:     HuggingFaceEmbeddings (sentence-transformers), fp32 (padrão)
+    - onnx:      ONNX Runtime + tokenizers, sem importar torch
+    - onnx-int8: o mesmo modelo ONNX com quantização dinâmica int8 dos pesos
+
+Os backends ONNX usam o arquivo EMBED_ONNX_FILE (padrão onnx/model.onnx, que
+os modelos do sentence-transformers no Hub já publicam) e reproduzem o
+pooling e a normalização do modelo a partir das configurações do
+sentence-transformers (modules.json, 1_Pooling/config.json). Para modelos
+sem ONNX no Hub, exporte com
+    optimum-cli export onnx --model <modelo> <dir>
+e aponte EMBED_MODEL_NAME para <dir>. O modelo int8 é gerado uma vez em
+EMBED_ONNX_CACHE_DIR.
+
+A paridade com o backend torch (vetores e resultados da busca sobre
+perguntas_gabarito.csv) e a latência são medidas por benchmark_embedding_backends.py.
+
+Uso:
+    embeddings = criar_embeddings("onnx-int8", model_name)
+    vetores = embeddings.embed_documents(perguntas)
+"""
+import os
+import re
+import json
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+from langchain_core.embeddings import Embeddings
+
+load_dotenv()
+
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "torch")
+EMBED_ONNX_FILE = os.getenv("EMBED_ONNX_FILE", "onnx/model.onnx")
+EMBED_ONNX_CACHE_DIR = os.getenv("EMBED_ONNX_CACHE_DIR", "./cache/onnx")
+EMBED_ONNX_THREADS = int(os.getenv("EMBED_ONNX_THREADS", "0"))  # 0 = padrão do ONNX Runtime
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+
+def _baixar_modelo(model_name: str, onnx_file: str) -> Path:
+    """Diretório local do modelo (baixa só o ONNX, o tokenizer e as configurações)"""
+    if Path(model_name).is_dir():
+        return Path(model_name)
+    from huggingface_hub import snapshot_download
+
+    return Path(snapshot_download(
+        model_name,
+        allow_patterns=[onnx_file, "*.json", "1_Pooling/*", "sentencepiece.bpe.model"]
+    ))
+
+
+def _ler_json(caminho: Path) -> Dict:
+    if not caminho.exists():
+        return {}
+    with open(caminho, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _quantizar(origem: Path, model_name: str) -> Path:
+    """Quantização dinâmica int8 (pesos das camadas MatMul), gravada uma vez por modelo"""
+    destino = Path(EMBED_ONNX_CACHE_DIR) / re.sub(r"[^\w.-]+", "_", model_name) / "model_int8.onnx"
+    if not destino.exists():
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        tmp = destino.with_suffix(".tmp")
+        quantize_dynamic(str(origem), str(tmp), weight_type=QuantType.QInt8)
+        os.replace(tmp, destino)
+    return destino
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    Embeddings do LangChain com ONNX Runtime, equivalentes ao HuggingFaceEmbeddings
+    do mesmo modelo: quebras de linha viram espaço, truncamento em max_seq_length,
+    pooling (mean/cls/max) e normalização conforme o sentence-transformers.
+    """
+
+    def __init__(self, model_name: str, quantizado: bool = False, onnx_file: str = EMBED_ONNX_FILE,
+                 threads: int = EMBED_ONNX_THREADS):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.model_name = model_name
+        diretorio = _baixar_modelo(model_name, onnx_file)
+        caminho_onnx = diretorio / onnx_file
+        if not caminho_onnx.exists():
+            raise FileNotFoundError(
+                f"{caminho_onnx} não encontrado; exporte com "
+                f"`optimum-cli export onnx --model {model_name} <dir>` e use EMBED_MODEL_NAME=<dir>"
+            )
+        if quantizado:
+            caminho_onnx = _quantizar(caminho_onnx, model_name)
+
+        opcoes = ort.SessionOptions()
+        opcoes.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads > 0:
+            opcoes.intra_op_num_threads = threads
+        self._sessao = ort.InferenceSession(str(caminho_onnx), opcoes, providers=["CPUExecutionProvider"])
+        self._entradas = {i.name for i in self._sessao.get_inputs()}
+
+        st_config = _ler_json(diretorio / "sentence_bert_config.json")
+        self.max_seq_length = int(st_config.get("max_seq_length") or min(
+            _ler_json(diretorio / "tokenizer_config.json").get("model_max_length", 512), 512))
+
+        pooling = _ler_json(diretorio / "1_Pooling" / "config.json")
+        if pooling.get("pooling_mode_cls_token"):
+            self.pooling = "cls"
+        elif pooling.get("pooling_mode_max_tokens"):
+            self.pooling = "max"
+        else:
+            self.pooling = "mean"
+        modulos = _ler_json(diretorio / "modules.json") or []
+        self.normalizar = any(m.get("type", "").endswith("Normalize") for m in modulos)
+
+        self._tokenizer = Tokenizer.from_file(str(diretorio / "tokenizer.json"))
+        self._tokenizer.enable_truncation(max_length=self.max_seq_length)
+        pad_token = _ler_json(diretorio / "special_tokens_map.json").get("pad_token", "<pad>")
+        if isinstance(pad_token, dict):
+            pad_token = pad_token.get("content", "<pad>")
+        pad_id = self._tokenizer.token_to_id(pad_token)
+        self._tokenizer.enable_padding(pad_id=pad_id if pad_id is not None else 0, pad_token=pad_token)
+
+    def _encode(self, textos: List[str]) -> np.ndarray:
+        codificados = self._tokenizer.encode_batch(textos)
+        input_ids = np.array([c.ids for c in codificados], dtype=np.int64)
+        mascara = np.array([c.attention_mask for c in codificados], dtype=np.int64)
+        entradas = {"input_ids": input_ids, "attention_mask": mascara}
+        if "token_type_ids" in self._entradas:
+            entradas["token_type_ids"] = np.array([c.type_ids for c in codificados], dtype=np.int64)
+
+        tokens = self._sessao.run(None, entradas)[0]
+        if self.pooling == "cls":
+            vetores = tokens[:, 0]
+        elif self.pooling == "max":
+            vetores = np.where(mascara[..., None] > 0, tokens, -1e9).max(axis=1)
+        else:
+            m = mascara[..., None].astype(np.float32)
+            vetores = (tokens * m).sum(axis=1) / np.clip(m.sum(axis=1), 1e-9, None)
+        if self.normalizar:
+            vetores = vetores / np.clip(np.linalg.norm(vetores, axis=1, keepdims=True), 1e-12, None)
+        return vetores.astype(np.float32)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return self._encode([t.replace("\n", " ") for t in texts]).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def criar_embeddings(backend: Optional[str] = None, model_name: Optional[str] = None) -> Embeddings:
+    """Embeddings de CPU do backend pedido (padrão EMBED_BACKEND) para model_name"""
+    backend = (backend or EMBED_BACKEND).strip().lower()
+    model_name = model_name or os.getenv("EMBED_MODEL_NAME")
+    if backend == "torch":
+        # Import tardio: só este backend paga o import do torch
+        from langchain_huggingface import HuggingFaceEmbeddings
+
+        # Forçar CPU para contornar incompatibilidade CUDA sm_61
+        return HuggingFaceEmbeddings(model_name=model_name, model_kwargs={"device": "cpu"})
+    if backend == "onnx":
+        return OnnxEmbeddings(model_name)
+    if backend == "onnx-int8":
+        return OnnxEmbeddings(model_name, quantizado=True)
+    raise ValueError(f"EMBED_BACKEND inválido: {backend!r} (use um de {', '.join(BACKENDS)})")
@@ -0,0 +1,204 @@
+"""
+embedding_cache.py - Cache persistente de embeddings, compartilhado pelos indexadores
+
+A chave é (nome do modelo, hash do texto já com prefixo, ex. "passage: ...").
+Os vetores ficam em float16 num arquivo por modelo (<dir>/<modelo>.f16, lido
+com np.memmap) e o índice hash -> linha num SQLite (<dir>/index.sqlite3).
+
+Reindexar, recriar uma coleção ou voltar a um modelo já testado só embeda os
+textos nunca vistos por aquele modelo. Os vetores voltam em float32; a
+conversão para float16 perde menos de 1e-3 de similaridade de cosseno.
+
+Vários processos (os dois indexadores, os workers do embedding_workers) podem
+gravar no mesmo cache: cada acréscimo acontece sob flock no arquivo de vetores,
+e a linha inicial é lida do fim do arquivo dentro da trava.
+
+Uso:
+    cache = EmbeddingCache("./cache/embeddings", "intfloat/multilingual-e5-small")
+    vetores = cache.encode(textos, lambda t: model.encode(t, convert_to_numpy=True))
+
+    # LangChain (Chroma etc.)
+    embeddings = CachedEmbeddings(HuggingFaceEmbeddings(...), cache)
+"""
+import os
+import re
+import fcntl
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+from dotenv import load_dotenv
+from langchain_core.embeddings import Embeddings
+
+load_dotenv()
+
+EMBED_CACHE_ENABLED = os.getenv("EMBED_CACHE_ENABLED", "1") == "1"
+EMBED_CACHE_DIR = os.getenv("EMBED_CACHE_DIR", "./cache/embeddings")
+
+
+def hash_texto(texto: str) -> bytes:
+    return hashlib.blake2b(texto.encode("utf-8"), digest_size=16).digest()
+
+
+class EmbeddingCache:
+    """Vetores float16 em memmap (append-only) + índice SQLite, por modelo"""
+
+    def __init__(self, diretorio: str, model_name: str):
+        self.diretorio = Path(diretorio)
+        self.model_name = model_name or ""
+        self.diretorio.mkdir(parents=True, exist_ok=True)
+        self.caminho_vetores = self.diretorio / (re.sub(r"[^\w.-]+", "_", self.model_name) + ".f16")
+
+        self.stats_counters = {"hits": 0, "misses": 0}
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(str(self.diretorio / "index.sqlite3"), check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS vetores (
+                model TEXT NOT NULL,
+                hash BLOB NOT NULL,
+                linha INTEGER NOT NULL,
+                PRIMARY KEY (model, hash)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS modelos (model TEXT PRIMARY KEY, dim INTEGER NOT NULL);
+        """)
+        self._conn.commit()
+
+        row = self._conn.execute("SELECT dim FROM modelos WHERE model = ?", (self.model_name,)).fetchone()
+        self.dim: Optional[int] = row[0] if row else None
+        self._memmap: Optional[np.memmap] = None
+        self._linhas = 0
+        if self.dim:
+            with self._arquivo_travado() as f:
+                linhas = self._fim_alinhado(f) // (self.dim * 2)
+                # Arquivo de vetores truncado/apagado: índices além do fim não valem mais
+                self._conn.execute("DELETE FROM vetores WHERE model = ? AND linha >= ?", (self.model_name, linhas))
+                self._conn.commit()
+            self._abrir()
+
+    @contextmanager
+    def _arquivo_travado(self):
+        """Arquivo de vetores aberto para acréscimo, com trava exclusiva entre processos"""
+        with open(self.caminho_vetores, "ab") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield f
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _fim_alinhado(self, f) -> int:
+        """Tamanho do arquivo travado; linha incompleta de uma gravação interrompida é descartada"""
+        tamanho_linha = self.dim * 2
+        fim = f.seek(0, os.SEEK_END)
+        if fim % tamanho_linha:
+            fim -= fim % tamanho_linha
+            f.truncate(fim)
+        return fim
+
+    def _abrir(self):
+        """(Re)mapeia as linhas completas do arquivo (outro processo pode estar gravando a seguinte)"""
+        tamanho_linha = self.dim * 2
+        tamanho = self.caminho_vetores.stat().st_size if self.caminho_vetores.exists() else 0
+        self._linhas = tamanho // tamanho_linha
+        self._memmap = (np.memmap(self.caminho_vetores, dtype=np.float16, mode="r", shape=(self._linhas, self.dim))
+                        if self._linhas else None)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM vetores WHERE model = ?", (self.model_name,)).fetchone()[0]
+
+    def get_many(self, textos: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Vetor (float32) de cada texto, ou None se ainda não estiver no cache"""
+        hashes = [hash_texto(t) for t in textos]
+        linhas: Dict[bytes, int] = {}
+        with self._lock:
+            for i in range(0, len(hashes), 500):
+                lote = list(set(hashes[i:i + 500]))
+                linhas.update(self._conn.execute(
+                    f"SELECT hash, linha FROM vetores WHERE model = ? AND hash IN ({','.join('?' * len(lote))})",
+                    [self.model_name, *lote]
+                ).fetchall())
+            if linhas and max(linhas.values()) >= self._linhas:
+                # Linhas acrescentadas por outro processo depois do último mapeamento
+                self._abrir()
+            memmap = self._memmap
+        if memmap is None:
+            return [None] * len(hashes)
+        return [np.asarray(memmap[linhas[h]], dtype=np.float32) if h in linhas else None for h in hashes]
+
+    def put_many(self, textos: Sequence[str], vetores: np.ndarray):
+        vetores = np.asarray(vetores, dtype=np.float32)
+        if not len(textos):
+            return
+        with self._lock:
+            if self.dim is None:
+                self.dim = int(vetores.shape[1])
+                self._conn.execute("INSERT OR REPLACE INTO modelos (model, dim) VALUES (?, ?)",
+                                   (self.model_name, self.dim))
+                self._conn.commit()
+            if vetores.shape[1] != self.dim:
+                raise ValueError(f"Dimensão {vetores.shape[1]} diferente da do cache ({self.dim}) para {self.model_name}")
+
+            # Vetores primeiro, índice depois: um índice nunca aponta para linha não gravada.
+            # A linha inicial sai do fim do arquivo sob a trava, não do último _abrir()
+            # (outro processo pode ter acrescentado linhas desde então)
+            with self._arquivo_travado() as f:
+                inicio = self._fim_alinhado(f) // (self.dim * 2)
+                f.write(vetores.astype(np.float16).tobytes())
+                f.flush()
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO vetores (model, hash, linha) VALUES (?, ?, ?)",
+                    [(self.model_name, hash_texto(t), inicio + i) for i, t in enumerate(textos)]
+                )
+                self._conn.commit()
+            self._abrir()
+
+    def encode(self, textos: Sequence[str], encode_fn: Callable[[List[str]], Sequence[Sequence[float]]]) -> np.ndarray:
+        """Vetores de todos os textos; só os ausentes (sem repetição) passam por encode_fn"""
+        vetores = self.get_many(textos)
+        faltando: Dict[str, List[int]] = {}
+        for i, (texto, vetor) in enumerate(zip(textos, vetores)):
+            if vetor is None:
+                faltando.setdefault(texto, []).append(i)
+
+        self.stats_counters["hits"] += len(textos) - sum(len(v) for v in faltando.values())
+        self.stats_counters["misses"] += len(faltando)
+        if faltando:
+            novos_textos = list(faltando)
+            novos = np.asarray(encode_fn(novos_textos), dtype=np.float32)
+            self.put_many(novos_textos, novos)
+            for texto, vetor in zip(novos_textos, novos):
+                for i in faltando[texto]:
+                    vetores[i] = vetor
+
+        if not vetores:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        return np.vstack(vetores)
+
+    def stats(self) -> Dict:
+        return {**self.stats_counters, "model": self.model_name, "dim": self.dim, "entries": len(self)}
+
+    def close(self):
+        with self._lock:
+            self._memmap = None
+            self._conn.close()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings do LangChain com cache nos documentos (embed_documents).
+    Consultas (embed_query) vão direto ao modelo.
+    """
+
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache):
+        self.embeddings = embeddings
+        self.cache = cache
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.cache.encode(texts, self.embeddings.embed_documents).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
@@ -0,0 +1,137 @@
+"""
+embedding_workers.py - Embeddings em vários processos para indexar corpora grandes
+
+Sem GPU, um único SentenceTransformer não escala com o número de núcleos.
+Aqui os textos são divididos em shards e distribuídos entre N processos,
+cada um com seu próprio modelo e com o número de threads do torch fixado
+(núcleos / N, ou EMBED_THREADS_POR_WORKER), para não disputarem a CPU.
+Os vetores voltam na ordem dos textos.
+
+Os processos são criados com "spawn": fork depois do torch já carregado
+no processo principal pode travar os pools de threads (OpenMP).
+
+Uso:
+    with EncoderMultiprocesso(model_name, workers=8) as encoder:
+        vetores = encoder.encode(textos)
+        print(encoder.docs_por_segundo)
+
+    # LangChain (Chroma etc.)
+    embeddings = EmbeddingsMultiprocesso(encoder)
+"""
+import os
+import time
+from multiprocessing import get_context
+from typing import List, Optional, Sequence
+
+import numpy as np
+from dotenv import load_dotenv
+from langchain_core.embeddings import Embeddings
+
+load_dotenv()
+
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "1"))  # 0 = todos os núcleos
+EMBED_THREADS_POR_WORKER = int(os.getenv("EMBED_THREADS_POR_WORKER", "0"))  # 0 = núcleos / workers
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))
+
+
+def resolver_workers(workers: int) -> int:
+    return workers if workers > 0 else (os.cpu_count() or 1)
+
+
+# ============================================================================
+# PROCESSO WORKER
+# ============================================================================
+
+_modelo = None
+_batch_size = EMBED_BATCH_SIZE
+
+
+def _iniciar_worker(model_name: str, threads: int, batch_size: int):
+    """Initializer do Pool: fixa as threads e carrega o modelo uma vez por processo"""
+    global _modelo, _batch_size
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ[var] = str(threads)
+
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    torch.set_num_threads(threads)
+    _modelo = SentenceTransformer(model_name, device="cpu")
+    _batch_size = batch_size
+
+
+def _encode_shard(textos: List[str]) -> np.ndarray:
+    return _modelo.encode(textos, batch_size=_batch_size, convert_to_numpy=True,
+                          show_progress_bar=False).astype(np.float32)
+
+
+# ============================================================================
+# POOL
+# ============================================================================
+
+class EncoderMultiprocesso:
+    """Pool de processos com um modelo cada; encode() divide os textos em shards"""
+
+    def __init__(self, model_name: str, workers: int = EMBED_WORKERS,
+                 threads_por_worker: int = EMBED_THREADS_POR_WORKER,
+                 batch_size: int = EMBED_BATCH_SIZE, shard_size: Optional[int] = None):
+        self.model_name = model_name
+        self.workers = resolver_workers(workers)
+        self.threads_por_worker = threads_por_worker or max(1, (os.cpu_count() or 1) // self.workers)
+        self.batch_size = batch_size
+        # Shards pequenos equilibram a carga; grandes o bastante para lotes cheios
+        self.shard_size = shard_size or batch_size * 4
+
+        self.docs = 0
+        self.segundos = 0.0
+
+        inicio = time.perf_counter()
+        self._pool = get_context("spawn").Pool(
+            self.workers, initializer=_iniciar_worker,
+            initargs=(model_name, self.threads_por_worker, batch_size)
+        )
+        # Força a carga dos modelos agora, fora da medição de docs/s
+        self._pool.map(_encode_shard, [["aquecimento"]] * self.workers, chunksize=1)
+        self.segundos_carga = time.perf_counter() - inicio
+
+    def encode(self, textos: Sequence[str]) -> np.ndarray:
+        """Vetores (float32) na ordem de textos"""
+        if not textos:
+            return np.zeros((0, 0), dtype=np.float32)
+        inicio = time.perf_counter()
+        shards = [list(textos[i:i + self.shard_size]) for i in range(0, len(textos), self.shard_size)]
+        vetores = np.vstack(list(self._pool.imap(_encode_shard, shards)))
+        self.segundos += time.perf_counter() - inicio
+        self.docs += len(textos)
+        return vetores
+
+    @property
+    def docs_por_segundo(self) -> float:
+        return self.docs / self.segundos if self.segundos else 0.0
+
+    def close(self):
+        self._pool.close()
+        self._pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class EmbeddingsMultiprocesso(Embeddings):
+    """
+    Embeddings do LangChain sobre o pool, com o mesmo pré-processamento do
+    HuggingFaceEmbeddings (quebras de linha viram espaço), para que os
+    vetores sejam os mesmos do modo de um processo.
+    """
+
+    def __init__(self, encoder: EncoderMultiprocesso):
+        self.encoder = encoder
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.encoder.encode([t.replace("\n", " ") for t in texts]).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
@@ -0,0 +1,197 @@
+"""
+lexical_index.py - Índice invertido BM25 em processo, ao lado das coleções do Chroma
+
+A busca densa perde perguntas que citam dispositivos ("art. 35", "art. 306
+do CTB") ou termos exatos ("insignificância"). Este índice léxico é
+construído a partir dos mesmos documentos das coleções do Chroma (com os
+mesmos ids) e o rag_core funde os dois rankings com reciprocal rank fusion.
+
+Tokens: minúsculas, sem acentos, sem stopwords; cada referência a artigo
+("art. 35", "artigo 121", "arts. 33") gera também o token "art_<n>".
+
+Em disco, um diretório por coleção (<dir>/<coleção>/):
+    meta.json      n_docs, avgdl, versão do tokenizador
+    vocab.json     termos, na ordem das listas de postings
+    ids.json       id no Chroma de cada documento
+    offsets.npy    int64 [V+1]: postings do termo t em [offsets[t], offsets[t+1])
+    docs.npy       uint32: documento de cada posting (ordenado dentro do termo)
+    tfs.npy        uint16: frequência do termo no documento
+    doc_len.npy    uint32: tokens por documento
+
+Os .npy são abertos com mmap; uma consulta soma os scores BM25 dos termos
+num vetor numpy (poucos ms mesmo com dezenas de milhares de documentos).
+
+Uso:
+    construir_indice(collection, LEXICAL_INDEX_DIR)   # ao fim de cada indexador
+    indice = LexicalIndex.carregar(LEXICAL_INDEX_DIR, "jurisprudencia_br_v1")
+    indice.buscar("furto insignificância art. 155", k=20)  # [(id, score), ...]
+
+    python lexical_index.py     # reconstrói os índices de todas as coleções
+"""
+import os
+import re
+import json
+import math
+from pathlib import Path
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LEXICAL_INDEX_DIR = os.getenv("LEXICAL_INDEX_DIR", "./vectordb/lexical")
+VERSAO_TOKENIZADOR = 1
+
+# Parâmetros usuais do BM25
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_ACENTOS = str.maketrans("áàâãäéèêëíìîïóòôõöúùûüçñ", "aaaaaeeeeiiiiooooouuuucn")
+_TOKEN_RE = re.compile(r"\w+")
+_ARTIGO_RE = re.compile(r"\bart(?:igo)?s?\.?\s*(\d+)")
+# Prefixos dos modelos e5 (create_db_*) e palavras sem valor de busca
+STOPWORDS = frozenset("""
+    passage query a o e as os de da do das dos em no na nos nas um uma uns umas por para com sem
+    que se ao aos ou como mais mas foi ser sao esta este isso essa esse pelo pela pelos pelas
+    sua seu suas seus ja nao entre sobre quando qual quais tem ha
+""".split())
+
+
+def tokenizar(texto: str) -> List[str]:
+    texto = texto.lower().translate(_ACENTOS)
+    tokens = [t for t in _TOKEN_RE.findall(texto) if t not in STOPWORDS and (len(t) > 1 or t.isdigit())]
+    tokens.extend("art_" + n for n in _ARTIGO_RE.findall(texto))
+    return tokens
+
+
+class LexicalIndex:
+    """Postings compactos (numpy) + BM25; somente leitura depois de construído"""
+
+    def __init__(self, ids: List[str], vocab: List[str], offsets: np.ndarray, docs: np.ndarray,
+                 tfs: np.ndarray, doc_len: np.ndarray):
+        self.ids = ids
+        self.termos = {t: i for i, t in enumerate(vocab)}
+        self.offsets = offsets
+        self.docs = docs
+        self.tfs = tfs
+        self.doc_len = doc_len
+        self.n_docs = len(ids)
+        self.avgdl = float(doc_len.mean()) if self.n_docs else 0.0
+        # Denominador do BM25 sem o tf, pré-calculado por documento
+        self._norma = (BM25_K1 * (1 - BM25_B + BM25_B * doc_len / (self.avgdl or 1.0))).astype(np.float32)
+
+    @classmethod
+    def construir(cls, documentos: List[Tuple[str, str]]) -> "LexicalIndex":
+        """Índice a partir de pares (id, texto)"""
+        postings: Dict[str, Tuple[List[int], List[int]]] = {}
+        ids, doc_len = [], []
+        for doc, (doc_id, texto) in enumerate(documentos):
+            contagem = Counter(tokenizar(texto or ""))
+            ids.append(doc_id)
+            doc_len.append(sum(contagem.values()))
+            for termo, tf in contagem.items():
+                p = postings.setdefault(termo, ([], []))
+                p[0].append(doc)
+                p[1].append(min(tf, 65535))
+
+        vocab = sorted(postings)
+        tamanhos = np.array([len(postings[t][0]) for t in vocab], dtype=np.int64)
+        offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(tamanhos, out=offsets[1:])
+        docs = np.fromiter((d for t in vocab for d in postings[t][0]), dtype=np.uint32, count=int(offsets[-1]))
+        tfs = np.fromiter((f for t in vocab for f in postings[t][1]), dtype=np.uint16, count=int(offsets[-1]))
+        return cls(ids, vocab, offsets, docs, tfs, np.array(doc_len, dtype=np.uint32))
+
+    def salvar(self, diretorio: Path):
+        """Grava num diretório temporário e troca de uma vez (leitores nunca veem meio índice)"""
+        diretorio = Path(diretorio)
+        tmp = diretorio.with_name(diretorio.name + ".tmp")
+        tmp.mkdir(parents=True, exist_ok=True)
+        for nome, arr in (("offsets", self.offsets), ("docs", self.docs), ("tfs", self.tfs),
+                          ("doc_len", self.doc_len)):
+            np.save(tmp / f"{nome}.npy", arr)
+        with open(tmp / "vocab.json", "w", encoding="utf-8") as f:
+            json.dump(sorted(self.termos, key=self.termos.get), f, ensure_ascii=False)
+        with open(tmp / "ids.json", "w", encoding="utf-8") as f:
+            json.dump(self.ids, f)
+        with open(tmp / "meta.json", "w", encoding="utf-8") as f:
+            json.dump({"versao": VERSAO_TOKENIZADOR, "n_docs": self.n_docs, "avgdl": self.avgdl,
+                       "termos": len(self.termos)}, f)
+
+        antigo = diretorio.with_name(diretorio.name + ".old")
+        if diretorio.exists():
+            os.replace(diretorio, antigo)
+        os.replace(tmp, diretorio)
+        if antigo.exists():
+            for arquivo in antigo.iterdir():
+                arquivo.unlink()
+            antigo.rmdir()
+
+    @classmethod
+    def carregar(cls, base: str, colecao: str) -> Optional["LexicalIndex"]:
+        """Índice da coleção, ou None se não existir ou for de outra versão do tokenizador"""
+        diretorio = Path(base) / colecao
+        try:
+            with open(diretorio / "meta.json", "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            return None
+        if meta.get("versao") != VERSAO_TOKENIZADOR:
+            return None
+        with open(diretorio / "vocab.json", "r", encoding="utf-8") as f:
+            vocab = json.load(f)
+        with open(diretorio / "ids.json", "r", encoding="utf-8") as f:
+            ids = json.load(f)
+        arrays = {nome: np.load(diretorio / f"{nome}.npy", mmap_mode="r")
+                  for nome in ("offsets", "docs", "tfs", "doc_len")}
+        return cls(ids, vocab, **arrays)
+
+    def buscar(self, consulta: str, k: int) -> List[Tuple[str, float]]:
+        """Top-k (id, score BM25) da consulta; só documentos com algum termo em comum"""
+        if k <= 0 or not self.n_docs:
+            return []
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        for termo in set(tokenizar(consulta)):
+            t = self.termos.get(termo)
+            if t is None:
+                continue
+            inicio, fim = self.offsets[t], self.offsets[t + 1]
+            docs = self.docs[inicio:fim]
+            tf = self.tfs[inicio:fim].astype(np.float32)
+            df = fim - inicio
+            idf = math.log(1 + (self.n_docs - df + 0.5) / (df + 0.5))
+            scores[docs] += idf * tf * (BM25_K1 + 1) / (tf + self._norma[docs])
+
+        candidatos = np.flatnonzero(scores)
+        if len(candidatos) > k:
+            candidatos = candidatos[np.argpartition(-scores[candidatos], k - 1)[:k]]
+        candidatos = candidatos[np.argsort(-scores[candidatos], kind="stable")]
+        return [(self.ids[i], float(scores[i])) for i in candidatos]
+
+
+def documentos_da_colecao(collection, lote: int = 5000) -> List[Tuple[str, str]]:
+    """Pares (id, texto) de uma coleção do Chroma, lidos em páginas"""
+    documentos = []
+    total = collection.count()
+    for offset in range(0, total, lote):
+        res = collection.get(include=["documents"], limit=lote, offset=offset)
+        documentos.extend(zip(res["ids"], (d or "" for d in res["documents"])))
+    return documentos
+
+
+def construir_indice(collection, base: str = LEXICAL_INDEX_DIR) -> LexicalIndex:
+    """(Re)constrói e grava o índice léxico de uma coleção do Chroma"""
+    indice = LexicalIndex.construir(documentos_da_colecao(collection))
+    indice.salvar(Path(base) / collection.name)
+    print(f"🔤 Índice léxico de {collection.name}: {indice.n_docs} documentos, {len(indice.termos)} termos")
+    return indice
+
+
+if __name__ == "__main__":
+    import chromadb
+
+    client = chromadb.PersistentClient(path=os.getenv("CHROMA_PATH", "./vectordb/chroma"))
+    for col in client.list_collections():
+        construir_indice(client.get_collection(getattr(col, "name", col)))
@@ -0,0 +1,110 @@
+"""
+query_filters.py - Filtros de metadados para o retrieval (crime, tribunal, tema...)
+
+Os indexadores já gravam crime/tribunal/orgao_julgador em cada chunk de
+jurisprudência e tema/artigo em cada artigo de legislação. Aqui a pergunta
+passa pelos mesmos detectores da sanitização (detectores_juridicos: crime,
+tribunal e órgão julgador), e o resultado vira um filtro `where` do Chroma
+para cada coleção.
+
+Filtros detectados são uma sugestão: o rag_core completa com a busca sem
+filtro quando o filtro devolve menos de k documentos. Filtros explícitos
+(QueryFilters passado pelo chamador) são obrigatórios.
+
+Uso:
+    filtros = detectar_filtros("Furto no STJ: cabe insignificância?")
+    filtros.where_juris()   # {"$and": [{"crime": {"$in": ["Furto"]}}, {"tribunal": {"$in": ["STJ"]}}]}
+    filtros.where_lei()     # {"tema": {"$in": ["Furto"]}}
+
+    dual_retrieve(pergunta, filters=QueryFilters(tribunal="STF"))
+"""
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Union
+
+from dotenv import load_dotenv
+
+from detectores_juridicos import CRIMES_KEYWORDS, classificar_crime, detectar_orgao_julgador, detectar_tribunal
+
+load_dotenv()
+
+QUERY_FILTERS_ENABLED = os.getenv("QUERY_FILTERS_ENABLED", "1") == "1"
+
+# Crime (rótulos de CRIMES_KEYWORDS, gravados nos chunks) -> tema da legislação (create_db_cp)
+TEMAS_POR_CRIME = {
+    "Estelionato": "Estelionato",
+    "Tráfico": "Tráfico de Drogas",
+    "Furto": "Furto",
+    "Lesão Corporal": "Lesão Corporal",
+    "Porte/Consumo": "Porte e Consumo de Drogas",
+    "Embriaguez": "Embriaguez ao Volante",
+    "Homicídio": "Homicídio",
+    "Roubo": "Roubo",
+    "Receptação": "Receptação",
+}
+
+Valores = Union[str, Sequence[str], None]
+
+
+def _lista(valor: Valores) -> List[str]:
+    if valor is None:
+        return []
+    if isinstance(valor, str):
+        return [valor]
+    return [v for v in valor if v]
+
+
+def _where(condicoes: Dict[str, List[str]]) -> Optional[Dict]:
+    clausulas = [{campo: {"$in": valores}} for campo, valores in condicoes.items() if valores]
+    if not clausulas:
+        return None
+    return clausulas[0] if len(clausulas) == 1 else {"$and": clausulas}
+
+
+@dataclass
+class QueryFilters:
+    """
+    Restrições de metadados por coleção. Cada campo aceita um valor ou uma
+    lista (qualquer um deles). Sem tema explícito, a legislação é filtrada
+    pelos temas dos crimes.
+    """
+    crime: Valores = None
+    tribunal: Valores = None
+    orgao_julgador: Valores = None
+    tema: Valores = None
+    artigo: Valores = None
+    # Detectados na pergunta (relaxáveis) ou passados pelo chamador (obrigatórios)
+    detectado: bool = False
+
+    def where_juris(self) -> Optional[Dict]:
+        return _where({
+            "crime": _lista(self.crime),
+            "tribunal": _lista(self.tribunal),
+            "orgao_julgador": _lista(self.orgao_julgador),
+        })
+
+    def where_lei(self) -> Optional[Dict]:
+        temas = _lista(self.tema) or [TEMAS_POR_CRIME[c] for c in _lista(self.crime) if c in TEMAS_POR_CRIME]
+        return _where({"tema": temas, "artigo": _lista(self.artigo)})
+
+    def to_dict(self) -> Dict:
+        return {k: v for k, v in {
+            "crime": _lista(self.crime), "tribunal": _lista(self.tribunal),
+            "orgao_julgador": _lista(self.orgao_julgador), "tema": _lista(self.tema),
+            "artigo": _lista(self.artigo), "detectado": self.detectado,
+        }.items() if v}
+
+
+def detectar_filtros(pergunta: str) -> Optional[QueryFilters]:
+    """Crimes, tribunal e órgão julgador mencionados na pergunta (None se nenhum)"""
+    _, crimes = classificar_crime(pergunta)
+    filtros = QueryFilters(
+        # Na ordem de CRIMES_KEYWORDS, como os rótulos gravados nos chunks
+        crime=[c for c in CRIMES_KEYWORDS if c in crimes] or None,
+        tribunal=detectar_tribunal(pergunta),
+        orgao_julgador=detectar_orgao_julgador(pergunta),
+        detectado=True,
+    )
+    if not (filtros.crime or filtros.tribunal or filtros.orgao_julgador):
+        return None
+    return filtros
@@ -1,8 +1,20 @@
 import os
 import sys
 import json
+import time
+import queue
+import threading
+import asyncio
+import contextvars
 import requests
-from typing import List, Dict, Tuple
+import aiohttp
+from functools import partial
+from contextlib import contextmanager
+from requests.adapters import HTTPAdapter
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from dataclasses import dataclass, field
+from typing import List, Dict, Tuple, Optional, Iterator, AsyncIterator
 from dotenv import load_dotenv
 load_dotenv()
 # CONFIGS
@@ -11,25 +23,67 @@ OLLAMA_MODEL = os.getenv("OLLAMA_MODEL")
 TEMPERATURE = float(os.getenv("OLLAMA_TEMPERATURE"))
 NUM_CTX = int(os.getenv("OLLAMA_NUM_CTX"))
 TOP_P = float(os.getenv("OLLAMA_TOP_P"))
+# Conexões keep-alive reaproveitadas com o Ollama
+OLLAMA_POOL_SIZE = int(os.getenv("OLLAMA_POOL_SIZE", "8"))
+# Gerações simultâneas por modelo, ex.: "llama3:8b-instruct-q6_K=1,llama3:3b-instruct-q8_0=2"
+OLLAMA_MODEL_CONCURRENCY = os.getenv("OLLAMA_MODEL_CONCURRENCY", "")
+OLLAMA_DEFAULT_CONCURRENCY = int(os.getenv("OLLAMA_DEFAULT_CONCURRENCY", "2"))
 K_JURIS = int(os.getenv("K_JURIS"))
 K_LEI = int(os.getenv("K_LEI"))
 
 # Imports corrigidos (LangChain v0.2+)
 from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
+
+from answer_cache import AnswerCache
+from embedding_backends import EMBED_BACKEND, criar_embeddings
+from lexical_index import LexicalIndex, LEXICAL_INDEX_DIR
+from article_index import ArticleIndex, ARTICLE_INDEX_PATH
+from reranker import CrossEncoderReranker, RERANK_ENABLED, RERANK_CANDIDATES
+from query_filters import QueryFilters, QUERY_FILTERS_ENABLED, detectar_filtros
+from context_packer import ContextPacker, OLLAMA_TOKENIZER, CONTEXT_MAX_TOKENS
+import tracing
+from tracing import Tracer, build_sinks
 
 # Use o MESMO modelo de embeddings da indexação
 EMBED_MODEL_NAME = os.getenv("EMBED_MODEL_NAME")
-# Forçar CPU para contornar incompatibilidade CUDA sm_61
-EMBEDDINGS = HuggingFaceEmbeddings(
-    model_name=EMBED_MODEL_NAME,
-    model_kwargs={"device": "cpu"}
-)
+# Sempre em CPU; EMBED_BACKEND=onnx|onnx-int8 evita o fp32 do torch (ver embedding_backends.py)
+EMBEDDINGS = criar_embeddings(EMBED_BACKEND, EMBED_MODEL_NAME)
+
+# Janela (ms) para agrupar perguntas concorrentes numa única passada do modelo
+EMBED_BATCH_WINDOW_MS = float(os.getenv("EMBED_BATCH_WINDOW_MS", "5"))
+EMBED_MAX_BATCH = int(os.getenv("EMBED_MAX_BATCH", "32"))
+# Threads para embedding/busca no Chroma quando chamados a partir do asyncio
+RETRIEVAL_WORKERS = int(os.getenv("RETRIEVAL_WORKERS", "4"))
 
 CHROMA_PATH = os.getenv("CHROMA_PATH", "./vectordb/chroma")
 JURIS_COLLECTION = "jurisprudencia_br_v1"
 LEI_COLLECTION = "legislacao_codigo_penal"
 
+# Busca híbrida: BM25 (lexical_index.py) + vetorial, fundidas por reciprocal rank fusion
+HYBRID_ENABLED = os.getenv("HYBRID_ENABLED", "1") == "1"
+# Candidatos de cada ranking (denso e léxico) por coleção antes da fusão
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+# Artigos citados na pergunta ("art. 155, § 2º") vão direto ao topo do contexto (article_index.py)
+ARTICLE_LOOKUP_ENABLED = os.getenv("ARTICLE_LOOKUP_ENABLED", "1") == "1"
+
+# Contextos do prompt por orçamento de tokens do modelo do Ollama (ver context_packer.py)
+CONTEXT_PACKER = ContextPacker(OLLAMA_TOKENIZER)
+
+# Cache semântico de respostas (ver answer_cache.py)
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "1") == "1"
+ANSWER_CACHE_PATH = os.getenv("ANSWER_CACHE_PATH", "./cache/answer_cache.sqlite3")
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "256"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", str(7 * 24 * 3600)))
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95"))
+
+# Traces por requisição (ver tracing.py): sinks "ring" e/ou "jsonl"
+TRACE_SINKS = os.getenv("TRACE_SINKS", "ring")
+TRACE_JSONL_PATH = os.getenv("TRACE_JSONL_PATH", "./logs/traces.jsonl")
+TRACE_RING_SIZE = int(os.getenv("TRACE_RING_SIZE", "500"))
+TRACER = Tracer(build_sinks(TRACE_SINKS, TRACE_JSONL_PATH, TRACE_RING_SIZE))
+
 SYSTEM_INSTRUCTIONS = """
 Você é um assistente jurídico especializado em Direito Penal brasileiro.
 
@@ -67,63 +121,509 @@ PROMPT_TEMPLATE = """
 - Cite as fontes no final no formato [Fonte N – {{source_meta}}].
 """
 
-def load_vectorstores():
-    juris = Chroma(
-        persist_directory=CHROMA_PATH,
-        embedding_function=EMBEDDINGS,
-        collection_name=JURIS_COLLECTION
-    )
-    lei = Chroma(
-        persist_directory=CHROMA_PATH,
-        embedding_function=EMBEDDINGS,
-        collection_name=LEI_COLLECTION
+class _HandleSet:
+    """Handles de uma abertura do índice e quantas consultas ainda os usam"""
+
+    def __init__(self, handles: Dict[str, Chroma], signature):
+        self.handles = handles
+        self.signature = signature
+        self.refs = 0
+        # Systems do chromadb desta abertura; parados quando a última consulta terminar
+        self.retired_systems: Optional[List] = None
+
+
+class VectorStorePool:
+    """
+    Registro thread-safe de handles Chroma de longa duração.
+
+    Os handles são construídos uma única vez por processo e reaproveitados
+    entre perguntas. Se o índice em disco mudar (reindexação por
+    create_db_cp.py / create_db_jurisprudencia.py), os handles são reabertos
+    na próxima consulta; os antigos só são fechados quando as consultas que
+    ainda os usam (acquire) terminam.
+    """
+
+    # Arquivos do Chroma cuja alteração indica que o índice mudou
+    INDEX_FILES = ("chroma.sqlite3", "chroma.sqlite3-wal")
+
+    def __init__(self, persist_directory: str, embedding_function, collections: List[str]):
+        self.persist_directory = persist_directory
+        self.embedding_function = embedding_function
+        self.collections = list(collections)
+        self.reloads = 0
+        self._lock = threading.RLock()
+        self._current: Optional[_HandleSet] = None
+
+    def index_signature(self) -> Optional[Tuple]:
+        """Assinatura (mtime, tamanho) dos arquivos do índice; muda a cada reindexação."""
+        signature = []
+        for name in self.INDEX_FILES:
+            try:
+                st = os.stat(Path(self.persist_directory) / name)
+            except FileNotFoundError:
+                continue
+            signature.append((name, st.st_mtime_ns, st.st_size))
+        return tuple(signature) or None
+
+    def _retire(self, old: _HandleSet):
+        """
+        Tira do cache do chromadb o System da abertura antiga, para que o
+        reopen leia o índice novo, sem pará-lo: consultas em andamento
+        continuam com ele até o release.
+        """
+        try:
+            from chromadb.api.client import SharedSystemClient
+            old.retired_systems = list(SharedSystemClient._identifier_to_system.values())
+            SharedSystemClient._identifier_to_system = {}
+        except Exception as e:
+            old.retired_systems = []
+            print(f"[AVISO] Não foi possível limpar o cache do chromadb: {e}")
+        if old.refs == 0:
+            self._close(old)
+
+    @staticmethod
+    def _close(old: _HandleSet):
+        for system in old.retired_systems or []:
+            try:
+                system.stop()
+            except Exception as e:
+                print(f"[AVISO] Erro ao fechar o índice antigo do chromadb: {e}")
+        old.retired_systems = []
+
+    def _open(self, signature):
+        if self._current is not None:
+            self._retire(self._current)
+            self.reloads += 1
+        self._current = _HandleSet({
+            name: Chroma(
+                persist_directory=self.persist_directory,
+                embedding_function=self.embedding_function,
+                collection_name=name
+            )
+            for name in self.collections
+        }, signature)
+
+    @contextmanager
+    def acquire(self) -> Iterator[Dict[str, Chroma]]:
+        """
+        Handles de todas as coleções, (re)abrindo se necessário. Uma
+        reindexação durante o bloco não fecha os handles em uso: eles ficam
+        válidos até a saída do bloco.
+        """
+        signature = self.index_signature()
+        with self._lock:
+            if self._current is None or signature != self._current.signature:
+                self._open(signature)
+            current = self._current
+            current.refs += 1
+        try:
+            yield current.handles
+        finally:
+            with self._lock:
+                current.refs -= 1
+                if current.refs == 0 and current.retired_systems:
+                    self._close(current)
+
+    def get(self, name: str) -> Chroma:
+        """
+        Retorna o handle da coleção, (re)abrindo se necessário. Não protege
+        contra uma reabertura durante o uso; consultas usam acquire().
+        """
+        with self.acquire() as handles:
+            return handles[name]
+
+    def warm_up(self):
+        """Abre os handles e faz uma busca mínima para carregar modelo e índice HNSW."""
+        with self.acquire() as handles:
+            for name in self.collections:
+                handles[name].similarity_search("aquecimento", k=1)
+
+    def health_check(self) -> Dict:
+        """Estado de cada coleção (contagem de documentos ou erro)."""
+        status = {"persist_directory": self.persist_directory, "reloads": self.reloads, "collections": {}}
+        for name in self.collections:
+            try:
+                with self.acquire() as handles:
+                    count = handles[name]._collection.count()
+                status["collections"][name] = {"ok": True, "count": count}
+            except Exception as e:
+                status["collections"][name] = {"ok": False, "error": str(e)}
+        status["ok"] = all(c["ok"] for c in status["collections"].values())
+        return status
+
+
+class LexicalIndexPool:
+    """
+    Índices léxicos por coleção, carregados uma vez por processo e recarregados
+    quando o meta.json muda (os indexadores reconstroem o índice ao final).
+    """
+
+    def __init__(self, base: str, collections: List[str]):
+        self.base = base
+        self.collections = list(collections)
+        self._lock = threading.Lock()
+        self._indices: Dict[str, Tuple[Optional[int], Optional[LexicalIndex]]] = {}
+
+    def _signature(self, name: str) -> Optional[int]:
+        try:
+            return os.stat(Path(self.base) / name / "meta.json").st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def get(self, name: str) -> Optional[LexicalIndex]:
+        """Índice da coleção, ou None se ainda não foi construído"""
+        signature = self._signature(name)
+        entry = self._indices.get(name)
+        if entry is None or entry[0] != signature:
+            with self._lock:
+                entry = self._indices.get(name)
+                if entry is None or entry[0] != signature:
+                    index = LexicalIndex.carregar(self.base, name) if signature else None
+                    if index is None:
+                        print(f"[AVISO] Sem índice léxico para {name}; só busca vetorial "
+                              f"(rode python lexical_index.py)")
+                    entry = (signature, index)
+                    self._indices[name] = entry
+        return entry[1]
+
+
+VECTOR_STORES = VectorStorePool(
+    persist_directory=CHROMA_PATH,
+    embedding_function=EMBEDDINGS,
+    collections=[JURIS_COLLECTION, LEI_COLLECTION]
+)
+LEXICAL_INDEXES = LexicalIndexPool(LEXICAL_INDEX_DIR, [JURIS_COLLECTION, LEI_COLLECTION])
+ARTICLE_INDEX = ArticleIndex(ARTICLE_INDEX_PATH)
+# Rerank opcional (RERANK_ENABLED): candidatos das duas coleções numa só escala
+RERANKER: Optional[CrossEncoderReranker] = CrossEncoderReranker() if RERANK_ENABLED else None
+
+# Cache de respostas: invalidado automaticamente quando o índice do Chroma muda
+ANSWER_CACHE = AnswerCache(
+    path=ANSWER_CACHE_PATH,
+    max_entries=ANSWER_CACHE_SIZE,
+    ttl_seconds=ANSWER_CACHE_TTL,
+    similarity_threshold=ANSWER_CACHE_SIMILARITY,
+    index_version_fn=lambda: VECTOR_STORES.index_signature()
+) if ANSWER_CACHE_ENABLED else None
+
+def answer_cache_params(model: str = OLLAMA_MODEL) -> str:
+    return AnswerCache.make_params(
+        model=model, k_juris=K_JURIS, k_lei=K_LEI, embed_model=EMBED_MODEL_NAME,
+        hybrid=HYBRID_ENABLED, article_lookup=ARTICLE_LOOKUP_ENABLED,
+        rerank=RERANKER.model_name if RERANKER else None, query_filters=QUERY_FILTERS_ENABLED,
+        context_tokens=CONTEXT_MAX_TOKENS, num_ctx=NUM_CTX
     )
-    return juris, lei
 
-def dual_retrieve(question: str, k_juris=3, k_lei=3) -> List[Dict]:
-    juris, lei = load_vectorstores()
-    docs_juris = juris.similarity_search_with_score(question, k=k_juris)
-    docs_lei = lei.similarity_search_with_score(question, k=k_lei)
+@contextmanager
+def load_vectorstores() -> Iterator[Tuple[Chroma, Chroma]]:
+    """Handles (jurisprudência, legislação), válidos até o fim do bloco mesmo com reindexação"""
+    with VECTOR_STORES.acquire() as handles:
+        yield handles[JURIS_COLLECTION], handles[LEI_COLLECTION]
+
+class QueryEmbeddingBatcher:
+    """
+    Agrupa perguntas que chegam ao mesmo tempo (ex.: várias mensagens do bot)
+    numa única chamada ao modelo de embeddings.
+
+    A primeira pergunta da fila abre uma janela de até EMBED_BATCH_WINDOW_MS,
+    mas só enquanto houver outras perguntas em andamento fora do lote: uma
+    pergunta sozinha é embedada na hora, e as concorrentes vão no mesmo
+    forward pass assim que todas entraram no lote.
+    """
+
+    def __init__(self, embeddings, window_ms: float, max_batch: int):
+        self.embeddings = embeddings
+        self.window = window_ms / 1000.0
+        self.max_batch = max(1, max_batch)
+        self._queue: "queue.Queue[Tuple[str, Future]]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        # Perguntas na fila ou no lote corrente (o worker desconta ao responder)
+        self._in_flight = 0
+
+    def _ensure_worker(self):
+        if self._worker is None:
+            with self._lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name="query-embedder", daemon=True)
+                    self._worker.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                    continue
+                except queue.Empty:
+                    pass
+                remaining = deadline - time.monotonic()
+                # Só espera enquanto houver outras perguntas em andamento fora do lote
+                if remaining <= 0 or self._in_flight <= len(batch):
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            try:
+                vectors = self.embeddings.embed_documents([q for q, _ in batch])
+            except Exception as e:
+                vectors, error = None, e
+            with self._lock:
+                self._in_flight -= len(batch)
+            for i, (_, future) in enumerate(batch):
+                if vectors is None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(vectors[i])
 
-    # Normalize results into a list of dicts: content, meta, score, origem
+    def embed(self, questions: List[str]) -> List[List[float]]:
+        # Listas já são um lote: embeda direto, sem passar pela janela
+        if len(questions) != 1 or self.window <= 0:
+            return self.embeddings.embed_documents(questions) if questions else []
+
+        self._ensure_worker()
+        future = Future()
+        with self._lock:
+            self._in_flight += 1
+        self._queue.put((questions[0], future))
+        return [future.result()]
+
+
+QUERY_EMBEDDER = QueryEmbeddingBatcher(EMBEDDINGS, EMBED_BATCH_WINDOW_MS, EMBED_MAX_BATCH)
+
+def embed_questions(questions: List[str]) -> List[List[float]]:
+    """Embeda as perguntas uma única vez (em lote) para buscar nas duas coleções"""
+    with tracing.span("embedding", n=len(questions)):
+        return QUERY_EMBEDDER.embed(questions)
+
+def _query_by_vectors(store: Chroma, vectors: List[List[float]], k: int, origem: str,
+                      where: Optional[Dict] = None) -> List[List[Dict]]:
+    """Busca k vizinhos para cada vetor numa única consulta à coleção (opcionalmente filtrada)"""
+    if k <= 0:
+        return [[] for _ in vectors]
+    res = store._collection.query(
+        query_embeddings=vectors,
+        n_results=k,
+        where=where,
+        include=["documents", "metadatas", "distances"]
+    )
     results = []
-    for doc, score in docs_juris:
-        results.append({
-            "content": doc.page_content,
-            "metadata": doc.metadata,
-            "score": float(score),
-            "origem": "jurisprudencia"
-        })
-    for doc, score in docs_lei:
-        results.append({
-            "content": doc.page_content,
-            "metadata": doc.metadata,
-            "score": float(score),
-            "origem": "legislacao"
-        })
-    # Opcional: reordenar por score ascendente
-    results.sort(key=lambda x: x["score"])
+    for ids, docs, metas, dists in zip(res["ids"], res["documents"], res["metadatas"], res["distances"]):
+        results.append([
+            {
+                "id": doc_id,
+                "content": doc,
+                "metadata": meta or {},
+                "score": float(dist),
+                "origem": origem
+            }
+            for doc_id, doc, meta, dist in zip(ids, docs, metas, dists)
+        ])
     return results
 
-def format_contexts(chunks: List[Dict], max_chars: int = 6000) -> Tuple[str, List[Dict]]:
-    formatted = []
-    used = []
-    total = 0
-    for i, ch in enumerate(chunks, start=1):
-        doc_id = ch["metadata"].get("id") or ch["metadata"].get("source") or ch["metadata"].get("file") or "doc"
-        titulo = ch["metadata"].get("titulo") or ch["metadata"].get("title") or doc_id
-        header = f"[Fonte {i}] id={doc_id}, origem={ch['origem']}, score={ch['score']:.4f}, titulo={titulo}\n"
-        block = header + ch["content"].strip() + "\n"
-        if total + len(block) > max_chars:
+def _lexical_search(name: str, questions: List[str], k: int) -> Optional[List[List[Tuple[str, float]]]]:
+    """Top-k BM25 de cada pergunta na coleção, ou None sem índice léxico"""
+    index = LEXICAL_INDEXES.get(name)
+    if index is None or k <= 0:
+        return None
+    return [index.buscar(q, k) for q in questions]
+
+def _fuse_rrf(store: Chroma, dense: List[Dict], lexical: List[Tuple[str, float]], k: int, origem: str,
+              where: Optional[Dict] = None) -> List[Dict]:
+    """
+    Reciprocal rank fusion dos rankings denso e léxico (1 / (RRF_K + posição)).
+
+    Documentos só do ranking léxico são lidos do Chroma (com o mesmo filtro
+    where da busca densa; o índice léxico não tem metadados). "score"
+    continua sendo "menor é melhor": 1 - rrf / rrf máximo possível (primeiro
+    nos dois rankings); a distância vetorial, quando houver, fica em "distance".
+    """
+    rrf: Dict[str, float] = {}
+    for rank, r in enumerate(dense):
+        rrf[r["id"]] = 1.0 / (RRF_K + rank + 1)
+    for rank, (doc_id, _) in enumerate(lexical):
+        rrf[doc_id] = rrf.get(doc_id, 0.0) + 1.0 / (RRF_K + rank + 1)
+    ranking = sorted(rrf, key=rrf.get, reverse=True)
+    # Com filtro, candidatos léxicos fora dele não podem ocupar vagas do top-k
+    top = ranking if where is not None else ranking[:k]
+
+    by_id = {r["id"]: r for r in dense}
+    missing = [doc_id for doc_id in top if doc_id not in by_id]
+    if missing:
+        res = store._collection.get(ids=missing, where=where, include=["documents", "metadatas"])
+        for doc_id, doc, meta in zip(res["ids"], res["documents"], res["metadatas"]):
+            by_id[doc_id] = {"id": doc_id, "content": doc, "metadata": meta or {}, "score": None, "origem": origem}
+
+    best = 2.0 / (RRF_K + 1)
+    fused = []
+    for doc_id in top:
+        r = by_id.get(doc_id)
+        if r is None:
+            # Fora do filtro, ou id do índice léxico que já saiu da coleção (índice ainda não reconstruído)
+            continue
+        fused.append({**r, "distance": r["score"], "rrf": rrf[doc_id], "score": 1.0 - rrf[doc_id] / best})
+        if len(fused) == k:
             break
-        formatted.append(block)
-        used.append(ch)
-        total += len(block)
-    return "\n".join(formatted), used
+    return fused
 
-def call_ollama(prompt: str, model: str = OLLAMA_MODEL) -> str:
-    url = f"{OLLAMA_URL}/api/generate"
-    payload = {
+def _retrieve_where(store: Chroma, name: str, vectors: List[List[float]], questions: Optional[List[str]],
+                    k: int, origem: str, where: Optional[Dict]) -> List[List[Dict]]:
+    """Busca vetorial na coleção; com perguntas e índice léxico, busca híbrida"""
+    lexical = None
+    hybrid = HYBRID_ENABLED and questions is not None and k > 0
+    if hybrid:
+        with tracing.span("busca_lexica", colecao=name) as sp:
+            lexical = _lexical_search(name, questions, max(k, HYBRID_CANDIDATES))
+            sp["docs"] = sum(len(r) for r in lexical) if lexical else 0
+    if lexical is None:
+        dense = _query_by_vectors(store, vectors, k, origem, where)
+        if not hybrid:
+            return dense
+        # Coleção sem índice léxico ao lado de outra com: o mesmo score de RRF,
+        # com o ranking léxico vazio, para as coleções serem comparáveis na ordenação
+        return [_fuse_rrf(store, d, [], k, origem, where) for d in dense]
+
+    dense = _query_by_vectors(store, vectors, max(k, HYBRID_CANDIDATES), origem, where)
+    return [_fuse_rrf(store, d, l, k, origem, where) for d, l in zip(dense, lexical)]
+
+def _retrieve_collection(store: Chroma, name: str, vectors: List[List[float]], questions: Optional[List[str]],
+                         k: int, origem: str, wheres: Optional[List[Optional[Dict]]] = None,
+                         relax: Optional[List[bool]] = None) -> List[List[Dict]]:
+    """
+    Retrieval na coleção com um filtro where por pergunta (None = sem filtro).
+
+    Perguntas com o mesmo filtro vão numa única consulta. Filtros relaxáveis
+    (detectados na pergunta) que devolvem menos de k documentos são
+    completados com a busca sem filtro.
+    """
+    wheres = wheres or [None] * len(vectors)
+    relax = relax or [False] * len(vectors)
+    groups: Dict[str, List[int]] = {}
+    for i, where in enumerate(wheres):
+        groups.setdefault(json.dumps(where, sort_keys=True, ensure_ascii=False), []).append(i)
+
+    results: List[List[Dict]] = [[] for _ in vectors]
+    for idx in groups.values():
+        sub = _retrieve_where(store, name, [vectors[i] for i in idx],
+                              [questions[i] for i in idx] if questions is not None else None,
+                              k, origem, wheres[idx[0]])
+        for i, r in zip(idx, sub):
+            results[i] = r
+
+    short = [i for i, where in enumerate(wheres) if where is not None and relax[i] and len(results[i]) < k]
+    if short:
+        extra = _retrieve_where(store, name, [vectors[i] for i in short],
+                                [questions[i] for i in short] if questions is not None else None,
+                                k, origem, None)
+        for i, r in zip(short, extra):
+            seen = {x["id"] for x in results[i]}
+            results[i] = results[i] + [x for x in r if x["id"] not in seen][:k - len(results[i])]
+    return results
+
+def dual_retrieve_by_vectors(vectors: List[List[float]], k_juris=3, k_lei=3,
+                             questions: Optional[List[str]] = None,
+                             filters: Optional[List[Optional[QueryFilters]]] = None) -> List[List[Dict]]:
+    """
+    Retrieval nas duas coleções a partir de embeddings de pergunta já calculados.
+
+    questions (os textos dos vetores) ativa a busca híbrida com o índice léxico
+    (HYBRID_ENABLED) e os artigos citados na pergunta (ARTICLE_LOOKUP_ENABLED),
+    que vêm primeiro e ocupam as vagas dos k_lei da busca na legislação;
+    sem eles, só a busca vetorial.
+
+    Com RERANKER, cada coleção devolve RERANK_CANDIDATES candidatos e o
+    cross-encoder escolhe os k_juris + k_lei melhores da lista combinada.
+
+    filters (um QueryFilters ou None por vetor) restringe cada coleção por
+    metadados; sem ele, com QUERY_FILTERS_ENABLED, crime e tribunal são
+    detectados nas perguntas (query_filters.py).
+    """
+    if not vectors:
+        return []
+    if filters is None:
+        filters = [None] * len(vectors)
+        if QUERY_FILTERS_ENABLED and questions is not None:
+            with tracing.span("filtros") as sp:
+                filters = [detectar_filtros(q) for q in questions]
+                sp["filtros"] = [f.to_dict() if f else None for f in filters]
+    where_juris = [f.where_juris() if f else None for f in filters]
+    where_lei = [f.where_lei() if f else None for f in filters]
+    relax = [bool(f and f.detectado) for f in filters]
+    cited = [[] for _ in vectors]
+    if ARTICLE_LOOKUP_ENABLED and questions is not None:
+        with tracing.span("artigos_citados") as sp:
+            cited = [ARTICLE_INDEX.citados(q) for q in questions]
+            sp["docs"] = sum(len(c) for c in cited)
+    rerank = RERANKER is not None and questions is not None
+    fetch_juris = max(k_juris, RERANK_CANDIDATES) if rerank and k_juris > 0 else k_juris
+    fetch_lei = max(k_lei, RERANK_CANDIDATES) if rerank and k_lei > 0 else k_lei
+
+    with load_vectorstores() as (juris, lei):
+        with tracing.span("busca_juris", k=fetch_juris) as sp:
+            docs_juris = _retrieve_collection(juris, JURIS_COLLECTION, vectors, questions, fetch_juris,
+                                              "jurisprudencia", where_juris, relax)
+            sp["docs"] = sum(len(r) for r in docs_juris)
+        with tracing.span("busca_lei", k=fetch_lei) as sp:
+            docs_lei = _retrieve_collection(lei, LEI_COLLECTION, vectors, questions, fetch_lei, "legislacao",
+                                            where_lei, relax)
+            sp["docs"] = sum(len(r) for r in docs_lei)
+
+    all_results = []
+    for i, (res_juris, res_lei, res_cited) in enumerate(zip(docs_juris, docs_lei, cited)):
+        cited_ids = {r["id"] for r in res_cited}
+        res_lei = [r for r in res_lei if r["id"] not in cited_ids]
+        if rerank:
+            with tracing.span("rerank") as sp:
+                # Sem tempo para pontuar todos, os restantes seguem a ordem do retrieval
+                candidates = sorted(res_juris + res_lei, key=lambda x: x["score"])
+                results, stats = RERANKER.rerank(
+                    questions[i], candidates, top_k=max(0, k_juris + k_lei - len(res_cited))
+                )
+                sp.update(stats)
+        else:
+            results = res_juris + res_lei[:max(0, k_lei - len(res_cited))]
+            # Opcional: reordenar por score ascendente
+            results.sort(key=lambda x: x["score"])
+        all_results.append(res_cited + results)
+    return all_results
+
+def dual_retrieve_batch(questions: List[str], k_juris=3, k_lei=3,
+                        filters: Optional[QueryFilters] = None) -> List[List[Dict]]:
+    """
+    Retrieval de várias perguntas com uma única passada de embeddings.
+
+    Cada pergunta é embedada uma vez e o mesmo vetor é usado nas coleções de
+    jurisprudência e de legislação. filters, se passado, vale para todas as
+    perguntas (e desliga a detecção automática).
+    """
+    if not questions:
+        return []
+    return dual_retrieve_by_vectors(embed_questions(questions), k_juris=k_juris, k_lei=k_lei, questions=questions,
+                                    filters=[filters] * len(questions) if filters is not None else None)
+
+def dual_retrieve(question: str, k_juris=3, k_lei=3, filters: Optional[QueryFilters] = None) -> List[Dict]:
+    return dual_retrieve_batch([question], k_juris=k_juris, k_lei=k_lei, filters=filters)[0]
+
+def context_budget(question: str) -> int:
+    """Tokens para os contextos: NUM_CTX menos o prompt da pergunta e a reserva da resposta"""
+    return CONTEXT_PACKER.budget(build_prompt(question, ""), NUM_CTX)
+
+def format_contexts(chunks: List[Dict], max_tokens: Optional[int] = None,
+                    question: Optional[str] = None) -> Tuple[str, List[Dict]]:
+    """
+    Contextos do prompt dentro de max_tokens tokens (por padrão, context_budget
+    da pergunta, ou CONTEXT_MAX_TOKENS sem ela). Chunks do mesmo acórdão viram
+    uma fonte só e a última que não cabe inteira é cortada (context_packer.py).
+    """
+    if max_tokens is None:
+        max_tokens = context_budget(question) if question is not None else CONTEXT_MAX_TOKENS
+    return CONTEXT_PACKER.format(chunks, max_tokens)
+
+def _ollama_payload(prompt: str, model: str, stream: bool) -> Dict:
+    return {
         "model": model,
         "prompt": prompt,
         "options": {
@@ -131,22 +631,181 @@ def call_ollama(prompt: str, model: str = OLLAMA_MODEL) -> str:
             "top_p": TOP_P,
             "num_ctx": NUM_CTX
         },
-        "stream": False
+        "stream": stream
     }
-    r = requests.post(url, json=payload, timeout=180)
+
+def _make_ollama_session() -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=OLLAMA_POOL_SIZE)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+# Sessão HTTP compartilhada: reaproveita conexões entre chamadas ao Ollama
+OLLAMA_HTTP = _make_ollama_session()
+
+def call_ollama(prompt: str, model: str = OLLAMA_MODEL) -> str:
+    url = f"{OLLAMA_URL}/api/generate"
+    payload = _ollama_payload(prompt, model, stream=False)
+    r = OLLAMA_HTTP.post(url, json=payload, timeout=180)
     r.raise_for_status()
     data = r.json()
+    _annotate_ollama_counts(data)
     return data.get("response", "").strip()
 
-def answer(question: str):
-    retrieved = dual_retrieve(question, k_juris=K_JURIS, k_lei=K_LEI)
-    contexts_str, used = format_contexts(retrieved)
-    prompt = PROMPT_TEMPLATE.format(
+def call_ollama_stream(prompt: str, model: str = OLLAMA_MODEL) -> Iterator[str]:
+    """
+    Versão em streaming de call_ollama: produz os tokens à medida que o
+    /api/generate do Ollama os envia (uma linha JSON por fragmento).
+    """
+    url = f"{OLLAMA_URL}/api/generate"
+    payload = _ollama_payload(prompt, model, stream=True)
+    # O timeout de leitura vale entre fragmentos, não para a geração inteira
+    with OLLAMA_HTTP.post(url, json=payload, stream=True, timeout=(10, 180)) as r:
+        r.raise_for_status()
+        for line in r.iter_lines(chunk_size=None):
+            if not line:
+                continue
+            data = json.loads(line)
+            if data.get("error"):
+                raise RuntimeError(f"Ollama: {data['error']}")
+            token = data.get("response", "")
+            if token:
+                yield token
+            if data.get("done"):
+                _annotate_ollama_counts(data)
+                break
+
+
+def _annotate_ollama_counts(data: Dict):
+    """Tokens do prompt e da resposta, como contados pelo próprio Ollama"""
+    tracing.annotate(
+        prompt_tokens=data.get("prompt_eval_count"),
+        completion_tokens=data.get("eval_count")
+    )
+
+
+def parse_model_limits(spec: str) -> Dict[str, int]:
+    """Converte "modeloA=1,modeloB=2" em {"modeloA": 1, "modeloB": 2}"""
+    limits = {}
+    for item in spec.split(","):
+        if "=" not in item:
+            continue
+        model, _, limit = item.rpartition("=")
+        if model.strip() and limit.strip():
+            limits[model.strip()] = max(1, int(limit))
+    return limits
+
+
+class AsyncOllamaClient:
+    """
+    Cliente assíncrono do Ollama.
+
+    Mantém uma única aiohttp.ClientSession com conexões keep-alive e limita
+    quantas gerações rodam ao mesmo tempo em cada modelo (as demais esperam
+    no semáforo, sem ocupar threads).
+    """
+
+    def __init__(self, base_url: str, pool_size: int, model_limits: Dict[str, int], default_limit: int):
+        self.base_url = base_url
+        self.pool_size = pool_size
+        self.model_limits = model_limits
+        self.default_limit = max(1, default_limit)
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop = None
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    def _bind_loop(self):
+        # Sessão e semáforos pertencem a um event loop; recria se o loop mudou
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._session = None
+            self._semaphores = {}
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        self._bind_loop()
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=180)
+            )
+        return self._session
+
+    def semaphore(self, model: str) -> asyncio.Semaphore:
+        self._bind_loop()
+        if model not in self._semaphores:
+            self._semaphores[model] = asyncio.Semaphore(self.model_limits.get(model, self.default_limit))
+        return self._semaphores[model]
+
+    async def generate(self, prompt: str, model: str = OLLAMA_MODEL) -> str:
+        response, _ = await self.generate_timed(prompt, model=model)
+        return response
+
+    async def generate_timed(self, prompt: str, model: str = OLLAMA_MODEL) -> Tuple[str, float]:
+        """Gera e retorna (resposta, segundos), sem contar a espera no semáforo do modelo"""
+        session = self._get_session()
+        async with self.semaphore(model):
+            start = time.perf_counter()
+            async with session.post(
+                f"{self.base_url}/api/generate", json=_ollama_payload(prompt, model, stream=False)
+            ) as r:
+                r.raise_for_status()
+                data = await r.json(content_type=None)
+            elapsed = time.perf_counter() - start
+        _annotate_ollama_counts(data)
+        return data.get("response", "").strip(), elapsed
+
+    async def generate_stream(self, prompt: str, model: str = OLLAMA_MODEL) -> AsyncIterator[str]:
+        session = self._get_session()
+        async with self.semaphore(model):
+            async with session.post(
+                f"{self.base_url}/api/generate", json=_ollama_payload(prompt, model, stream=True)
+            ) as r:
+                r.raise_for_status()
+                async for line in r.content:
+                    if not line.strip():
+                        continue
+                    data = json.loads(line)
+                    if data.get("error"):
+                        raise RuntimeError(f"Ollama: {data['error']}")
+                    token = data.get("response", "")
+                    if token:
+                        yield token
+                    if data.get("done"):
+                        _annotate_ollama_counts(data)
+                        break
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+OLLAMA_ASYNC = AsyncOllamaClient(
+    base_url=OLLAMA_URL,
+    pool_size=OLLAMA_POOL_SIZE,
+    model_limits=parse_model_limits(OLLAMA_MODEL_CONCURRENCY),
+    default_limit=OLLAMA_DEFAULT_CONCURRENCY
+)
+
+async def call_ollama_async(prompt: str, model: str = OLLAMA_MODEL) -> str:
+    """Versão assíncrona de call_ollama (conexões e limites compartilhados)"""
+    return await OLLAMA_ASYNC.generate(prompt, model=model)
+
+def build_prompt(question: str, contexts_str: str) -> str:
+    return PROMPT_TEMPLATE.format(
         system_instructions=SYSTEM_INSTRUCTIONS,
         question=question.strip(),
         contexts=contexts_str if contexts_str else "(nenhum contexto recuperado)"
     )
 
+def answer(question: str):
+    retrieved = dual_retrieve(question, k_juris=K_JURIS, k_lei=K_LEI)
+    contexts_str, used = format_contexts(retrieved, question=question)
+    prompt = build_prompt(question, contexts_str)
+
     response = call_ollama(prompt)
     print("\nRESPOSTA:")
     print(response)
@@ -161,6 +820,98 @@ def answer(question: str):
         print("Nenhuma fonte utilizada (sem contexto).")
 
 
+NO_CONTEXT_RESPONSE = "Não encontrei informações relevantes sobre isso. Pode reformular a pergunta?"
+ERROR_RESPONSE = "Erro ao processar sua pergunta. Tente novamente."
+
+def truncate_response(response: str, max_response_length: int = None) -> str:
+    """Trunca a resposta em uma frase completa, se max_response_length foi especificado"""
+    if not max_response_length or len(response) <= max_response_length:
+        return response
+
+    # Tentar truncar em uma frase completa
+    resposta_truncada = response[:max_response_length - 50]
+    ultimo_ponto = resposta_truncada.rfind('.')
+    ultima_quebralinha = resposta_truncada.rfind('\n')
+    ponto_corte = max(ultimo_ponto, ultima_quebralinha)
+
+    if ponto_corte > max_response_length * 0.7:  # Se encontrou um ponto razoavelmente próximo
+        response = resposta_truncada[:ponto_corte + 1]
+    else:
+        response = resposta_truncada
+
+    return response + "\n\n⚠️ *Mensagem truncada devido ao limite de caracteres.*"
+
+def build_fontes(used: List[Dict]) -> List[Dict]:
+    fontes = []
+    for ch in used:
+        meta = ch["metadata"]
+        fontes.append({
+            "titulo": meta.get("titulo") or meta.get("title") or meta.get("id") or "Documento",
+            "id": meta.get("id") or meta.get("source") or meta.get("file") or "N/A",
+            "origem": ch["origem"],
+            "score": ch["score"],
+            "text": ch["content"]
+        })
+    return fontes
+
+@dataclass
+class PreparedAnswer:
+    """Tudo o que antecede a geração: embedding, cache, retrieval e prompt"""
+    question: str
+    vector: List[float]
+    params: str
+    cached: Optional[Tuple[str, List[Dict]]] = None
+    retrieved: List[Dict] = field(default_factory=list)
+    fontes: List[Dict] = field(default_factory=list)
+    prompt: Optional[str] = None
+
+
+def prepare_answer(question: str, model: str = OLLAMA_MODEL) -> PreparedAnswer:
+    """
+    Etapas bloqueantes comuns a answer_question, answer_question_stream e
+    answer_question_async, cada uma registrada como span no trace corrente.
+    """
+    # Embedding único: usado no cache semântico e no retrieval
+    vector = embed_questions([question])[0]
+    prepared = PreparedAnswer(question=question, vector=vector, params=answer_cache_params(model))
+
+    if ANSWER_CACHE is not None:
+        with tracing.span("cache_lookup") as sp:
+            prepared.cached, sp["result"] = ANSWER_CACHE.lookup(question, prepared.params, embedding=vector)
+        tracing.annotate(cache=sp["result"])
+        if prepared.cached is not None:
+            return prepared
+
+    # Retrieve
+    prepared.retrieved = dual_retrieve_by_vectors([vector], k_juris=K_JURIS, k_lei=K_LEI, questions=[question])[0]
+    if not prepared.retrieved:
+        tracing.annotate(docs_retrieved=0)
+        return prepared
+
+    with tracing.span("format_contexts") as sp:
+        sp["budget_tokens"] = context_budget(question)
+        contexts_str, used = format_contexts(prepared.retrieved, max_tokens=sp["budget_tokens"])
+        sp["docs_used"] = len(used)
+        sp["truncados"] = sum(1 for ch in used if ch.get("truncado"))
+    with tracing.span("prompt") as sp:
+        prepared.prompt = build_prompt(question, contexts_str)
+        sp["chars"] = len(prepared.prompt)
+    prepared.fontes = build_fontes(used)
+    tracing.annotate(
+        docs_retrieved=len(prepared.retrieved),
+        docs_used=len(used),
+        prompt_chars=len(prepared.prompt)
+    )
+    return prepared
+
+
+def store_answer(prepared: PreparedAnswer, response: str):
+    if ANSWER_CACHE is not None and response:
+        with tracing.span("cache_put"):
+            ANSWER_CACHE.put(prepared.question, prepared.params, response, prepared.fontes,
+                             embedding=prepared.vector)
+
+
 def answer_question(question: str, max_response_length: int = None) -> Tuple[str, List[Dict]]:
     """
     Responde uma pergunta usando RAG.
@@ -172,54 +923,169 @@ def answer_question(question: str, max_response_length: int = None) -> Tuple[str
     Returns:
         Tupla (resposta, lista_de_fontes)
     """
-    try:
-        # Retrieve
-        retrieved = dual_retrieve(question, k_juris=K_JURIS, k_lei=K_LEI)
-
-        if not retrieved:
-            return "Não encontrei informações relevantes sobre isso. Pode reformular a pergunta?", []
-
-        contexts_str, used = format_contexts(retrieved)
-        prompt = PROMPT_TEMPLATE.format(
-            system_instructions=SYSTEM_INSTRUCTIONS,
-            question=question.strip(),
-            contexts=contexts_str if contexts_str else "(nenhum contexto recuperado)"
-        )
-        response = call_ollama(prompt)
-
-        # Truncar resposta se max_response_length foi especificado
-        if max_response_length and len(response) > max_response_length:
-            # Tentar truncar em uma frase completa
-            resposta_truncada = response[:max_response_length - 50]
-            ultimo_ponto = resposta_truncada.rfind('.')
-            ultima_quebralinha = resposta_truncada.rfind('\n')
-            ponto_corte = max(ultimo_ponto, ultima_quebralinha)
-            
-            if ponto_corte > max_response_length * 0.7:  # Se encontrou um ponto razoavelmente próximo
-                response = resposta_truncada[:ponto_corte + 1]
-            else:
-                response = resposta_truncada
-            
-            response += "\n\n⚠️ *Mensagem truncada devido ao limite de caracteres.*"
-
-        fontes = []
-        for ch in used:
-            meta = ch["metadata"]
-            fontes.append({
-                "titulo": meta.get("titulo") or meta.get("title") or meta.get("id") or "Documento",
-                "id": meta.get("id") or meta.get("source") or meta.get("file") or "N/A",
-                "origem": ch["origem"],
-                "score": ch["score"],
-                "text": ch["content"]
-            })
-
-        return response, fontes
-
-    except Exception as e:
-        print(f"[ERRO em answer_question] {e}")
-        import traceback
-        traceback.print_exc()
-        return "Erro ao processar sua pergunta. Tente novamente.", []
+    with TRACER.trace("answer_question", model=OLLAMA_MODEL, question_chars=len(question)):
+        try:
+            prepared = prepare_answer(question)
+
+            if prepared.cached is not None:
+                response, fontes = prepared.cached
+                return truncate_response(response, max_response_length), fontes
+
+            if not prepared.retrieved:
+                return NO_CONTEXT_RESPONSE, []
+
+            with tracing.span("ollama"):
+                response = call_ollama(prepared.prompt)
+            store_answer(prepared, response)
+
+            return truncate_response(response, max_response_length), prepared.fontes
+
+        except Exception as e:
+            tracing.mark_error(e)
+            print(f"[ERRO em answer_question] {e}")
+            import traceback
+            traceback.print_exc()
+            return ERROR_RESPONSE, []
+
+
+class StreamingAnswer:
+    """
+    Resposta RAG em streaming.
+
+    Iterar sobre o objeto produz os tokens conforme o Ollama os gera. Depois
+    de consumido, ficam disponíveis:
+        response: resposta completa (truncada se max_response_length)
+        fontes: mesmas fontes de answer_question
+        retrieval_time: tempo do retrieval (s)
+        time_to_first_token: tempo até o primeiro token, a partir da pergunta (s)
+        total_time: tempo total (s)
+        cache_hit: True se a resposta veio do cache de respostas
+        request_id: id do trace da requisição
+    """
+
+    def __init__(self, question: str, max_response_length: int = None, model: str = OLLAMA_MODEL):
+        self.question = question
+        self.max_response_length = max_response_length
+        self.model = model
+        self.response = ""
+        self.fontes: List[Dict] = []
+        self.retrieval_time: Optional[float] = None
+        self.time_to_first_token: Optional[float] = None
+        self.total_time: Optional[float] = None
+        self.error: Optional[Exception] = None
+        self.cache_hit = False
+        self.request_id: Optional[str] = None
+
+    def __iter__(self) -> Iterator[str]:
+        start = time.perf_counter()
+        parts = []
+        with TRACER.trace("answer_question_stream", model=self.model, question_chars=len(self.question)) as trace:
+            self.request_id = trace.request_id
+            try:
+                prepared = prepare_answer(self.question, self.model)
+                self.retrieval_time = time.perf_counter() - start
+
+                if prepared.cached is not None:
+                    response, self.fontes = prepared.cached
+                    self.cache_hit = True
+                    self.response = truncate_response(response, self.max_response_length)
+                    self.time_to_first_token = time.perf_counter() - start
+                    yield self.response
+                    return
+
+                if not prepared.retrieved:
+                    self.response = NO_CONTEXT_RESPONSE
+                    self.time_to_first_token = time.perf_counter() - start
+                    yield self.response
+                    return
+
+                self.fontes = prepared.fontes
+                with tracing.span("ollama") as sp:
+                    for token in call_ollama_stream(prepared.prompt, model=self.model):
+                        if self.time_to_first_token is None:
+                            self.time_to_first_token = time.perf_counter() - start
+                            sp["ttft"] = self.time_to_first_token
+                        parts.append(token)
+                        yield token
+
+                response = "".join(parts).strip()
+                store_answer(prepared, response)
+                self.response = truncate_response(response, self.max_response_length)
+
+            except Exception as e:
+                tracing.mark_error(e)
+                print(f"[ERRO em answer_question_stream] {e}")
+                import traceback
+                traceback.print_exc()
+                self.error = e
+                self.fontes = []
+                self.response = ERROR_RESPONSE
+                yield ("\n\n" if parts else "") + ERROR_RESPONSE
+            finally:
+                self.total_time = time.perf_counter() - start
+                trace.attrs["ttft"] = self.time_to_first_token
+
+def answer_question_stream(question: str, max_response_length: int = None) -> StreamingAnswer:
+    """
+    Versão em streaming de answer_question.
+
+    Uso:
+        stream = answer_question_stream(pergunta)
+        for token in stream:
+            ...
+        stream.response, stream.fontes, stream.time_to_first_token
+    """
+    return StreamingAnswer(question, max_response_length=max_response_length)
+
+# Executor dedicado ao trabalho bloqueante (embedding, Chroma, SQLite) do pipeline assíncrono
+RETRIEVAL_EXECUTOR = ThreadPoolExecutor(max_workers=RETRIEVAL_WORKERS, thread_name_prefix="rag-retrieval")
+
+async def _run_blocking(func, *args, **kwargs):
+    """Roda no RETRIEVAL_EXECUTOR preservando o contexto (trace corrente)"""
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(RETRIEVAL_EXECUTOR, partial(ctx.run, func, *args, **kwargs))
+
+async def answer_question_async(question: str, max_response_length: int = None,
+                                model: str = OLLAMA_MODEL) -> Tuple[str, List[Dict]]:
+    """
+    Versão assíncrona de answer_question.
+
+    Embedding, cache e retrieval rodam no RETRIEVAL_EXECUTOR, fora do event
+    loop; a geração usa o cliente aiohttp compartilhado, respeitando o limite
+    de concorrência do modelo.
+    """
+    with TRACER.trace("answer_question_async", model=model, question_chars=len(question)):
+        try:
+            prepared = await _run_blocking(prepare_answer, question, model)
+
+            if prepared.cached is not None:
+                response, fontes = prepared.cached
+                return truncate_response(response, max_response_length), fontes
+
+            if not prepared.retrieved:
+                return NO_CONTEXT_RESPONSE, []
+
+            with tracing.span("ollama"):
+                response = await OLLAMA_ASYNC.generate(prepared.prompt, model=model)
+            await _run_blocking(store_answer, prepared, response)
+
+            return truncate_response(response, max_response_length), prepared.fontes
+
+        except Exception as e:
+            tracing.mark_error(e)
+            print(f"[ERRO em answer_question_async] {e}")
+            import traceback
+            traceback.print_exc()
+            return ERROR_RESPONSE, []
+
+async def answer_many_async(questions: List[str], max_response_length: int = None,
+                            model: str = OLLAMA_MODEL) -> List[Tuple[str, List[Dict]]]:
+    """Responde várias perguntas concorrentemente, na ordem recebida"""
+    return await asyncio.gather(*(
+        answer_question_async(q, max_response_length=max_response_length, model=model)
+        for q in questions
+    ))
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
@@ -0,0 +1,132 @@
+"""
+reranker.py - Reranking dos candidatos do retrieval com um cross-encoder em CPU
+
+As distâncias das coleções de jurisprudência e de legislação não são
+comparáveis entre si; o cross-encoder pontua cada par (pergunta, trecho) na
+mesma escala, e o rag_core ordena a lista combinada por essa pontuação.
+
+Orçamento de latência: os candidatos são pontuados em lotes, na ordem em que
+chegam (a ordem do retrieval); quando o tempo da requisição passa de
+budget_ms, os que faltam ficam depois dos pontuados, na ordem original.
+Pontuações ficam num LRU por (pergunta normalizada, id do chunk), então
+perguntas repetidas não passam de novo pelo modelo.
+
+Qualidade e latência sobre perguntas_gabarito.csv: benchmark_rerank.py.
+
+Uso:
+    reranker = CrossEncoderReranker("cross-encoder/mmarco-mMiniLMv2-L12-H384-v1", budget_ms=300)
+    ordenados, stats = reranker.rerank(pergunta, candidatos, top_k=6)
+"""
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from answer_cache import normalize_question
+
+load_dotenv()
+
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "0") == "1"
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1")
+# Candidatos buscados em cada coleção antes do rerank
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "12"))
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "300"))
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "8"))
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", "4096"))
+# Caracteres de cada trecho enviados ao modelo (o cross-encoder trunca em tokens de qualquer forma)
+RERANK_MAX_CHARS = int(os.getenv("RERANK_MAX_CHARS", "1500"))
+
+
+class CrossEncoderReranker:
+    """Cross-encoder carregado sob demanda, com orçamento por requisição e cache de scores"""
+
+    def __init__(self, model_name: str = RERANK_MODEL, budget_ms: float = RERANK_BUDGET_MS,
+                 batch_size: int = RERANK_BATCH_SIZE, cache_size: int = RERANK_CACHE_SIZE,
+                 max_chars: int = RERANK_MAX_CHARS):
+        self.model_name = model_name
+        self.budget = budget_ms / 1000.0
+        self.batch_size = max(1, batch_size)
+        self.cache_size = cache_size
+        self.max_chars = max_chars
+        self._model = None
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+
+    def _get_model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from sentence_transformers import CrossEncoder
+
+                    self._model = CrossEncoder(self.model_name, device="cpu")
+        return self._model
+
+    def warm_up(self):
+        """Carrega o modelo fora do caminho da primeira requisição"""
+        self._get_model().predict([("aquecimento", "aquecimento")])
+
+    def _cache_get(self, key: Tuple[str, str]) -> Optional[float]:
+        with self._lock:
+            score = self._cache.get(key)
+            if score is not None:
+                self._cache.move_to_end(key)
+            return score
+
+    def _cache_put(self, items: List[Tuple[Tuple[str, str], float]]):
+        with self._lock:
+            for key, score in items:
+                self._cache[key] = score
+                self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    @staticmethod
+    def _doc_key(candidate: Dict) -> str:
+        return candidate.get("id") or str(hash(candidate["content"]))
+
+    def rerank(self, question: str, candidates: List[Dict], top_k: Optional[int] = None,
+               budget: Optional[float] = None) -> Tuple[List[Dict], Dict]:
+        """
+        Candidatos ordenados pelo cross-encoder (campo "rerank_score"); os não
+        pontuados dentro do orçamento vêm depois, na ordem original.
+        """
+        budget = self.budget if budget is None else budget
+        inicio = time.perf_counter()
+        q = normalize_question(question)
+        scores: List[Optional[float]] = [self._cache_get((q, self._doc_key(c))) for c in candidates]
+        stats = {"candidatos": len(candidates), "cache_hits": sum(s is not None for s in scores),
+                 "pontuados": 0, "truncado": False}
+
+        pendentes = [i for i, s in enumerate(scores) if s is None]
+        if pendentes and self._model is None:
+            # A carga do modelo (só na primeira vez, sem warm_up) não conta no orçamento
+            self._get_model()
+            inicio = time.perf_counter()
+        model = self._model
+        for start in range(0, len(pendentes), self.batch_size):
+            if start and time.perf_counter() - inicio > budget:
+                stats["truncado"] = True
+                break
+            lote = pendentes[start:start + self.batch_size]
+            preditos = model.predict(
+                [(question, candidates[i]["content"][:self.max_chars]) for i in lote],
+                batch_size=self.batch_size, show_progress_bar=False
+            )
+            novos = []
+            for i, score in zip(lote, preditos):
+                scores[i] = float(score)
+                novos.append(((q, self._doc_key(candidates[i])), scores[i]))
+            self._cache_put(novos)
+            stats["pontuados"] += len(lote)
+
+        pontuados = sorted(
+            ({**c, "rerank_score": s} for c, s in zip(candidates, scores) if s is not None),
+            key=lambda c: c["rerank_score"], reverse=True
+        )
+        restantes = [c for c, s in zip(candidates, scores) if s is None]
+        ordenados = pontuados + restantes
+        stats["ms"] = (time.perf_counter() - inicio) * 1000
+        return (ordenados[:top_k] if top_k is not None else ordenados), stats
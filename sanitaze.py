@@ -1,9 +1,93 @@
 import re
+import os
 import json
-from pathlib import Path
-from typing import Dict, List, Optional
+import time
+import signal
+import hashlib
+import argparse
+import threading
+from datetime import datetime
+from pathlib import Path, PurePosixPath
+from contextlib import contextmanager
+from multiprocessing import Pool
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 from dataclasses import dataclass, asdict
 import PyPDF2
+from chunker import ContadorTokens, dividir_em_chunks, CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS
+from corpus_store import escrever_chunks, SUFIXO_CHUNKS
+import detectores_juridicos
+from detectores_juridicos import compilar_keywords_crimes
+
+
+def compilar_padroes_ruido(padroes: List[str]) -> "re.Pattern":
+    """
+    Junta os padrões de ruído numa única alternância compilada.
+
+    O prefixo comum ^\\s* é fatorado: ^\\s*(?:A|B|...), testado com match().
+    Padrões sem esse prefixo entram numa alternância externa como .*?(?:p),
+    o que equivale ao re.search linha a linha.
+    """
+    prefixo = r'^\s*'
+    com_prefixo = [p[len(prefixo):] for p in padroes if p.startswith(prefixo)]
+    sem_prefixo = [p for p in padroes if not p.startswith(prefixo)]
+    alternativas = []
+    if com_prefixo:
+        alternativas.append(prefixo + '(?:' + '|'.join(com_prefixo) + ')')
+    alternativas.extend(f'.*?(?:{p})' for p in sem_prefixo)
+    return re.compile('|'.join(f'(?:{a})' for a in alternativas) or r'(?!)', re.IGNORECASE)
+
+
+# Espaços a normalizar num único re.sub (ver _normalizar_espacos):
+# trechos com quebra de linha, 2+ espaços/tabs ou um tab isolado
+_ESPACOS_RE = re.compile(r'[ \t]+\n[ \t\n]*|\n[ \t\n]+|[ \t]{2,}|\t')
+
+
+def _normalizar_espacos(m: "re.Match") -> str:
+    trecho = m.group(0)
+    quebras = trecho.count('\n')
+    if not quebras:
+        return ' '
+    # Espaço antes da quebra vira um espaço; espaços depois somem; no máximo duas quebras
+    return (' ' if trecho[0] in ' \t' else '') + '\n' * min(quebras, 2)
+
+
+class PDFQuarentena(Exception):
+    """PDF descartado e enviado para o relatório de quarentena"""
+
+    def __init__(self, motivo: str, detalhe: str = ""):
+        super().__init__(f"{motivo}: {detalhe}" if detalhe else motivo)
+        self.motivo = motivo
+        self.detalhe = detalhe
+
+
+class _TempoEsgotado(BaseException):
+    # BaseException: não pode ser engolida pelos "except Exception" do PyPDF2
+    pass
+
+
+@contextmanager
+def limite_de_tempo(segundos: float):
+    """
+    Interrompe o bloco com _TempoEsgotado após `segundos` (SIGALRM).
+
+    Só funciona na thread principal de sistemas com signal.setitimer; fora
+    dela o bloco roda sem alarme (o prazo ainda é checado entre páginas).
+    """
+    if (segundos <= 0 or not hasattr(signal, 'setitimer')
+            or threading.current_thread() is not threading.main_thread()):
+        yield
+        return
+
+    def estourou(signum, frame):
+        raise _TempoEsgotado()
+
+    anterior = signal.signal(signal.SIGALRM, estourou)
+    signal.setitimer(signal.ITIMER_REAL, segundos)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, anterior)
 
 
 @dataclass
@@ -30,18 +114,19 @@ class Acordao:
 class SanitizadorJurisprudencia:
     """Classe principal para sanitização de documentos jurídicos"""
 
-    # Mapeamento de crimes para detecção automática
-    CRIMES_KEYWORDS = {
-        'Estelionato': ['estelionato', 'fraude', 'engano'],
-        'Tráfico': ['tráfico', 'narcotráfico', 'entorpecente', 'droga', 'lei 11.343', 'lei de drogas'],
-        'Furto': ['furto', 'subtração'],
-        'Lesão Corporal': ['lesão corporal', 'lesões corporais', 'agressão física'],
-        'Porte/Consumo': ['porte', 'consumo', 'uso de droga', 'usuário'],
-        'Embriaguez': ['embriaguez', 'embriagado', 'alcoolizado', 'direção sob efeito', 'art. 306 do ctb'],
-        'Homicídio': ['homicídio', 'homicidio', 'morte', 'latrocínio'],
-        'Roubo': ['roubo', 'assalto'],
-        'Receptação': ['receptação', 'receptacao', 'produto de crime']
-    }
+    # Mapeamento de crimes para detecção automática (detectores_juridicos.py)
+    CRIMES_KEYWORDS = detectores_juridicos.CRIMES_KEYWORDS
+    CRIMES_RE, CRIMES_CONTAGEM = compilar_keywords_crimes(CRIMES_KEYWORDS)
+
+    # Manifesto da sanitização incremental, resumo da última execução e relatório
+    # de PDFs em quarentena (em dir_saida)
+    MANIFESTO = 'manifesto_sanitizacao.json'
+    RESUMO = 'resumo_sanitizacao.json'
+    QUARENTENA = 'quarentena_sanitizacao.json'
+
+    # Orçamento por documento: acima disso o PDF vai para a quarentena (0 = sem limite)
+    MAX_PAGINAS_PDF = int(os.getenv("SANITIZE_MAX_PAGINAS", "500"))
+    TEMPO_MAX_PDF = float(os.getenv("SANITIZE_TIMEOUT_PDF", "120"))
 
     # Padrões de ruído a serem removidos (linha por linha)
     NOISE_PATTERNS = [
@@ -57,64 +142,88 @@ class SanitizadorJurisprudencia:
         r'^\s*[-_\.]{3,}\s*$',
         r'^\s*P[aá]gina\s*\d+\s*de\s*\d+\s*$',
     ]
+    NOISE_RE = compilar_padroes_ruido(NOISE_PATTERNS)
 
     def __init__(self):
         self.stats = {
             'processados': 0,
             'erros': 0,
-            'chunks_gerados': 0
+            'chunks_gerados': 0,
+            'quarentena': 0
         }
+        # Tokenizer do modelo de embeddings, carregado no primeiro gerar_chunks
+        self.contador_tokens = ContadorTokens()
+
+    def iterar_paginas_pdf(self, caminho_pdf: str, max_paginas: int = None,
+                           prazo: Optional[float] = None, progresso: Optional[Dict] = None) -> Iterator[str]:
+        """
+        Gera o texto de cada página sob demanda (uma página por vez em memória).
+
+        Levanta PDFQuarentena se o PDF não abre, passa de max_paginas ou
+        estoura o prazo (time.monotonic()). `progresso` recebe o número de
+        páginas lidas e se alguma tinha texto.
+        """
+        max_paginas = self.MAX_PAGINAS_PDF if max_paginas is None else max_paginas
+        progresso = {} if progresso is None else progresso
+        progresso.update(paginas=0, com_texto=False)
+
+        with open(caminho_pdf, 'rb') as file:
+            try:
+                reader = PyPDF2.PdfReader(file)
+                total = len(reader.pages)
+            except Exception as e:
+                raise PDFQuarentena('ilegivel', str(e)) from e
+            if max_paginas and total > max_paginas:
+                raise PDFQuarentena('paginas', f"{total} páginas (limite {max_paginas})")
+
+            for page in reader.pages:
+                if prazo is not None and time.monotonic() > prazo:
+                    raise PDFQuarentena('tempo', f"prazo esgotado após {progresso['paginas']} de {total} páginas")
+                try:
+                    t = page.extract_text() or ""
+                except Exception:
+                    t = ""
+                progresso['paginas'] += 1
+                progresso['com_texto'] = progresso['com_texto'] or bool(t)
+                yield t
 
     def extrair_texto_pdf(self, caminho_pdf: str) -> str:
         """Extrai texto bruto de um PDF"""
         try:
-            with open(caminho_pdf, 'rb') as file:
-                reader = PyPDF2.PdfReader(file)
-                texto = []
-                for page in reader.pages:
-                    try:
-                        t = page.extract_text() or ""
-                    except Exception:
-                        t = ""
-                    texto.append(t)
-                return "\n".join(texto)
+            return "\n".join(self.iterar_paginas_pdf(caminho_pdf))
         except Exception as e:
             print(f"[ERRO] Falha ao ler PDF {caminho_pdf}: {e}")
             return ""
 
-    def sanitizar_texto(self, texto: str) -> str:
-        """Remove ruídos e normaliza o texto"""
-        # Remoção de ruídos por linha
-        linhas = texto.splitlines()
-        linhas_limpas = []
-
-        for l in linhas:
-            descartar = False
-            # Verifica se a linha corresponde a algum padrão de ruído
-            for pattern in self.NOISE_PATTERNS:
-                if re.search(pattern, l, flags=re.IGNORECASE):
-                    descartar = True
-                    break
-
-            if descartar:
-                continue
-
-            # Remover linhas muito curtas que são lixo (mas preserve parágrafos vazios)
-            if l.strip() and len(l.strip()) <= 2:
-                continue
-
-            linhas_limpas.append(l)
-
-        texto = "\n".join(linhas_limpas)
-
-        # Normalizações
-        texto = re.sub(r'\u00a0', ' ', texto)  # non-breaking space
-        texto = re.sub(r'[ \t]+', ' ', texto)  # múltiplos espaços → um espaço
-        texto = re.sub(r'\n[ \t]+', '\n', texto)  # remove espaços após quebra
-        texto = re.sub(r'\n{3,}', '\n\n', texto)  # múltiplas quebras → duas quebras
+    def filtrar_linhas(self, linhas: Iterable[str]) -> Iterator[str]:
+        """Descarta linhas de ruído e linhas muito curtas (mas preserva parágrafos vazios)"""
+        ruido = self.NOISE_RE.match
+        return (l for l in linhas if not ruido(l) and not 0 < len(l.strip()) <= 2)
 
+    def normalizar_texto(self, texto: str) -> str:
+        """Non-breaking space, depois espaços e quebras numa só passada"""
+        texto = texto.replace('\u00a0', ' ')
+        texto = _ESPACOS_RE.sub(_normalizar_espacos, texto)
         return texto.strip()
 
+    def sanitizar_texto(self, texto: str) -> str:
+        """Remove ruídos e normaliza o texto"""
+        # Remoção de ruídos por linha: uma única regex compilada com todos os padrões
+        return self.normalizar_texto("\n".join(self.filtrar_linhas(texto.splitlines())))
+
+    def sanitizar_paginas(self, paginas: Iterable[str]) -> str:
+        """
+        Mesmo resultado de sanitizar_texto("\\n".join(paginas)), filtrando
+        página a página: o texto bruto do documento nunca fica inteiro em memória.
+        """
+        linhas = (
+            l
+            for pagina in paginas
+            # O "\n" do join: uma quebra no fim da página separa (ou encerra) a linha
+            for l in self.filtrar_linhas((pagina + "\n").splitlines())
+        )
+        return self.normalizar_texto("\n".join(linhas))
+
     def extrair_metadados(self, texto: str) -> Dict:
         """Extrai metadados estruturados do texto"""
         metadados = {}
@@ -124,24 +233,13 @@ class SanitizadorJurisprudencia:
         if fonte_match:
             metadados['fonte'] = fonte_match.group(0)
 
-        # Tribunal
-        if re.search(r'\bSuperior Tribunal de Justi[cç]a\b', texto, re.IGNORECASE) or re.search(r'\bSTJ\b', texto):
-            metadados['tribunal'] = 'STJ'
-        elif re.search(r'\bSupremo Tribunal Federal\b', texto, re.IGNORECASE) or re.search(r'\bSTF\b', texto):
-            metadados['tribunal'] = 'STF'
-        else:
-            t = re.search(r'\b(TJ[A-Z]{2}|TRF\d)\b', texto)
-            if t:
-                metadados['tribunal'] = t.group(1)
-
-        # Órgão julgador
-        orgao = re.search(r'\b(Primeira|Segunda|Terceira|Quarta|Quinta|Sexta)\s+Turma\b', texto, re.IGNORECASE)
+        # Tribunal e órgão julgador (os mesmos detectores dos filtros de pergunta)
+        tribunal = detectores_juridicos.detectar_tribunal(texto)
+        if tribunal:
+            metadados['tribunal'] = tribunal
+        orgao = detectores_juridicos.detectar_orgao_julgador(texto)
         if orgao:
-            metadados['orgao_julgador'] = orgao.group(0).title()
-        else:
-            sec = re.search(r'\b(Terceira Se[cç][aã]o|Plen[aá]rio)\b', texto, re.IGNORECASE)
-            if sec:
-                metadados['orgao_julgador'] = sec.group(1).title()
+            metadados['orgao_julgador'] = orgao
 
         # Processo (bem permissivo; evita capturar blocos gigantes)
         proc = re.search(r'\b(?:Processo|REsp|HC|RHC|AREsp)\s*[:\-]?\s*([A-Z0-9\.\-\/]+)\b', texto, re.IGNORECASE)
@@ -173,20 +271,20 @@ class SanitizadorJurisprudencia:
 
         return metadados
 
-    def detectar_crime(self, texto: str) -> Optional[str]:
-        """Detecta o tipo de crime mencionado no texto"""
-        t = texto.lower()
-        scores = {}
+    def classificar_crime(self, texto: str) -> Tuple[Optional[str], Dict[str, int]]:
+        """
+        Conta as palavras-chave de cada crime numa única varredura do texto.
 
-        for crime, kws in self.CRIMES_KEYWORDS.items():
-            score = 0
-            for kw in kws:
-                # Conta ocorrências com word boundary para evitar falsos positivos
-                score += len(re.findall(r'\b' + re.escape(kw) + r'\b', t))
-            if score > 0:
-                scores[crime] = score
+        Returns:
+            (crime com mais ocorrências ou None, {crime: ocorrências > 0}).
+            Empates ficam com o crime que aparece primeiro em CRIMES_KEYWORDS.
+        """
+        return detectores_juridicos.classificar_crime(texto, self.CRIMES_KEYWORDS, self.CRIMES_RE,
+                                                      self.CRIMES_CONTAGEM)
 
-        return max(scores, key=scores.get) if scores else None
+    def detectar_crime(self, texto: str) -> Optional[str]:
+        """Detecta o tipo de crime mencionado no texto"""
+        return self.classificar_crime(texto)[0]
 
     def extrair_ementa(self, texto: str) -> Optional[str]:
         """Extrai a ementa do acórdão"""
@@ -247,14 +345,45 @@ class SanitizadorJurisprudencia:
             print(f"[AVISO] Erro ao extrair fundamentos: {ex}")
             return []
 
+    def extrair_texto_limpo(self, pdf_path: Path) -> str:
+        """
+        Extrai e sanitiza o PDF em streaming, dentro do orçamento de páginas e
+        de tempo (TEMPO_MAX_PDF). Levanta PDFQuarentena se o documento não cabe
+        no orçamento, não abre ou não tem texto.
+        """
+        inicio = time.monotonic()
+        prazo = inicio + self.TEMPO_MAX_PDF if self.TEMPO_MAX_PDF > 0 else None
+        progresso: Dict = {}
+        try:
+            with limite_de_tempo(self.TEMPO_MAX_PDF):
+                texto_limpo = self.sanitizar_paginas(
+                    self.iterar_paginas_pdf(str(pdf_path), prazo=prazo, progresso=progresso)
+                )
+        except _TempoEsgotado:
+            raise PDFQuarentena(
+                'tempo', f"{self.TEMPO_MAX_PDF:.0f}s esgotados na página {progresso.get('paginas', 0) + 1}"
+            ) from None
+        except PDFQuarentena:
+            raise
+        except Exception as e:
+            raise PDFQuarentena('ilegivel', str(e)) from e
+
+        if not progresso.get('com_texto'):
+            raise PDFQuarentena('sem_texto', f"{progresso.get('paginas', 0)} páginas sem texto extraível")
+        return texto_limpo
+
     def processar_acordao(self, pdf_path: Path) -> Optional[Acordao]:
-        """Processa um PDF de acórdão e retorna objeto estruturado"""
-        texto_bruto = self.extrair_texto_pdf(str(pdf_path))
-        if not texto_bruto:
+        """
+        Processa um PDF de acórdão e retorna objeto estruturado.
+        PDFs fora do orçamento ou sem texto levantam PDFQuarentena.
+        """
+        try:
+            texto_limpo = self.extrair_texto_limpo(pdf_path)
+        except PDFQuarentena:
             self.stats['erros'] += 1
-            return None
+            self.stats['quarentena'] += 1
+            raise
 
-        texto_limpo = self.sanitizar_texto(texto_bruto)
         metadados = self.extrair_metadados(texto_limpo)
 
         acordao = Acordao(
@@ -275,18 +404,23 @@ class SanitizadorJurisprudencia:
         self.stats['processados'] += 1
         return acordao
 
-    def gerar_chunks(self, acordao: Acordao, max_tokens: int = 1000) -> List[Dict]:
-        """Divide o texto integral em chunks para indexação vetorial"""
+    def gerar_chunks(self, acordao: Acordao, max_tokens: int = CHUNK_MAX_TOKENS,
+                     overlap_tokens: int = CHUNK_OVERLAP_TOKENS) -> List[Dict]:
+        """
+        Divide o texto integral em chunks para indexação vetorial.
+
+        Os chunks cabem em max_tokens tokens do modelo de embeddings (contando
+        o prefixo "passage: "), terminam em fim de frase/parágrafo e repetem
+        até overlap_tokens do chunk anterior. inicio/fim são os offsets do
+        chunk em texto_integral.
+        """
         if not acordao.texto_integral:
             return []
 
         texto = acordao.texto_integral
-        max_palavras = int(max_tokens * 0.75)  # ~0,75 palavra/token em português
-        palavras = texto.split()
         chunks = []
 
-        for i in range(0, len(palavras), max_palavras):
-            parte = ' '.join(palavras[i:i + max_palavras])
+        for inicio, fim in dividir_em_chunks(texto, self.contador_tokens, max_tokens, overlap_tokens):
             chunks.append({
                 'chunk_id': f"{(acordao.processo or Path(acordao.caminho_arquivo).stem)}-{len(chunks) + 1}",
                 'crime': acordao.crime,
@@ -294,7 +428,9 @@ class SanitizadorJurisprudencia:
                 'orgao_julgador': acordao.orgao_julgador,
                 'data': acordao.data,
                 'ementa': acordao.ementa,
-                'texto': parte,
+                'texto': texto[inicio:fim],
+                'inicio': inicio,
+                'fim': fim,
                 'fonte': acordao.fonte,
                 'arquivo_origem': acordao.caminho_arquivo
             })
@@ -302,8 +438,172 @@ class SanitizadorJurisprudencia:
 
         return chunks
 
-    def processar_diretorio(self, dir_entrada: str, dir_saida: str, gerar_chunks: bool = True):
-        """Processa todos os PDFs de um diretório"""
+    def versao_saida(self) -> str:
+        """Parâmetros que mudam as saídas: se mudarem, o manifesto é descartado"""
+        return (f"chunks={CHUNK_MAX_TOKENS}/{CHUNK_OVERLAP_TOKENS}/{self.contador_tokens.model_name}"
+                f";formato={SUFIXO_CHUNKS};nomes=caminho")
+
+    @staticmethod
+    def nome_saida(chave: str) -> str:
+        """
+        Nome base das saídas de um PDF a partir do caminho relativo à entrada:
+        "sub/pasta/X.pdf" -> "sub__pasta__X" (PDFs na raiz mantêm o próprio nome)
+        """
+        caminho = PurePosixPath(chave)
+        return "__".join([*caminho.parent.parts, caminho.stem])
+
+    def processar_pdf(self, pdf: Path, dir_acordaos: Path, dir_chunks: Path,
+                      gerar_chunks: bool = True,
+                      nome_base: Optional[str] = None) -> Tuple[List[str], List[str], Optional[Dict]]:
+        """
+        Processa um PDF e grava suas saídas (<nome_base>.json e chunks; padrão: nome do PDF).
+
+        Returns:
+            (linhas de log, arquivos gravados, motivo da quarentena ou None)
+        """
+        log, saidas = [], []
+        try:
+            try:
+                acordao = self.processar_acordao(pdf)
+            except PDFQuarentena as q:
+                log.append(f"  🚫 Quarentena ({q.motivo}): {q.detalhe}")
+                return log, saidas, {'motivo': q.motivo, 'detalhe': q.detalhe}
+
+            if not acordao:
+                log.append(f"  ⚠️  Falha ao processar (texto vazio ou erro)")
+                return log, saidas, None
+
+            # Salva acórdão completo
+            nome_base = nome_base or pdf.stem
+            caminho_acordao = dir_acordaos / f"{nome_base}.json"
+            tmp = caminho_acordao.with_name(caminho_acordao.name + '.tmp')
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(asdict(acordao), f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp, caminho_acordao)
+            saidas.append(f"{dir_acordaos.name}/{nome_base}.json")
+
+            # Gera e salva chunks
+            if gerar_chunks:
+                chunks = self.gerar_chunks(acordao)
+                escrever_chunks(dir_chunks / f"{nome_base}{SUFIXO_CHUNKS}", chunks, acordao.texto_integral)
+                saidas.append(f"{dir_chunks.name}/{nome_base}{SUFIXO_CHUNKS}")
+                log.append(f"  ✓ Gerados {len(chunks)} chunks")
+            else:
+                log.append(f"  ✓ Processado com sucesso")
+
+        except Exception as e:
+            log.append(f"  ❌ ERRO ao processar {pdf.name}: {e}")
+            self.stats['erros'] += 1
+
+        return log, saidas, None
+
+    @staticmethod
+    def hash_arquivo(caminho: Path) -> str:
+        h = hashlib.sha256()
+        with open(caminho, 'rb') as f:
+            for bloco in iter(lambda: f.read(1 << 20), b''):
+                h.update(bloco)
+        return h.hexdigest()
+
+    def carregar_manifesto(self, saida: Path) -> Tuple[Dict[str, Dict], Optional[str]]:
+        """(PDF (caminho relativo) -> {size, mtime_ns, sha256, saidas}, versao_saida do manifesto)"""
+        caminho = saida / self.MANIFESTO
+        if not caminho.exists():
+            return {}, None
+        try:
+            with open(caminho, 'r', encoding='utf-8') as f:
+                dados = json.load(f)
+            return dados.get('pdfs', {}), dados.get('versao')
+        except Exception as e:
+            print(f"[AVISO] Manifesto ilegível ({e}); reprocessando tudo")
+            return {}, None
+
+    def salvar_json_atomico(self, caminho: Path, dados: Dict):
+        tmp = caminho.with_suffix('.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(dados, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, caminho)
+
+    def classificar_pdfs(self, pdfs: List[Path], entrada: Path, saida: Path,
+                         manifesto: Dict[str, Dict], gerar_chunks: bool,
+                         forcar: bool = False) -> Tuple[List[Tuple[str, Path, Dict]], int]:
+        """
+        Separa os PDFs que precisam ser (re)processados.
+
+        Mesmo tamanho e mtime do manifesto: inalterado, sem ler o arquivo. Se
+        só o mtime mudou, o sha256 decide. Um PDF inalterado cujas saídas
+        sumiram (ou sem chunks quando gerar_chunks), ou que foi para a
+        quarentena por estouro de tempo, é reprocessado.
+
+        Returns:
+            ([(chave, pdf, info_atual)], quantidade de inalterados)
+        """
+        pendentes, inalterados = [], 0
+        for pdf in pdfs:
+            chave = pdf.relative_to(entrada).as_posix()
+            st = pdf.stat()
+            info = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+            anterior = manifesto.get(chave)
+
+            if anterior and not forcar and anterior['size'] == st.st_size:
+                if anterior['mtime_ns'] == st.st_mtime_ns:
+                    info['sha256'] = anterior['sha256']
+                else:
+                    info['sha256'] = self.hash_arquivo(pdf)
+                if info['sha256'] == anterior['sha256'] and self._saidas_completas(anterior, saida, gerar_chunks):
+                    # Conteúdo igual: só atualiza o mtime no manifesto
+                    anterior['mtime_ns'] = st.st_mtime_ns
+                    inalterados += 1
+                    continue
+            else:
+                info['sha256'] = self.hash_arquivo(pdf)
+
+            pendentes.append((chave, pdf, info))
+        return pendentes, inalterados
+
+    @staticmethod
+    def _saidas_completas(entrada_manifesto: Dict, saida: Path, gerar_chunks: bool) -> bool:
+        saidas = entrada_manifesto.get('saidas', [])
+        if not saidas:
+            # Estouro de tempo depende da carga da máquina: tenta de novo na próxima execução.
+            # Outras falhas (texto vazio, ilegível): não tentar de novo enquanto o PDF não mudar
+            return (entrada_manifesto.get('quarentena') or {}).get('motivo') != 'tempo'
+        if gerar_chunks and not any(s.startswith('chunks/') for s in saidas):
+            return False
+        return all((saida / s).exists() for s in saidas)
+
+    def remover_orfaos(self, manifesto: Dict[str, Dict], chaves_atuais: set, saida: Path) -> List[Dict]:
+        """Apaga as saídas de PDFs que não existem mais e os tira do manifesto"""
+        removidos = []
+        for chave in sorted(set(manifesto) - chaves_atuais):
+            entrada_manifesto = manifesto.pop(chave)
+            removidos.append({'pdf': chave, 'saidas': entrada_manifesto.get('saidas', [])})
+
+        # Saídas ainda referenciadas por outro PDF (manifestos anteriores a nome_saida) ficam
+        em_uso = {s for e in manifesto.values() for s in e.get('saidas', [])}
+        for item in removidos:
+            for s in item['saidas']:
+                if s not in em_uso:
+                    (saida / s).unlink(missing_ok=True)
+        return removidos
+
+    def processar_diretorio(self, dir_entrada: str, dir_saida: str, gerar_chunks: bool = True,
+                            workers: int = 1, forcar: bool = False) -> Dict:
+        """
+        Processa os PDFs novos ou alterados de um diretório.
+
+        Um manifesto em dir_saida (caminho, tamanho, mtime e sha256 de cada PDF)
+        permite pular os PDFs inalterados; saídas de PDFs apagados são
+        removidas. Ao final, o resumo_sanitizacao.json lista os documentos
+        adicionados, alterados e removidos (usado pela indexação incremental).
+        forcar=True reprocessa tudo.
+
+        Com workers > 1 os PDFs são distribuídos entre processos; cada processo
+        tem seu próprio sanitizador e as estatísticas são somadas em self.stats.
+        Os PDFs são percorridos em ordem de caminho e cada um gera sempre os
+        mesmos arquivos, nomeados pelo caminho relativo à entrada (nome_saida),
+        então a saída é idêntica à do modo serial.
+        """
         entrada = Path(dir_entrada)
         saida = Path(dir_saida)
         saida.mkdir(parents=True, exist_ok=True)
@@ -314,37 +614,77 @@ class SanitizadorJurisprudencia:
         if gerar_chunks:
             dir_chunks.mkdir(exist_ok=True)
 
-        pdfs = list(entrada.rglob('*.pdf'))
-        print(f"Encontrados {len(pdfs)} PDFs em {entrada}")
+        pdfs = sorted(entrada.rglob('*.pdf'))
+        nomes: Dict[str, List[str]] = {}
+        for pdf in pdfs:
+            chave = pdf.relative_to(entrada).as_posix()
+            nomes.setdefault(self.nome_saida(chave), []).append(chave)
+        colisoes = [chaves for chaves in nomes.values() if len(chaves) > 1]
+        if colisoes:
+            raise ValueError(f"PDFs com o mesmo nome de saída (renomeie um deles): {colisoes}")
+
+        manifesto, versao = self.carregar_manifesto(saida)
+        if manifesto and versao != self.versao_saida():
+            print(f"♻️  Parâmetros de saída mudaram ({versao} → {self.versao_saida()}); reprocessando tudo")
+            forcar = True
+        removidos = self.remover_orfaos(manifesto, {p.relative_to(entrada).as_posix() for p in pdfs}, saida)
+        pendentes, inalterados = self.classificar_pdfs(pdfs, entrada, saida, manifesto, gerar_chunks, forcar)
+
+        workers = max(1, min(workers, len(pendentes)))
+        print(f"Encontrados {len(pdfs)} PDFs em {entrada}: {len(pendentes)} novos/alterados, "
+              f"{inalterados} inalterados, {len(removidos)} removidos"
+              + (f" ({workers} processos)" if workers > 1 else ""))
         print("=" * 60)
 
-        for idx, pdf in enumerate(pdfs, 1):
-            try:
-                print(f"[{idx}/{len(pdfs)}] Processando: {pdf.name}")
-                acordao = self.processar_acordao(pdf)
-
-                if not acordao:
-                    print(f"  ⚠️  Falha ao processar (texto vazio ou erro)")
-                    continue
-
-                # Salva acórdão completo
-                nome_base = pdf.stem
-                with open(dir_acordaos / f"{nome_base}.json", 'w', encoding='utf-8') as f:
-                    json.dump(asdict(acordao), f, ensure_ascii=False, indent=2)
-
-                # Gera e salva chunks
-                if gerar_chunks:
-                    chunks = self.gerar_chunks(acordao)
-                    with open(dir_chunks / f"{nome_base}_chunks.json", 'w', encoding='utf-8') as f:
-                        json.dump(chunks, f, ensure_ascii=False, indent=2)
-                    print(f"  ✓ Gerados {len(chunks)} chunks")
-                else:
-                    print(f"  ✓ Processado com sucesso")
-
-            except Exception as e:
-                print(f"  ❌ ERRO ao processar {pdf.name}: {e}")
-                self.stats['erros'] += 1
-                continue
+        resumo = {'adicionados': [], 'alterados': [], 'removidos': removidos, 'falhas': []}
+
+        def registrar(chave: str, info: Dict, saidas: List[str], quarentena: Optional[Dict]):
+            anterior = manifesto.get(chave)
+            if anterior:
+                # Saídas da versão anterior que esta não gerou (ex.: agora falhou)
+                for s in set(anterior.get('saidas', [])) - set(saidas):
+                    (saida / s).unlink(missing_ok=True)
+            info['saidas'] = saidas
+            if quarentena:
+                info['quarentena'] = quarentena
+            manifesto[chave] = info
+            item = {'pdf': chave, 'saidas': saidas}
+            resumo['alterados' if anterior else 'adicionados'].append(item)
+            if not saidas:
+                resumo['falhas'].append(chave)
+
+        inicio = time.perf_counter()
+        if workers == 1:
+            for idx, (chave, pdf, info) in enumerate(pendentes, 1):
+                print(f"[{idx}/{len(pendentes)}] Processando: {pdf.name}")
+                log, saidas, quarentena = self.processar_pdf(pdf, dir_acordaos, dir_chunks, gerar_chunks,
+                                                             self.nome_saida(chave))
+                for linha in log:
+                    print(linha)
+                registrar(chave, info, saidas, quarentena)
+        elif pendentes:
+            tarefas = [(pdf, dir_acordaos, dir_chunks, gerar_chunks, self.nome_saida(chave))
+                       for chave, pdf, _ in pendentes]
+            # Lotes pequenos: acórdãos têm tamanhos muito diferentes
+            chunksize = max(1, min(16, len(pendentes) // (workers * 8)))
+            with Pool(workers, initializer=_iniciar_worker, initargs=(type(self),)) as pool:
+                resultados = pool.imap(_processar_pdf_worker, tarefas, chunksize=chunksize)
+                for idx, ((chave, pdf, info), (log, saidas, quarentena, stats)) in enumerate(zip(pendentes, resultados), 1):
+                    print(f"[{idx}/{len(pendentes)}] Processando: {pdf.name}")
+                    for linha in log:
+                        print(linha)
+                    for k, valor in stats.items():
+                        self.stats[k] = self.stats.get(k, 0) + valor
+                    registrar(chave, info, saidas, quarentena)
+        duracao = time.perf_counter() - inicio
+
+        self.salvar_json_atomico(saida / self.MANIFESTO, {'versao': self.versao_saida(), 'pdfs': manifesto})
+        resumo['gerado_em'] = datetime.now().isoformat(timespec='seconds')
+        resumo['inalterados'] = inalterados
+        self.salvar_json_atomico(saida / self.RESUMO, resumo)
+        # Quarentena acumulada: PDFs inalterados continuam lá até serem corrigidos
+        quarentena = [{'pdf': chave, **e['quarentena']} for chave, e in sorted(manifesto.items()) if e.get('quarentena')]
+        self.salvar_json_atomico(saida / self.QUARENTENA, {'pdfs': quarentena})
 
         # Relatório final
         print("\n" + "=" * 60)
@@ -353,8 +693,15 @@ class SanitizadorJurisprudencia:
         print(f"✓ PDFs processados com sucesso: {self.stats['processados']}")
         print(f"✗ Erros: {self.stats['erros']}")
         print(f"📦 Chunks gerados: {self.stats['chunks_gerados']}")
+        print(f"🚫 Em quarentena: {len(quarentena)} (novos nesta execução: {self.stats['quarentena']}) "
+              f"→ {saida / self.QUARENTENA}")
+        print(f"🔁 Adicionados: {len(resumo['adicionados'])} | Alterados: {len(resumo['alterados'])} | "
+              f"Removidos: {len(removidos)} | Inalterados: {inalterados}")
+        print(f"⏱️  Tempo: {duracao:.1f}s ({len(pendentes) / duracao if duracao > 0 else 0.0:.2f} PDFs/s, "
+              f"{workers} processo{'s' if workers > 1 else ''})")
         print(f"📁 Arquivos salvos em: {saida}")
         print("=" * 60)
+        return resumo
 
     def validar_json(self, caminho_json: str) -> bool:
         """Valida se um JSON está bem formatado"""
@@ -366,15 +713,40 @@ class SanitizadorJurisprudencia:
             print(f"JSON inválido em {caminho_json}: {e}")
             return False
 
+# Sanitizador de cada processo do pool (criado uma vez por processo)
+_SANITIZADOR_WORKER: Optional[SanitizadorJurisprudencia] = None
+
+
+def _iniciar_worker(classe: type):
+    global _SANITIZADOR_WORKER
+    _SANITIZADOR_WORKER = classe()
+
+
+def _processar_pdf_worker(args: Tuple[Path, Path, Path, bool, str]) -> Tuple[List[str], List[str], Optional[Dict], Dict[str, int]]:
+    """Processa um PDF no worker e devolve o log, as saídas, a quarentena e as estatísticas só deste PDF"""
+    sanitizador = _SANITIZADOR_WORKER
+    sanitizador.stats = {chave: 0 for chave in sanitizador.stats}
+    log, saidas, quarentena = sanitizador.processar_pdf(*args)
+    return log, saidas, quarentena, dict(sanitizador.stats)
+
+
 def main():
     DIRETORIO_PDFS = '/home/roratto/Documents/vlex'
     DIRETORIO_SAIDA = './dados_sanitizados'
 
+    parser = argparse.ArgumentParser(description="Sanitização de PDFs de jurisprudência")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("SANITIZE_WORKERS", "1")),
+                        help="processos em paralelo (padrão: SANITIZE_WORKERS ou 1; 0 = todos os núcleos)")
+    parser.add_argument("--forcar", action="store_true", help="reprocessar todos os PDFs, ignorando o manifesto")
+    args = parser.parse_args()
+
     sanitizador = SanitizadorJurisprudencia()
     sanitizador.processar_diretorio(
         dir_entrada=DIRETORIO_PDFS,
         dir_saida=DIRETORIO_SAIDA,
-        gerar_chunks=True
+        gerar_chunks=True,
+        workers=args.workers or os.cpu_count() or 1,
+        forcar=args.forcar
     )
 
 if __name__ == '__main__':
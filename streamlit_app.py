@@ -7,7 +7,7 @@ import streamlit as st
 from streamlit_chat import message
 import time
 from datetime import datetime
-from rag_core import answer_question
+from rag_core import answer_question_stream, VECTOR_STORES, ANSWER_CACHE, RERANKER
 
 # Configuração da página
 st.set_page_config(
@@ -16,6 +16,18 @@ st.set_page_config(
     layout="wide"
 )
 
+# Handles do Chroma compartilhados entre sessões
+@st.cache_resource(show_spinner="🔌 Carregando base vetorial...")
+def aquecer_vectorstores():
+    """Abre os handles do Chroma (e carrega o reranker, se ativo) uma única vez por processo Streamlit"""
+    VECTOR_STORES.warm_up()
+    if RERANKER is not None:
+        RERANKER.warm_up()
+    return VECTOR_STORES
+
+
+aquecer_vectorstores()
+
 # CSS customizado com suporte a tema escuro
 st.markdown("""
 <style>
@@ -79,6 +91,14 @@ with st.sidebar:
     st.markdown("### 📊 Estatísticas")
     st.metric("Consultas", st.session_state.total_queries)
     st.metric("Mensagens", len(st.session_state.messages))
+    if ANSWER_CACHE is not None:
+        cache_stats = ANSWER_CACHE.stats()
+        st.metric(
+            "Cache de respostas",
+            f"{cache_stats['hit_rate']:.0%}",
+            help=f"{cache_stats['hits']} hits, {cache_stats['semantic_hits']} hits semânticos, "
+                 f"{cache_stats['misses']} misses, {cache_stats['size']}/{cache_stats['max_entries']} entradas"
+        )
 
     st.markdown("---")
 
@@ -193,32 +213,39 @@ if send_button and user_input:
 
         st.session_state.total_queries += 1
 
-        # Processar resposta
-        with st.spinner("🔍 Analisando documentos e gerando resposta..."):
-            try:
-                start_time = time.time()
-                resposta, fontes = answer_question(user_input)
-                elapsed_time = time.time() - start_time
-
-                # Adicionar resposta
-                st.session_state.messages.append({
-                    "role": "assistant",
-                    "content": resposta,
-                    "fontes": fontes
-                })
-
-                st.success(f"✅ Resposta gerada em {elapsed_time:.1f}s")
-                time.sleep(1)
-                st.rerun()
-
-            except Exception as e:
-                st.error(f"❌ Erro: {str(e)}")
-                st.session_state.messages.append({
-                    "role": "assistant",
-                    "content": "Desculpe, ocorreu um erro. Tente novamente.",
-                    "fontes": []
-                })
-                st.rerun()
+        # Processar resposta (tokens exibidos à medida que são gerados)
+        try:
+            stream = answer_question_stream(user_input)
+            resposta_placeholder = st.empty()
+            resposta_placeholder.info("🔍 Analisando documentos e gerando resposta...")
+            parcial = ""
+            for token in stream:
+                parcial += token
+                resposta_placeholder.markdown(parcial + "▌")
+            resposta_placeholder.markdown(stream.response)
+
+            # Adicionar resposta
+            st.session_state.messages.append({
+                "role": "assistant",
+                "content": stream.response,
+                "fontes": stream.fontes
+            })
+
+            ttft = stream.time_to_first_token or 0.0
+            st.success(
+                f"✅ Primeiro token em {ttft:.1f}s · resposta completa em {stream.total_time:.1f}s"
+            )
+            time.sleep(1)
+            st.rerun()
+
+        except Exception as e:
+            st.error(f"❌ Erro: {str(e)}")
+            st.session_state.messages.append({
+                "role": "assistant",
+                "content": "Desculpe, ocorreu um erro. Tente novamente.",
+                "fontes": []
+            })
+            st.rerun()
 
 if clear_input:
     st.rerun()
\ No newline at end of file
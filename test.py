@@ -7,17 +7,21 @@ calculando métricas de desempenho (Precision, Recall, F1-Score).
 Pré-requisito: Banco vetorial já criado com o embedding desejado.
 
 Uso:
-    python test_llms.py
+    python test.py [--concorrencia N] [--retomar resultados_llm/resultados_YYYYMMDD_HHMMSS.csv]
 
 Saída:
     - CSV detalhado: resultados_llm/resultados_YYYYMMDD_HHMMSS.csv
     - CSV resumido: resultados_llm/resultados_YYYYMMDD_HHMMSS_resumo.csv
+    - Checkpoint: resultados_llm/resultados_YYYYMMDD_HHMMSS_checkpoint.json
 """
 
 import os
 import sys
 import csv
+import json
 import time
+import asyncio
+import argparse
 from pathlib import Path
 from datetime import datetime
 from typing import List, Dict, Set
@@ -26,8 +30,10 @@ from dotenv import load_dotenv
 # Importar funções do rag_core
 from rag_core import (
     dual_retrieve,
+    dual_retrieve_batch,
     format_contexts,
     call_ollama,
+    OLLAMA_ASYNC,
     SYSTEM_INSTRUCTIONS,
     PROMPT_TEMPLATE,
     K_JURIS,
@@ -50,6 +56,10 @@ LLM_MODELS = {
 # Arquivo de perguntas e gabarito
 PERGUNTAS_CSV = "perguntas_gabarito.csv"
 
+# Perguntas × LLMs avaliadas ao mesmo tempo (o limite por modelo do
+# OLLAMA_MODEL_CONCURRENCY em rag_core continua valendo)
+TEST_CONCURRENCY = int(os.getenv("TEST_CONCURRENCY", "4"))
+
 # Diretório de saída
 OUTPUT_DIR = Path("resultados_llm")
 OUTPUT_DIR.mkdir(exist_ok=True)
@@ -181,33 +191,78 @@ def test_single_question(
     Returns:
         Dict com resultados e métricas
     """
-    pergunta = question_data["pergunta"]
+    prompt, used_docs = build_test_prompt(question_data, retrieved_docs)
     
-    # Extrair IDs recuperados
-    artigos_retrieved, juris_retrieved = extract_retrieved_ids(retrieved_docs)
+    # Medir tempo de geração
+    start_generation = time.time()
+    try:
+        # Usar função call_ollama do rag_core, mas com modelo específico
+        resposta = call_ollama(prompt, model=llm_model)
+    except Exception as e:
+        resposta = f"[ERRO] {str(e)}"
+    generation_time = time.time() - start_generation
     
-    # Calcular métricas de retrieval
-    metrics_lei = calculate_metrics(artigos_retrieved, question_data["artigos_relevantes"])
-    metrics_juris = calculate_metrics(juris_retrieved, question_data["juris_relevantes"])
+    return build_result(
+        question_data, llm_name, llm_model, retrieved_docs, used_docs, resposta, generation_time
+    )
+
+
+async def test_single_question_async(
+    question_data: Dict,
+    llm_name: str,
+    llm_model: str,
+    retrieved_docs: List[Dict]
+) -> Dict:
+    """
+    Versão assíncrona de test_single_question.
     
+    O generation_time conta apenas a geração, não a espera pelo limite de
+    concorrência do modelo.
+    """
+    prompt, used_docs = build_test_prompt(question_data, retrieved_docs)
+    
+    try:
+        resposta, generation_time = await OLLAMA_ASYNC.generate_timed(prompt, model=llm_model)
+    except Exception as e:
+        resposta, generation_time = f"[ERRO] {str(e)}", 0.0
+    
+    return build_result(
+        question_data, llm_name, llm_model, retrieved_docs, used_docs, resposta, generation_time
+    )
+
+
+def build_test_prompt(question_data: Dict, retrieved_docs: List[Dict]) -> tuple[str, List[Dict]]:
+    """Monta o prompt da pergunta com os contextos já recuperados."""
     # Formatar contextos usando função do rag_core
-    contexts_str, used_docs = format_contexts(retrieved_docs)
+    contexts_str, used_docs = format_contexts(retrieved_docs, question=question_data["pergunta"])
     
     # Montar prompt usando template do rag_core
     prompt = PROMPT_TEMPLATE.format(
         system_instructions=SYSTEM_INSTRUCTIONS,
-        question=pergunta,
+        question=question_data["pergunta"],
         contexts=contexts_str if contexts_str else "(nenhum contexto recuperado)"
     )
+    return prompt, used_docs
+
+
+def build_result(
+    question_data: Dict,
+    llm_name: str,
+    llm_model: str,
+    retrieved_docs: List[Dict],
+    used_docs: List[Dict],
+    resposta: str,
+    generation_time: float
+) -> Dict:
+    """Calcula as métricas de retrieval e monta a linha de resultado."""
+    pergunta = question_data["pergunta"]
     
-    # Medir tempo de geração
-    start_generation = time.time()
-    try:
-        # Usar função call_ollama do rag_core, mas com modelo específico
-        resposta = call_ollama(prompt, model=llm_model)
-    except Exception as e:
-        resposta = f"[ERRO] {str(e)}"
-    generation_time = time.time() - start_generation
+    # Extrair IDs recuperados
+    artigos_retrieved, juris_retrieved = extract_retrieved_ids(retrieved_docs)
+    
+    # Calcular métricas de retrieval
+    metrics_lei = calculate_metrics(artigos_retrieved, question_data["artigos_relevantes"])
+    metrics_juris = calculate_metrics(juris_retrieved, question_data["juris_relevantes"])
     
     return {
         "id_pergunta": question_data["id"],
@@ -237,14 +292,123 @@ def test_single_question(
 # EXECUÇÃO DOS TESTES
 # ============================================================================
 
-def run_all_tests():
-    """Executa todos os testes e salva resultados."""
+# Cabeçalho do CSV
+FIELDNAMES = [
+    "id_pergunta", "pergunta", "embedding_model",
+    "llm_name", "llm_model", "resposta_gerada", "resposta_esperada",
+    "artigos_retrieved", "artigos_relevantes", "juris_retrieved", "juris_relevantes",
+    "precision_lei", "recall_lei", "f1_lei",
+    "precision_juris", "recall_juris", "f1_juris",
+    "generation_time", "num_docs_retrieved", "num_docs_used"
+]
+
+
+def checkpoint_file_for(results_file: Path) -> Path:
+    """Arquivo com as sessões de execução (wall-clock) de um CSV de resultados."""
+    return results_file.with_name(results_file.stem + "_checkpoint.json")
+
+
+def load_checkpoint(results_file: Path) -> Dict:
+    checkpoint_file = checkpoint_file_for(results_file)
+    if checkpoint_file.exists():
+        with open(checkpoint_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {"sessoes": []}
+
+
+def save_checkpoint(results_file: Path, checkpoint: Dict):
+    checkpoint_file = checkpoint_file_for(results_file)
+    tmp_file = checkpoint_file.with_suffix(".tmp")
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_file, checkpoint_file)
+
+
+def load_completed(results_file: Path) -> List[Dict]:
+    """
+    Lê as linhas já concluídas de um CSV de resultados.
+    
+    Linhas com erro de geração não contam como concluídas e são refeitas.
+    """
+    completed = []
+    with open(results_file, 'r', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            if not row.get("resposta_gerada", "").startswith("[ERRO]"):
+                completed.append(row)
+    return completed
+
+
+def wall_clock_time(checkpoint: Dict) -> float:
+    """Soma da duração de todas as sessões (execução original + retomadas)."""
+    return sum(max(0.0, s["fim"] - s["inicio"]) for s in checkpoint.get("sessoes", []))
+
+
+async def run_pending_tests(
+    pending: List[tuple],
+    retrieved_cache: Dict[str, List[Dict]],
+    writer: csv.DictWriter,
+    f,
+    results_file: Path,
+    checkpoint: Dict,
+    concorrencia: int
+):
+    """Executa os pares (pergunta, LLM) pendentes com no máximo `concorrencia` ao mesmo tempo."""
+    semaphore = asyncio.Semaphore(max(1, concorrencia))
+    sessao = checkpoint["sessoes"][-1]
+    total_tests = len(pending)
+    
+    async def run_one(llm_name: str, llm_model: str, question: Dict):
+        async with semaphore:
+            result = await test_single_question_async(
+                question, llm_name, llm_model, retrieved_cache[question['id']]
+            )
+        
+        # Checkpoint: linha no CSV e sessão atualizada a cada par concluído
+        writer.writerow(result)
+        f.flush()
+        sessao["fim"] = time.time()
+        sessao["concluidos"] += 1
+        save_checkpoint(results_file, checkpoint)
+        
+        print(f"\n[{sessao['concluidos']}/{total_tests}] {llm_name} | Pergunta {question['id']}: "
+              f"{question['pergunta'][:60]}...")
+        if result["resposta_gerada"].startswith("[ERRO]"):
+            print(f"   ❌ {result['resposta_gerada'][:200]}")
+            return
+        
+        # Exibir métricas
+        p_lei = result['precision_lei'] if result['precision_lei'] is not None else 0.0
+        r_lei = result['recall_lei'] if result['recall_lei'] is not None else 0.0
+        f1_lei = result['f1_lei'] if result['f1_lei'] is not None else 0.0
+        p_juris = result['precision_juris'] if result['precision_juris'] is not None else 0.0
+        r_juris = result['recall_juris'] if result['recall_juris'] is not None else 0.0
+        f1_juris = result['f1_juris'] if result['f1_juris'] is not None else 0.0
+        
+        print(f"   ✅ P_lei={p_lei:.2f} R_lei={r_lei:.2f} F1_lei={f1_lei:.2f} | "
+              f"P_juris={p_juris:.2f} R_juris={r_juris:.2f} F1_juris={f1_juris:.2f} | "
+              f"Tempo={result['generation_time']:.2f}s")
+    
+    try:
+        await asyncio.gather(*(run_one(*item) for item in pending))
+    finally:
+        await OLLAMA_ASYNC.close()
+
+
+def run_all_tests(concorrencia: int = TEST_CONCURRENCY, retomar: Path = None):
+    """
+    Executa todos os testes e salva resultados.
+    
+    Args:
+        concorrencia: Quantos pares (pergunta, LLM) rodam ao mesmo tempo
+        retomar: CSV de uma execução interrompida; só os pares que faltam são executados
+    """
     print("=" * 80)
     print("TESTE DE LLMs - CLAITON TCC")
     print("=" * 80)
     print(f"Embedding usado: {EMBED_MODEL_NAME}")
     print(f"LLMs a testar: {', '.join(LLM_MODELS.keys())}")
     print(f"K_JURIS={K_JURIS}, K_LEI={K_LEI}")
+    print(f"Concorrência: {concorrencia}")
     print("=" * 80)
     
     # Carregar perguntas
@@ -258,87 +422,96 @@ def run_all_tests():
     questions = load_questions(PERGUNTAS_CSV)
     print(f"✅ {len(questions)} perguntas carregadas.")
     
-    # Preparar arquivo de saída
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    output_file = OUTPUT_DIR / f"resultados_{timestamp}.csv"
-    
-    # Cabeçalho do CSV
-    fieldnames = [
-        "id_pergunta", "pergunta", "embedding_model",
-        "llm_name", "llm_model", "resposta_gerada", "resposta_esperada",
-        "artigos_retrieved", "artigos_relevantes", "juris_retrieved", "juris_relevantes",
-        "precision_lei", "recall_lei", "f1_lei",
-        "precision_juris", "recall_juris", "f1_juris",
-        "generation_time", "num_docs_retrieved", "num_docs_used"
+    # Preparar arquivo de saída (novo ou retomado)
+    completed_rows = []
+    if retomar:
+        output_file = Path(retomar)
+        if not output_file.exists():
+            print(f"❌ ERRO: Arquivo {output_file} não encontrado para retomar!")
+            sys.exit(1)
+        completed_rows = load_completed(output_file)
+        print(f"♻️  Retomando {output_file}: {len(completed_rows)} pares já concluídos.")
+    else:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_file = OUTPUT_DIR / f"resultados_{timestamp}.csv"
+    
+    checkpoint = load_checkpoint(output_file) if retomar else {"sessoes": []}
+    done = {(row["id_pergunta"], row["llm_name"]) for row in completed_rows}
+    pending_pairs = [
+        (llm_name, llm_model, question)
+        for llm_name, llm_model in LLM_MODELS.items()
+        for question in questions
+        if (question['id'], llm_name) not in done
     ]
     
+    if not pending_pairs:
+        print("✅ Nenhum par pendente: execução já concluída.")
+        return output_file
+    
     # Cache de retrieval (fazer uma vez por pergunta, reutilizar para todos os LLMs)
-    print(f"\n🔍 Fazendo retrieval para todas as perguntas...")
+    pending_questions = list({q['id']: q for _, _, q in pending_pairs}.values())
+    print(f"\n🔍 Fazendo retrieval para {len(pending_questions)} perguntas...")
     retrieved_cache = {}
-    for i, question in enumerate(questions, 1):
-        print(f"   [{i}/{len(questions)}] {question['id']}: {question['pergunta'][:60]}...")
-        try:
-            retrieved_docs = dual_retrieve(question['pergunta'], k_juris=K_JURIS, k_lei=K_LEI)
+    try:
+        # Um único forward pass de embeddings para todas as perguntas
+        batch_results = dual_retrieve_batch(
+            [q['pergunta'] for q in pending_questions], k_juris=K_JURIS, k_lei=K_LEI
+        )
+        for question, retrieved_docs in zip(pending_questions, batch_results):
             retrieved_cache[question['id']] = retrieved_docs
-        except Exception as e:
-            print(f"      ❌ ERRO no retrieval: {e}")
-            retrieved_cache[question['id']] = []
+    except Exception as e:
+        print(f"   ⚠️  Retrieval em lote falhou ({e}); refazendo pergunta a pergunta...")
+        for i, question in enumerate(pending_questions, 1):
+            print(f"   [{i}/{len(pending_questions)}] {question['id']}: {question['pergunta'][:60]}...")
+            try:
+                retrieved_docs = dual_retrieve(question['pergunta'], k_juris=K_JURIS, k_lei=K_LEI)
+                retrieved_cache[question['id']] = retrieved_docs
+            except Exception as e:
+                print(f"      ❌ ERRO no retrieval: {e}")
+                retrieved_cache[question['id']] = []
     
     print(f"✅ Retrieval concluído para {len(retrieved_cache)} perguntas.\n")
     
-    # Executar testes
-    total_tests = len(LLM_MODELS) * len(questions)
-    current_test = 0
-    
-    print(f"🚀 Iniciando {total_tests} testes de geração...")
-    print(f"   {len(LLM_MODELS)} LLMs × {len(questions)} perguntas\n")
-    
-    with open(output_file, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
+    pending = []
+    for llm_name, llm_model, question in pending_pairs:
+        if not retrieved_cache.get(question['id']):
+            print(f"   ⚠️  Pergunta {question['id']}: nenhum documento recuperado (pulando)")
+            continue
+        pending.append((llm_name, llm_model, question))
+    
+    print(f"🚀 Iniciando {len(pending)} testes de geração...")
+    print(f"   {len(LLM_MODELS)} LLMs × {len(questions)} perguntas, {len(done)} já concluídos\n")
+    
+    # Reescreve o CSV só com as linhas concluídas (erros anteriores são refeitos).
+    # Temporário + os.replace: uma interrupção aqui não apaga os resultados já obtidos
+    tmp_file = output_file.with_suffix(".tmp")
+    with open(tmp_file, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
         writer.writeheader()
+        writer.writerows(completed_rows)
+    os.replace(tmp_file, output_file)
+    
+    # Os novos resultados são acrescentados ao arquivo já consolidado
+    with open(output_file, 'a', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
         
-        for llm_name, llm_model in LLM_MODELS.items():
-            print(f"\n{'=' * 80}")
-            print(f"🤖 Testando LLM: {llm_name} ({llm_model})")
-            print(f"{'=' * 80}")
-            
-            for i, question in enumerate(questions, 1):
-                current_test += 1
-                print(f"\n[{current_test}/{total_tests}] Pergunta {i}/{len(questions)}: {question['id']}")
-                print(f"   {question['pergunta'][:80]}...")
-                
-                try:
-                    retrieved_docs = retrieved_cache.get(question['id'], [])
-                    
-                    if not retrieved_docs:
-                        print(f"   ⚠️  Nenhum documento recuperado (pulando)")
-                        continue
-                    
-                    result = test_single_question(
-                        question, llm_name, llm_model, retrieved_docs
-                    )
-                    writer.writerow(result)
-                    f.flush()  # Salvar imediatamente
-                    
-                    # Exibir métricas
-                    p_lei = result['precision_lei'] if result['precision_lei'] is not None else 0.0
-                    r_lei = result['recall_lei'] if result['recall_lei'] is not None else 0.0
-                    f1_lei = result['f1_lei'] if result['f1_lei'] is not None else 0.0
-                    p_juris = result['precision_juris'] if result['precision_juris'] is not None else 0.0
-                    r_juris = result['recall_juris'] if result['recall_juris'] is not None else 0.0
-                    f1_juris = result['f1_juris'] if result['f1_juris'] is not None else 0.0
-                    
-                    print(f"   ✅ P_lei={p_lei:.2f} R_lei={r_lei:.2f} F1_lei={f1_lei:.2f} | "
-                          f"P_juris={p_juris:.2f} R_juris={r_juris:.2f} F1_juris={f1_juris:.2f} | "
-                          f"Tempo={result['generation_time']:.2f}s")
-                
-                except Exception as e:
-                    print(f"   ❌ ERRO: {e}")
-                    import traceback
-                    traceback.print_exc()
+        now = time.time()
+        checkpoint["sessoes"].append({
+            "inicio": now, "fim": now, "concluidos": 0, "concorrencia": concorrencia
+        })
+        save_checkpoint(output_file, checkpoint)
+        
+        asyncio.run(run_pending_tests(
+            pending, retrieved_cache, writer, f, output_file, checkpoint, concorrencia
+        ))
     
+    sessao = checkpoint["sessoes"][-1]
+    elapsed = sessao["fim"] - sessao["inicio"]
     print(f"\n{'=' * 80}")
     print(f"✅ TESTES CONCLUÍDOS!")
+    if elapsed > 0:
+        print(f"⏱️  {sessao['concluidos']} pares em {elapsed:.1f}s "
+              f"({sessao['concluidos'] / elapsed * 60:.2f} perguntas/min)")
     print(f"📁 Resultados salvos em: {output_file}")
     print(f"{'=' * 80}\n")
     
@@ -364,6 +537,9 @@ def analyze_results(results_file: Path):
         print("❌ Nenhum resultado encontrado no arquivo.")
         return None
     
+    # Wall-clock de todas as sessões da execução (se houver checkpoint)
+    wall_time = wall_clock_time(load_checkpoint(results_file))
+    
     # Agrupar por LLM
     from collections import defaultdict
     groups = defaultdict(list)
@@ -425,6 +601,9 @@ def analyze_results(results_file: Path):
               f"{row['generation_time_mean']:<10.2f}")
     
     print("=" * 120)
+    # Os LLMs rodam intercalados na mesma execução: só há throughput global
+    if wall_time > 0:
+        print(f"⏱️  Wall-clock: {wall_time:.1f}s | Throughput: {len(results) / wall_time * 60:.2f} perguntas/min")
     print(f"\n✅ Resumo salvo em: {summary_file}\n")
     
     return summary_file
@@ -442,8 +621,15 @@ if __name__ == "__main__":
         print("❌ ERRO: EMBED_MODEL_NAME não configurado no .env")
         sys.exit(1)
     
+    parser = argparse.ArgumentParser(description="Teste de LLMs do CLAITON")
+    parser.add_argument("--concorrencia", type=int, default=TEST_CONCURRENCY,
+                        help="pares (pergunta, LLM) executados ao mesmo tempo")
+    parser.add_argument("--retomar", type=Path, default=None,
+                        help="CSV de uma execução interrompida a ser retomada")
+    args = parser.parse_args()
+    
     # Executar testes
-    results_file = run_all_tests()
+    results_file = run_all_tests(concorrencia=args.concorrencia, retomar=args.retomar)
     
     # Analisar resultados
     analyze_results(results_file)
@@ -0,0 +1,242 @@
+"""
+tracing.py - Traces por requisição e histogramas de latência por etapa
+
+Cada pergunta ganha um Trace com request_id, spans por etapa (embedding,
+buscas, Ollama, envio Twilio...) e atributos (nº de documentos, tamanho do
+prompt, cache hit...). Ao terminar, o trace vai para os sinks configurados
+(arquivo JSONL, ring buffer em memória) e alimenta os histogramas expostos
+pelo /metrics do bot.
+
+O trace corrente fica num ContextVar: funções internas do rag_core só
+chamam span(...) / annotate(...), que não fazem nada fora de um trace.
+"""
+import json
+import time
+import uuid
+import threading
+import contextvars
+from pathlib import Path
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+# Limites superiores dos buckets dos histogramas, em milissegundos
+HISTOGRAM_BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000]
+
+_CURRENT: "contextvars.ContextVar[Optional[Trace]]" = contextvars.ContextVar("rag_trace", default=None)
+
+
+class Trace:
+    """Trace de uma requisição: spans por etapa + atributos"""
+
+    def __init__(self, name: str, **attrs):
+        self.request_id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.attrs: Dict[str, Any] = dict(attrs)
+        self.spans: List[Dict[str, Any]] = []
+        self.started_at = time.time()
+        self._t0 = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.error: Optional[str] = None
+
+    @contextmanager
+    def span(self, name: str, **attrs) -> Iterator[Dict[str, Any]]:
+        """Mede a etapa; o dict retornado aceita atributos extras"""
+        record = {"name": name, "start": time.perf_counter() - self._t0, **attrs}
+        t0 = time.perf_counter()
+        try:
+            yield record
+        except BaseException as e:
+            record["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            record["duration"] = time.perf_counter() - t0
+            self.spans.append(record)
+
+    def add_span(self, name: str, duration: float, **attrs):
+        """Registra uma etapa medida fora do trace (ex.: espera na fila)"""
+        self.spans.append({"name": name, "start": None, "duration": duration, **attrs})
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "request_id": self.request_id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration": self.duration,
+            "error": self.error,
+            "attrs": self.attrs,
+            "spans": self.spans,
+        }
+
+
+# ============================================================================
+# SINKS
+# ============================================================================
+
+class JsonlSink:
+    """Acrescenta cada trace como uma linha JSON num arquivo"""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def emit(self, trace: Dict[str, Any]):
+        line = json.dumps(trace, ensure_ascii=False, default=str)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+class RingBufferSink:
+    """Mantém os últimos N traces em memória"""
+
+    def __init__(self, maxlen: int = 500):
+        self._buffer = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def emit(self, trace: Dict[str, Any]):
+        with self._lock:
+            self._buffer.append(trace)
+
+    def recent(self, n: int = 50) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._buffer)[-n:]
+
+
+# ============================================================================
+# HISTOGRAMAS
+# ============================================================================
+
+class StageHistograms:
+    """Histogramas cumulativos de latência (ms) por etapa"""
+
+    def __init__(self, buckets_ms: List[float] = HISTOGRAM_BUCKETS_MS):
+        self.buckets_ms = list(buckets_ms)
+        self._data: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float):
+        ms = seconds * 1000
+        with self._lock:
+            hist = self._data.get(stage)
+            if hist is None:
+                hist = {"counts": [0] * (len(self.buckets_ms) + 1), "count": 0, "sum_ms": 0.0}
+                self._data[stage] = hist
+            idx = next((i for i, b in enumerate(self.buckets_ms) if ms <= b), len(self.buckets_ms))
+            hist["counts"][idx] += 1
+            hist["count"] += 1
+            hist["sum_ms"] += ms
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            stages = {}
+            for stage, hist in self._data.items():
+                labels = [str(b) for b in self.buckets_ms] + ["+Inf"]
+                stages[stage] = {
+                    "count": hist["count"],
+                    "mean_ms": hist["sum_ms"] / hist["count"] if hist["count"] else 0.0,
+                    "buckets_ms": dict(zip(labels, hist["counts"])),
+                }
+            return stages
+
+
+# ============================================================================
+# TRACER
+# ============================================================================
+
+class Tracer:
+    """Cria traces, publica nos sinks e atualiza os histogramas"""
+
+    def __init__(self, sinks: Optional[List[Any]] = None):
+        self.sinks = list(sinks or [])
+        self.histograms = StageHistograms()
+
+    @contextmanager
+    def trace(self, name: str, **attrs) -> Iterator[Trace]:
+        """
+        Abre um trace e o torna corrente. Se já existe um trace corrente
+        (ex.: o bot abriu um para a mensagem), vira um span dentro dele.
+        """
+        parent = _CURRENT.get()
+        if parent is not None:
+            parent.attrs.update(attrs)
+            with parent.span(name):
+                yield parent
+            return
+
+        trace = Trace(name, **attrs)
+        token = _CURRENT.set(trace)
+        try:
+            yield trace
+        except BaseException as e:
+            trace.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            try:
+                _CURRENT.reset(token)
+            except ValueError:
+                # Gerador finalizado em outro contexto (ex.: streaming abandonado)
+                _CURRENT.set(None)
+            self.finish(trace)
+
+    def finish(self, trace: Trace):
+        trace.duration = time.perf_counter() - trace._t0
+        for record in trace.spans:
+            self.histograms.observe(record["name"], record["duration"])
+        self.histograms.observe(f"{trace.name}.total", trace.duration)
+
+        data = trace.to_dict()
+        for sink in self.sinks:
+            try:
+                sink.emit(data)
+            except Exception as e:
+                print(f"[AVISO] Falha ao gravar trace em {type(sink).__name__}: {e}")
+
+    def recent(self, n: int = 50) -> List[Dict[str, Any]]:
+        for sink in self.sinks:
+            if isinstance(sink, RingBufferSink):
+                return sink.recent(n)
+        return []
+
+
+def current_trace() -> Optional[Trace]:
+    return _CURRENT.get()
+
+
+@contextmanager
+def span(name: str, **attrs) -> Iterator[Dict[str, Any]]:
+    """Span no trace corrente; sem trace, apenas executa o bloco"""
+    trace = _CURRENT.get()
+    if trace is None:
+        yield dict(attrs)
+        return
+    with trace.span(name, **attrs) as record:
+        yield record
+
+
+def annotate(**attrs):
+    """Adiciona atributos ao trace corrente, se houver"""
+    trace = _CURRENT.get()
+    if trace is not None:
+        trace.attrs.update(attrs)
+
+
+def mark_error(error: BaseException):
+    """Registra no trace corrente um erro que foi tratado (não propagado)"""
+    trace = _CURRENT.get()
+    if trace is not None:
+        trace.error = f"{type(error).__name__}: {error}"
+
+
+def build_sinks(spec: str, jsonl_path: str, ring_size: int) -> List[Any]:
+    """Cria os sinks a partir de uma lista separada por vírgula: "ring,jsonl" """
+    sinks = []
+    for name in (s.strip().lower() for s in spec.split(",")):
+        if name == "ring":
+            sinks.append(RingBufferSink(ring_size))
+        elif name == "jsonl":
+            sinks.append(JsonlSink(jsonl_path))
+        elif name:
+            print(f"[AVISO] Sink de trace desconhecido: {name}")
+    return sinks
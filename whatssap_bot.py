@@ -3,11 +3,17 @@
 Bot WhatsApp para RAG Jurídico via Twilio
 """
 import os
+import time
+import asyncio
+import threading
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional, Tuple
 from flask import Flask, request
 from twilio.twiml.messaging_response import MessagingResponse
 from twilio.rest import Client
-from rag_core import answer_question
-from threading import Thread
+from rag_core import answer_question_async, VECTOR_STORES, ANSWER_CACHE, TRACER, RERANKER
+from answer_cache import normalize_question
+import tracing
 from dotenv import load_dotenv
 load_dotenv()
 app = Flask(__name__)
@@ -18,6 +24,117 @@ TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
 TWILIO_WHATSAPP_NUMBER = os.getenv("TWILIO_WHATSAPP_NUMBER")
 client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
 
+# Workers assíncronos: quantas perguntas processam ao mesmo tempo e quantas esperam.
+# A geração no Ollama ainda respeita OLLAMA_MODEL_CONCURRENCY (rag_core).
+BOT_WORKERS = int(os.getenv("BOT_WORKERS", "4"))
+BOT_QUEUE_SIZE = int(os.getenv("BOT_QUEUE_SIZE", "20"))
+
+
+class FilaDePerguntas:
+    """
+    Fila limitada atendida por um número fixo de workers assíncronos.
+
+    Todos os workers são corrotinas de um único event loop (em uma thread
+    própria), então várias perguntas avançam ao mesmo tempo sem uma thread
+    por mensagem.
+
+    - Backpressure: com a fila cheia, a pergunta é recusada.
+    - Deduplicação: a mesma pergunta do mesmo remetente, ainda pendente, é
+      descartada.
+    - Métricas de profundidade da fila e tempo de espera para o /status.
+    """
+
+    def __init__(self, handler: Callable[[str, str], Awaitable[None]], workers: int, maxsize: int):
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._depth = 0
+        self._active = 0
+        self._wait_times = deque(maxlen=200)
+        self.processed = 0
+        self.rejected = 0
+        self.duplicates = 0
+
+        self._loop = asyncio.new_event_loop()
+        self._queue: Optional[asyncio.Queue] = None
+        ready = threading.Event()
+        threading.Thread(target=self._run_loop, args=(ready,), name="bot-event-loop", daemon=True).start()
+        ready.wait()
+
+    def _run_loop(self, ready: threading.Event):
+        asyncio.set_event_loop(self._loop)
+        self._queue = asyncio.Queue()
+        for _ in range(self.workers):
+            self._loop.create_task(self._worker())
+        ready.set()
+        self._loop.run_forever()
+
+    def submit(self, question: str, sender: str) -> Tuple[str, int]:
+        """
+        Enfileira a pergunta.
+
+        Returns:
+            (situacao, posicao): situacao é "processando", "enfileirada",
+            "duplicada" ou "cheia"; posicao é o lugar na fila (1 = próxima).
+        """
+        key = (sender, normalize_question(question))
+        with self._lock:
+            if key in self._pending:
+                self.duplicates += 1
+                return "duplicada", 0
+            if self._depth >= self.maxsize:
+                self.rejected += 1
+                return "cheia", self._depth
+            self._depth += 1
+            self._pending.add(key)
+            posicao = self._depth - (self.workers - self._active)
+
+        item = (question, sender, time.monotonic(), key)
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, item)
+        if posicao <= 0:
+            return "processando", 0
+        return "enfileirada", posicao
+
+    async def _worker(self):
+        while True:
+            question, sender, enqueued_at, key = await self._queue.get()
+            wait = time.monotonic() - enqueued_at
+            with self._lock:
+                self._depth -= 1
+                self._active += 1
+                self._wait_times.append(wait)
+            try:
+                # Um trace por mensagem: espera na fila + pipeline RAG + envio
+                with TRACER.trace("whatsapp", sender=sender) as trace:
+                    trace.add_span("fila_espera", wait)
+                    await self.handler(question, sender)
+            except Exception as e:
+                print(f"[ERRO WORKER] {e}")
+            finally:
+                with self._lock:
+                    self._active -= 1
+                    self._pending.discard(key)
+                    self.processed += 1
+
+    def status(self) -> Dict:
+        with self._lock:
+            waits = sorted(self._wait_times)
+            return {
+                "workers": self.workers,
+                "active": self._active,
+                "queue_depth": self._depth,
+                "queue_max": self.maxsize,
+                "processed": self.processed,
+                "rejected": self.rejected,
+                "duplicates": self.duplicates,
+                "wait_time_mean": sum(waits) / len(waits) if waits else 0.0,
+                "wait_time_p95": waits[int(0.95 * (len(waits) - 1))] if waits else 0.0,
+                "wait_time_max": waits[-1] if waits else 0.0,
+            }
+
+
 @app.route("/webhook", methods=["POST"])
 def webhook():
     incoming_msg = request.values.get("Body", "").strip()
@@ -29,21 +146,31 @@ def webhook():
     if not incoming_msg or len(incoming_msg) < 10:
         return respond("Por favor, envie uma pergunta mais detalhada.")
 
-    # Responder imediatamente ao Twilio
-    response = MessagingResponse()
-    response.message("⏳ Processando sua pergunta... Aguarde alguns segundos.")
+    # Enfileirar para o pool de workers e responder imediatamente ao Twilio
+    situacao, posicao = fila.submit(incoming_msg, from_number)
 
-    # Processar em background e enviar depois
-    Thread(target=process_and_send, args=(incoming_msg, from_number)).start()
-    return str(response)
+    if situacao == "duplicada":
+        return respond("⏳ Já estou processando essa pergunta. Aguarde a resposta.")
+    if situacao == "cheia":
+        return respond(
+            f"🚦 Estou ocupado no momento ({posicao} perguntas na fila). "
+            "Tente novamente em alguns minutos."
+        )
+    if situacao == "enfileirada":
+        return respond(f"⏳ Estou ocupado, você é o #{posicao} da fila. Sua resposta chegará em breve.")
+    return respond("⏳ Processando sua pergunta... Aguarde alguns segundos.")
 
 
-def process_and_send(question, to_number):
+async def process_and_send(question, to_number):
     """Processa RAG e envia resposta via Twilio API"""
     try:
         print(f"[BACKGROUND] Processando: {question}")
+        start_time = time.perf_counter()
         # Limitar resposta a 1200 chars para deixar espaço para header e fontes (total max 1600)
-        resposta, fontes = answer_question(question, max_response_length=1200)
+        resposta, fontes = await answer_question_async(question, max_response_length=1200)
+        trace = tracing.current_trace()
+        print(f"[TEMPO] total={time.perf_counter() - start_time:.2f}s"
+              + (f" request_id={trace.request_id}" if trace is not None else ""))
         
         # Formatar mensagem
         mensagem = f"📋 *Resposta:*\n{resposta}\n\n"
@@ -61,23 +188,30 @@ def process_and_send(question, to_number):
 
         print(f"[DEBUG] Tamanho da mensagem: {len(mensagem)} caracteres")
 
-        # Enviar via Twilio API
-        client = Client(os.getenv("TWILIO_ACCOUNT_SID"), os.getenv("TWILIO_AUTH_TOKEN"))
-        print("meu cliente: ", client)
-        message = client.messages.create(
-            from_=TWILIO_WHATSAPP_NUMBER,
-            body=mensagem,
-            to=to_number
-        )
-        print("mensagem enviada: ", message)
-
-        print(f"[ENVIADO] SID: {message.sid}")
+        # O SDK do Twilio é bloqueante: enviar fora do event loop
+        loop = asyncio.get_running_loop()
+        with tracing.span("twilio_envio"):
+            await loop.run_in_executor(None, send_whatsapp, mensagem, to_number)
 
     except Exception as e:
+        tracing.mark_error(e)
         print(f"[ERRO BACKGROUND] {e}")
         import traceback
         traceback.print_exc()
 
+
+def send_whatsapp(mensagem, to_number):
+    """Envia a mensagem via Twilio API"""
+    client = Client(os.getenv("TWILIO_ACCOUNT_SID"), os.getenv("TWILIO_AUTH_TOKEN"))
+    message = client.messages.create(
+        from_=TWILIO_WHATSAPP_NUMBER,
+        body=mensagem,
+        to=to_number
+    )
+    print(f"[ENVIADO] SID: {message.sid}")
+
+fila = FilaDePerguntas(process_and_send, workers=BOT_WORKERS, maxsize=BOT_QUEUE_SIZE)
+
 def respond(message):
     """Cria resposta TwiML"""
     response = MessagingResponse()
@@ -88,9 +222,35 @@ def respond(message):
 @app.route("/status", methods=["GET"])
 def status():
     """Health check"""
-    return {"status": "online", "service": "RAG Jurídico WhatsApp Bot"}
+    return {
+        "status": "online",
+        "service": "RAG Jurídico WhatsApp Bot",
+        "vectorstores": VECTOR_STORES.health_check(),
+        "answer_cache": ANSWER_CACHE.stats() if ANSWER_CACHE is not None else None,
+        "fila": fila.status()
+    }
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """Histogramas de latência (ms) por etapa, acumulados desde o início do processo"""
+    return {
+        "buckets_ms": TRACER.histograms.buckets_ms,
+        "stages": TRACER.histograms.snapshot()
+    }
+
+
+@app.route("/traces", methods=["GET"])
+def traces():
+    """Últimos traces do ring buffer (?n=50)"""
+    n = request.args.get("n", default=50, type=int)
+    return {"traces": TRACER.recent(n)}
 
 
 if __name__ == "__main__":
+    # Abrir os handles do Chroma antes da primeira mensagem
+    threading.Thread(target=VECTOR_STORES.warm_up, daemon=True).start()
+    if RERANKER is not None:
+        threading.Thread(target=RERANKER.warm_up, daemon=True).start()
     # Para desenvolvimento local com ngrok
     app.run(host="0.0.0.0", port=5050, debug=True)
\ No newline at end of file